@@ -1,14 +1,29 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import base64
+import json
 import os
 import logging
+import re
+import threading
+import time
+import uuid
 from datetime import datetime
 
-from aws_bedrock_client import BedrockClient
-from visual_label_creator import NutritionLabelCreator
-from label_generator import NutritionLabelGenerator
+from aws_bedrock_client import BedrockClient, BedrockOverloadedError, ConcurrentBedrockClient
+from visual_label_creator import NutritionLabelCreator, font_cache_stats
+from label_generator import NutritionLabelGenerator, validate_product_data
 from crisis_response import CrisisResponseGenerator
+from label_cache import LabelCache
+from label_encoder import DEFAULT_ENCODER, EncoderPolicy, get_encoder, parse_market_encoders
+from label_response import NotAcceptable, label_response, negotiate_encoder, negotiate_format
+from llm_cache import build_response_cache
+from render_pool import ProcessRenderPool, build_renderer
+from batch_generator import BatchLabelGenerator, expand_items, parse_ndjson
+from crisis_campaign import CAMPAIGN_FILE, CampaignRunning, CrisisCampaign, read_progress, request_cancel
+from job_queue import JobWorkers, build_job_queue
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, METRICS, REQUEST_SECONDS, REQUESTS
+from tracing import TRACER, build_exporter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,66 +32,329 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all origins
 
+# Upper bound on labels generated concurrently per batch request
+BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", 4))
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/jsonl", "application/x-jsonlines")
+
+# Crisis campaigns: state directories, catalogs they may select from, and worker threads per campaign
+CAMPAIGN_DIR = os.environ.get("CAMPAIGN_DIR", "campaigns")
+CATALOG_DIR = os.environ.get("CATALOG_DIR", "catalogs")
+CAMPAIGN_MAX_WORKERS = int(os.environ.get("CAMPAIGN_MAX_WORKERS", 8))
+
+# Asynchronous label jobs: most jobs accepted per request, and the longest a long-poll may wait
+JOB_SUBMIT_LIMIT = int(os.environ.get("JOB_SUBMIT_LIMIT", 10000))
+JOB_MAX_WAIT = float(os.environ.get("JOB_MAX_WAIT", 60))
+# Seconds between keep-alive comments on job event streams
+JOB_EVENTS_HEARTBEAT = 15
+# Retry-After sent with 503s when the Bedrock request queue is full
+BEDROCK_RETRY_AFTER = int(os.environ.get("BEDROCK_RETRY_AFTER", 2))
+
 # Initialize clients
 try:
+    response_cache = build_response_cache(
+        max_entries=int(os.environ.get("LLM_CACHE_SIZE", 1024)),
+        ttl=float(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600)),
+        sqlite_path=os.environ.get("LLM_CACHE_PATH") or None
+    )
     bedrock_client = BedrockClient(
         region=os.environ.get("BEDROCK_REGION", "us-east-1"),
-        model_id=os.environ.get("BEDROCK_MODEL_ID", "anthropic.claude-3-5-sonnet-20241022-v2:0")
+        model_id=os.environ.get("BEDROCK_MODEL_ID", "anthropic.claude-3-5-sonnet-20241022-v2:0"),
+        response_cache=response_cache,
+        max_pool_connections=int(os.environ.get("BEDROCK_MAX_CONCURRENCY", 8)),
+        endpoint_url=os.environ.get("BEDROCK_ENDPOINT_URL") or None
     )
+    concurrent_bedrock = ConcurrentBedrockClient(
+        bedrock_client,
+        max_concurrency=int(os.environ.get("BEDROCK_MAX_CONCURRENCY", 8)),
+        max_queue=int(os.environ.get("BEDROCK_MAX_QUEUE", 64))
+    ) if os.environ.get("BEDROCK_CONCURRENT", "false").lower() == "true" else None
     visual_creator = NutritionLabelCreator()
-    label_generator = NutritionLabelGenerator(bedrock_client, visual_creator)
-    crisis_generator = CrisisResponseGenerator(bedrock_client, visual_creator)
+    renderer = build_renderer(int(os.environ.get("RENDER_PROCESSES", 0)), visual_creator)
+    label_cache = LabelCache(
+        max_entries=int(os.environ.get("LABEL_CACHE_SIZE", 256)),
+        disk_dir=os.environ.get("LABEL_CACHE_DIR") or None
+    )
+    encoders = EncoderPolicy(
+        default=os.environ.get("LABEL_ENCODER", DEFAULT_ENCODER),
+        per_market=parse_market_encoders(os.environ.get("LABEL_MARKET_ENCODERS", ""))
+    )
+    label_generator = NutritionLabelGenerator(bedrock_client, visual_creator, label_cache, renderer, encoders,
+                                              concurrent_bedrock)
+    crisis_generator = CrisisResponseGenerator(bedrock_client, visual_creator, label_cache, renderer, encoders,
+                                               concurrent_bedrock)
+    job_queue = build_job_queue(
+        backend=os.environ.get("JOB_QUEUE", "memory"),
+        path=os.environ.get("JOB_QUEUE_PATH") or None,
+        url=os.environ.get("JOB_QUEUE_URL") or None,
+        result_ttl=float(os.environ.get("JOB_RESULT_TTL", 24 * 3600)),
+        lease=float(os.environ.get("JOB_LEASE_SECONDS", 600))
+    )
+    if os.environ.get("METRICS_DIR"):
+        METRICS.share(os.environ["METRICS_DIR"])
+    TRACER.configure(
+        exporter=build_exporter(
+            kind=os.environ.get("TRACE_EXPORTER", "file"),
+            path=os.environ.get("TRACE_FILE") or None,
+            endpoint=os.environ.get("TRACE_OTLP_ENDPOINT") or None
+        ),
+        sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", 0))
+    )
+    job_workers = JobWorkers(
+        job_queue,
+        {"label": lambda payload: label_generator.generate_label(payload["product"], payload.get("encoder"))},
+        workers=int(os.environ.get("JOB_WORKERS", 4))
+    )
     logger.info("All clients initialized successfully")
 except Exception as e:
     logger.error(f"Failed to initialize clients: {e}")
     raise
 
+def warm_up():
+    """Load fonts, market templates and the crisis type × market banners before the first request
+
+    Kept out of module import so cold starts (and importing the app) stay
+    fast; the server entry points call it, and everything it loads is
+    otherwise loaded on first use.
+    """
+    visual_creator.preload_fonts()
+
+def reload_crisis_regulations(crisis_warnings=None, contact_info=None):
+    """Replace the crisis warning texts and/or contact details in this process and its render pool
+
+    Under gunicorn every worker is a process of its own with its own copy:
+    run this in each of them, or update market_regulations.py and restart
+    the server.
+    """
+    banners = visual_creator.reload_crisis_regulations(crisis_warnings, contact_info)
+    if isinstance(renderer, ProcessRenderPool):
+        renderer.reload_crisis_regulations(crisis_warnings, contact_info)
+    logger.info(f"Crisis regulations reloaded: {banners} crisis banners re-rendered")
+    return banners
+
+def init_worker():
+    """Prepare a server worker process forked from a preloaded app (see gunicorn.conf.py)
+
+    Fonts, templates and banners loaded before the fork are shared; the
+    Bedrock client is not fork-safe, so each worker creates its own.
+    SQLite connections (LLM_CACHE_PATH) are reopened per process on
+    first use, so workers never share the master's.
+    """
+    warm_up()
+    # A client inherited from the parent would share its connections; create this worker's own now
+    bedrock_client.reset_client()
+    # With METRICS_DIR, this worker's metrics join the others' in every scrape
+    METRICS.ensure_writer()
+    job_workers.ensure_started()
+
+def requested_encoder():
+    """The validated ?encoder= parameter; None selects the market's configured encoder"""
+    name = request.args.get("encoder")
+    if name:
+        get_encoder(name)
+    return name
+
+def request_endpoint():
+    # The route pattern, not the path, keeps job and campaign ids out of metric labels and span names
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.before_request
+def start_request_trace():
+    """Root span of the request (or a continuation of the caller's traceparent), when sampled"""
+    g.trace_scope = TRACER.start_trace(f"{request.method} {request_endpoint()}", request.headers.get("traceparent"),
+                                       **{"http.method": request.method, "http.route": request_endpoint()})
+    g.trace_span = g.trace_scope.__enter__()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request_endpoint()
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+    if "request_start" in g:
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    span = g.get("trace_span")
+    if span is not None and span.traceparent is not None:
+        span.set_attribute("http.status_code", response.status_code)
+        response.headers["traceparent"] = span.traceparent
+    return response
+
+@app.teardown_request
+def end_request_trace(error=None):
+    # After streamed responses have been sent, so their spans end inside the request's
+    scope = g.pop("trace_scope", None)
+    if scope is not None:
+        scope.__exit__(type(error) if error else None, error, None)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Request, error and per-stage latency metrics in the Prometheus text format"""
+    return Response(METRICS.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "service": "nutrition-label-generator"
+        "service": "nutrition-label-generator",
+        "font_cache": font_cache_stats(),
+        "label_cache": label_cache.stats(),
+        "llm_cache": response_cache.stats(),
+        "bedrock": concurrent_bedrock.stats() if concurrent_bedrock is not None else None,
+        "renderer": renderer.stats(),
+        "crisis": crisis_generator.stats(),
+        "jobs": job_queue.stats(),
+        "tracing": TRACER.stats(),
+        "coalescing": {
+            "labels": label_generator.single_flight.stats(),
+            "crisis_labels": crisis_generator.single_flight.stats()
+        }
     }), 200
 
 @app.route('/api/nutrition/generate-label', methods=['POST'])
 def generate_nutrition_label():
-    """Generate a nutrition label based on product data"""
+    """Generate a nutrition label based on product data
+
+    Responds with JSON (base64 image) by default, the image itself for
+    "Accept: image/png" (or image/webp, image/svg+xml, application/pdf,
+    image/*), or JSON metadata plus the image for "Accept: multipart/mixed"
+    (also selectable with ?format=json|png|svg|pdf|image|multipart).
+    ?encoder= picks the image encoder; without it, an image type the
+    market's encoder doesn't produce picks the encoder for that type. 406
+    if the Accept header rules out ?encoder=.
+    """
     try:
         data = request.json
         if not data:
             return jsonify({"error": "Invalid input data - JSON required"}), 400
 
         # Validate required fields
-        required_fields = ['product_name', 'serving_size', 'servings_per_container', 'calories']
-        missing_fields = [field for field in required_fields if not data.get(field)]
-        if missing_fields:
-            return jsonify({"error": f"Missing required fields: {', '.join(missing_fields)}"}), 400
+        error = validate_product_data(data)
+        if error:
+            return jsonify({"error": error}), 400
+        response_format = negotiate_format(request)
+        try:
+            requested = requested_encoder()
+            selected = label_generator.encoders.select(data.get("market", "spain").lower(), requested)
+            # Without ?encoder=, "Accept: image/webp" and the like pick the encoder
+            encoder = negotiate_encoder(request, response_format, selected, requested=bool(requested)).name
+        except NotAcceptable as e:
+            return jsonify({"error": str(e)}), 406
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         logger.info(f"Generating label for product: {data.get('product_name')}")
         
-        result = label_generator.generate_label(data)
-        if result.get("error"):
+        result = label_generator.generate_label_file(data, encoder)
+        if isinstance(result, dict):
             logger.error(f"Label generation failed: {result['error']}")
             return jsonify(result), 500
         
-        # Convert bytes to base64 for JSON response
-        if isinstance(result["image_base64"], bytes):
-            image_base64 = base64.b64encode(result["image_base64"]).decode('utf-8')
-        else:
-            image_base64 = result["image_base64"]
-        
-        logger.info(f"Label generated successfully: {result['filename']}")
+        logger.info(f"Label generated successfully: {result.filename}")
+        return label_response(result, response_format), 200
+
+    except BedrockOverloadedError as e:
+        return bedrock_overloaded(e)
+    except Exception as e:
+        logger.error(f"Unexpected error in generate_nutrition_label: {e}")
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@app.route('/api/nutrition/generate-market-labels', methods=['POST'])
+def generate_market_labels():
+    """Generate labels for one product in several markets
+
+    Takes the product fields plus a "markets" list. The product is validated
+    and prepared once, then all markets are generated in parallel.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid input data - JSON required"}), 400
+
+        markets = data.get("markets")
+        if not isinstance(markets, list) or not markets or not all(isinstance(m, str) for m in markets):
+            return jsonify({"error": "Invalid 'markets' - list of market names required"}), 400
+
+        product_data = {key: value for key, value in data.items() if key != "markets"}
+        error = validate_product_data(product_data)
+        if error:
+            return jsonify({"error": error}), 400
+        try:
+            encoder = requested_encoder()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        logger.info(f"Generating labels for product: {product_data.get('product_name')}, markets: {markets}")
+        results = label_generator.generate_labels_for_markets(product_data, markets, max_workers=BATCH_MAX_WORKERS,
+                                                              encoder=encoder)
+
+        labels = {}
+        for market, result in results.items():
+            if result.get("error"):
+                labels[market] = {"success": False, "error": result["error"]}
+            else:
+                labels[market] = {"success": True, **result}
         return jsonify({
-            "success": True,
-            "image_base64": image_base64,
-            "label_data": result["label_data"],
-            "filename": result["filename"]
+            "success": all(label["success"] for label in labels.values()),
+            "labels": labels
         }), 200
 
     except Exception as e:
-        logger.error(f"Unexpected error in generate_nutrition_label: {e}")
+        logger.error(f"Unexpected error in generate_market_labels: {e}")
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@app.route('/api/nutrition/batch-generate', methods=['POST'])
+def batch_generate_labels():
+    """Generate labels for many products × markets, streamed back as NDJSON
+
+    Accepts a JSON array of products, a JSON object {"products": [...],
+    "markets": [...]}, or newline-delimited JSON (request body or a "file"
+    upload, with markets as repeated "markets" query/form parameters).
+    One result line is written per item as soon as it completes.
+    """
+    try:
+        if 'file' in request.files:
+            # Uploads are closed when the view returns, before the response streams
+            products = parse_ndjson(request.files['file'].read().splitlines())
+            markets = request.form.getlist('markets') or request.args.getlist('markets')
+        elif request.mimetype in NDJSON_MIMETYPES:
+            products = parse_ndjson(request.stream)
+            markets = request.args.getlist('markets')
+        else:
+            data = request.get_json(silent=True)
+            if isinstance(data, list):
+                products, markets = data, request.args.getlist('markets')
+            elif isinstance(data, dict) and isinstance(data.get("products"), list):
+                products, markets = data["products"], data.get("markets") or []
+            else:
+                return jsonify({
+                    "error": "Invalid input data. Requires a JSON array of products, "
+                             "a 'products' field, or an NDJSON upload."
+                }), 400
+
+        if not isinstance(markets, list) or not all(isinstance(m, str) for m in markets):
+            return jsonify({"error": "Invalid 'markets' - list of market names required"}), 400
+
+        max_workers = min(request.args.get('max_workers', BATCH_MAX_WORKERS, type=int), BATCH_MAX_WORKERS)
+        batch = BatchLabelGenerator(label_generator, max_workers=max_workers)
+        logger.info(f"Starting batch label generation (markets: {markets or 'per product'}, workers: {batch.max_workers})")
+
+        def generate():
+            succeeded = failed = 0
+            for result in batch.generate(expand_items(products, markets)):
+                if result["success"]:
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            logger.info(f"Batch label generation finished: {succeeded} succeeded, {failed} failed")
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    except Exception as e:
+        logger.error(f"Unexpected error in batch_generate_labels: {e}")
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
 @app.route('/api/nutrition/crisis-response', methods=['POST'])
@@ -123,10 +401,188 @@ def generate_crisis_response_label():
             "filename": result["filename"]
         }), 200
 
+    except BedrockOverloadedError as e:
+        return bedrock_overloaded(e)
     except Exception as e:
         logger.error(f"Unexpected error in generate_crisis_response_label: {e}")
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
+def campaign_directory(campaign_id):
+    """State directory of a campaign; ids are generated hex strings"""
+    if not re.fullmatch(r"[0-9a-f]{12}", campaign_id):
+        return None
+    return os.path.join(CAMPAIGN_DIR, campaign_id)
+
+def start_campaign(campaign_id, campaign):
+    """Run a campaign in the background
+
+    The campaign is claimed first, so a campaign already run by this or
+    another server process raises CampaignRunning here.
+    """
+    campaign.claim()
+    threading.Thread(target=campaign.run, name=f"campaign-{campaign_id}", daemon=True).start()
+
+def campaign_status(campaign_id, progress, status=200):
+    return jsonify({"success": True, "campaign_id": campaign_id, **progress}), status
+
+def known_campaign(campaign_id):
+    """The campaign's directory, or None if there is no such campaign"""
+    directory = campaign_directory(campaign_id)
+    if directory is None or not os.path.exists(os.path.join(directory, CAMPAIGN_FILE)):
+        return None
+    return directory
+
+@app.route('/api/nutrition/crisis-campaign', methods=['POST'])
+def create_crisis_campaign():
+    """Start a crisis re-labeling campaign over a product list or a filtered catalog"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid input data - JSON required"}), 400
+        crisis_info = data.get("crisis_info") or {}
+        if not crisis_info.get("type") or not crisis_info.get("details"):
+            return jsonify({"error": "Invalid crisis_info. Requires 'type' and 'details' fields."}), 400
+        markets = data.get("markets") or None
+        if markets is not None and (not isinstance(markets, list) or not all(isinstance(m, str) for m in markets)):
+            return jsonify({"error": "'markets' must be a list of market names"}), 400
+
+        campaign_id = uuid.uuid4().hex[:12]
+        selector = {key: data[key] for key in ("products", "catalog", "where", "contains") if key in data}
+        try:
+            campaign = CrisisCampaign.create(crisis_generator, campaign_directory(campaign_id), selector, crisis_info,
+                                             markets, catalog_dir=CATALOG_DIR, max_workers=CAMPAIGN_MAX_WORKERS)
+        except (OSError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+
+        logger.info(f"Starting crisis campaign {campaign_id}: {len(campaign.products)} products, "
+                    f"{len(campaign.markets)} markets, crisis: {crisis_info.get('type')}")
+        start_campaign(campaign_id, campaign)
+        return campaign_status(campaign_id, read_progress(campaign.directory), 202)
+
+    except Exception as e:
+        logger.error(f"Unexpected error in create_crisis_campaign: {e}")
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@app.route('/api/nutrition/crisis-campaign/<campaign_id>', methods=['GET'])
+def get_crisis_campaign(campaign_id):
+    """Progress of a campaign; ?results=true adds the per-item results
+
+    Read from the campaign directory, so any server process can answer,
+    whichever one runs the campaign.
+    """
+    directory = known_campaign(campaign_id)
+    if directory is None:
+        return jsonify({"error": f"Unknown campaign: {campaign_id}"}), 404
+    return campaign_status(campaign_id, read_progress(directory, request.args.get("results", "").lower() == "true"))
+
+@app.route('/api/nutrition/crisis-campaign/<campaign_id>/cancel', methods=['POST'])
+def cancel_crisis_campaign(campaign_id):
+    """Stop a running campaign after the labels in progress; it can be resumed later"""
+    directory = known_campaign(campaign_id)
+    if directory is None or not request_cancel(directory):
+        return jsonify({"error": f"Campaign {campaign_id} is not running"}), 409
+    return campaign_status(campaign_id, read_progress(directory), 202)
+
+@app.route('/api/nutrition/crisis-campaign/<campaign_id>/resume', methods=['POST'])
+def resume_crisis_campaign(campaign_id):
+    """Continue an interrupted or cancelled campaign, skipping the labels it already generated"""
+    directory = known_campaign(campaign_id)
+    if directory is None:
+        return jsonify({"error": f"Unknown campaign: {campaign_id}"}), 404
+    campaign = CrisisCampaign.resume(crisis_generator, directory, max_workers=CAMPAIGN_MAX_WORKERS)
+    try:
+        start_campaign(campaign_id, campaign)
+    except CampaignRunning:
+        return jsonify({"error": f"Campaign {campaign_id} is already running"}), 409
+    logger.info(f"Resuming crisis campaign {campaign_id}: {campaign.resumed} labels already generated")
+    return campaign_status(campaign_id, read_progress(directory), 202)
+
+def job_status(job, status=200):
+    return jsonify({"success": True, **job.to_dict()}), status
+
+@app.route('/api/nutrition/jobs', methods=['POST'])
+def submit_label_jobs():
+    """Queue label generation and return at once with job ids
+
+    Takes one product (-> "job_id") or {"products": [...], "markets": [...]}
+    (-> "job_ids", one job per product × market, in order). Invalid products
+    are rejected before anything is queued. Results are retrieved with
+    GET /api/nutrition/jobs/<job_id>, by polling, long-polling (?wait=) or
+    from the /events stream.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid input data - JSON required"}), 400
+        try:
+            encoder = requested_encoder()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        single = "products" not in data
+        if single:
+            products = [data]
+        else:
+            markets = data.get("markets") or []
+            if not isinstance(data["products"], list) or not isinstance(markets, list) \
+                    or not all(isinstance(m, str) for m in markets):
+                return jsonify({"error": "'products' must be a list of products and 'markets' a list of market names"}), 400
+            products = list(expand_items(data["products"], markets))
+        if len(products) > JOB_SUBMIT_LIMIT:
+            return jsonify({"error": f"At most {JOB_SUBMIT_LIMIT} jobs per request"}), 413
+        for index, product in enumerate(products):
+            error = validate_product_data(product)
+            if error:
+                return jsonify({"error": error if single else f"Item {index}: {error}"}), 400
+
+        # Sampled requests pass their trace on, so each job's spans continue it
+        traceparent = getattr(TRACER.current_span(), "traceparent", None)
+        jobs = job_queue.submit_many("label", [{"product": product, "encoder": encoder, "traceparent": traceparent}
+                                               for product in products])
+        job_workers.ensure_started()
+        logger.info(f"Queued {len(jobs)} label jobs")
+        if single:
+            return job_status(jobs[0], 202)
+        return jsonify({"success": True, "job_ids": [job.job_id for job in jobs]}), 202
+
+    except Exception as e:
+        logger.error(f"Unexpected error in submit_label_jobs: {e}")
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@app.route('/api/nutrition/jobs/<job_id>', methods=['GET'])
+def get_label_job(job_id):
+    """Status of a job, with its result once completed; ?wait=<seconds> long-polls until it finishes"""
+    wait = min(request.args.get("wait", 0, type=float), JOB_MAX_WAIT)
+    job = job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return job_status(job)
+
+@app.route('/api/nutrition/jobs/<job_id>/events', methods=['GET'])
+def label_job_events(job_id):
+    """Server-sent events: one event per status change, named after the status, until the job finishes"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+
+    def events(job):
+        while True:
+            yield f"event: {job.status}\ndata: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+            status = job.status
+            while True:
+                if job.done:
+                    return
+                job = job_queue.wait(job_id, JOB_EVENTS_HEARTBEAT, status)
+                if job is None:
+                    return
+                if job.status != status:
+                    break
+                # Keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+
+    return Response(stream_with_context(events(job)), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({"error": "Endpoint not found"}), 404
@@ -135,6 +591,11 @@ def not_found(error):
 def method_not_allowed(error):
     return jsonify({"error": "Method not allowed"}), 405
 
+@app.errorhandler(BedrockOverloadedError)
+def bedrock_overloaded(error):
+    logger.warning(f"Shedding request: {error}")
+    return jsonify({"error": str(error)}), 503, {"Retry-After": str(BEDROCK_RETRY_AFTER)}
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({"error": "Internal server error"}), 500
@@ -145,5 +606,7 @@ if __name__ == '__main__':
     
     logger.info(f"Starting Nutrition Label Generator API on port {port}")
     logger.info(f"Debug mode: {debug}")
+    warm_up()
+    job_workers.ensure_started()
     
     app.run(host='0.0.0.0', port=port, debug=debug)
\ No newline at end of file
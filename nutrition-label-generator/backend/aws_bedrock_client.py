@@ -3,11 +3,17 @@ AWS Bedrock Client for SmartLabel AI Nutrition Label Generator
 Handles AI-powered content generation for nutrition labels across multiple markets
 """
 
-import boto3
+import contextvars
 import json
 import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict, List, Optional
 from dataclasses import dataclass
+from llm_cache import ResponseCache, response_cache_key
+from metrics import BEDROCK_SECONDS, ERRORS, STAGE_SECONDS
+from tracing import TRACER
 
 logger = logging.getLogger(__name__)
 
@@ -27,11 +33,55 @@ class NutritionData:
 class BedrockClient:
     """AWS Bedrock client for nutrition label content generation"""
     
-    def __init__(self, region: str = "us-east-1", model_id: str = "anthropic.claude-3-5-sonnet-20241022-v2:0"):
+    def __init__(self, region: str = "us-east-1", model_id: str = "anthropic.claude-3-5-sonnet-20241022-v2:0",
+                 response_cache: Optional[ResponseCache] = None, max_pool_connections: int = 10,
+                 endpoint_url: Optional[str] = None):
         self.region = region
         self.model_id = model_id
-        self.client = boto3.client('bedrock-runtime', region_name=region)
+        self.endpoint_url = endpoint_url
+        self.max_pool_connections = max_pool_connections
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.response_cache = response_cache
+        self.generation_params = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 4000
+        }
         
+    @property
+    def client(self):
+        """The boto3 bedrock-runtime client, created on first use
+
+        boto3 takes a few hundred milliseconds to import and set up, which
+        would otherwise be paid at every cold start, even when no request
+        needs Bedrock (mock content, cached responses).
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+                    self._client = boto3.client(
+                        'bedrock-runtime',
+                        region_name=self.region,
+                        endpoint_url=self.endpoint_url,
+                        config=Config(
+                            max_pool_connections=self.max_pool_connections,
+                            retries={"max_attempts": 4, "mode": "adaptive"}
+                        )
+                    )
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def reset_client(self):
+        """Replace the boto3 client with a new one, e.g. in a process forked from the one that created it"""
+        with self._client_lock:
+            self._client = None
+        return self.client
+
     def generate_nutrition_content(self, product_data: Dict, market: str) -> NutritionData:
         """
         Generate nutrition label content using AWS Bedrock
@@ -47,7 +97,8 @@ class BedrockClient:
             # For demo purposes, return mock data instead of calling Bedrock
             # TODO: Replace with actual Bedrock call when model is available
             logger.info("Using mock data for nutrition content generation")
-            return self._generate_mock_content(product_data, market)
+            with STAGE_SECONDS.time(stage="bedrock", market=market):
+                return self._generate_mock_content(product_data, market)
             
             # Uncomment when Bedrock model is available:
             # prompt = self._build_prompt(product_data, market)
@@ -218,11 +269,26 @@ IMPORTANT:
         return prompt
     
     def _call_bedrock(self, prompt: str) -> str:
-        """Call AWS Bedrock with the prompt"""
+        """Call AWS Bedrock with the prompt, answering repeated prompts from the response cache"""
+        with TRACER.span("bedrock.invoke", model_id=self.model_id, prompt_chars=len(prompt)) as span:
+            text, cached = self._invoke_model(prompt)
+            span.set_attribute("cached", cached)
+            return text
+
+    def _invoke_model(self, prompt: str):
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = response_cache_key(self.model_id, prompt, self.generation_params)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Using cached Bedrock response")
+                BEDROCK_SECONDS.observe(0.0, operation="invoke", outcome="cached")
+                return cached, True
+        
+        start = time.perf_counter()
         try:
             body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 4000,
+                **self.generation_params,
                 "messages": [
                     {
                         "role": "user",
@@ -238,14 +304,21 @@ IMPORTANT:
             )
             
             response_body = json.loads(response['body'].read())
-            return response_body['content'][0]['text']
+            text = response_body['content'][0]['text']
+            BEDROCK_SECONDS.observe(time.perf_counter() - start, operation="invoke", outcome="ok")
+            if cache_key is not None:
+                self.response_cache.put(cache_key, text)
+            return text, False
             
         except Exception as e:
             logger.error(f"Error calling Bedrock: {str(e)}")
+            BEDROCK_SECONDS.observe(time.perf_counter() - start, operation="invoke", outcome="error")
+            ERRORS.inc(stage="bedrock", type=type(e).__name__)
             raise
     
     def _parse_response(self, response_text: str) -> NutritionData:
         """Parse Bedrock response into structured data"""
+        start = time.perf_counter()
         try:
             # Extract JSON from response
             start_idx = response_text.find('{')
@@ -257,7 +330,7 @@ IMPORTANT:
             json_text = response_text[start_idx:end_idx]
             data = json.loads(json_text)
             
-            return NutritionData(
+            parsed = NutritionData(
                 serving_size=data['nutrition_facts']['serving_size'],
                 servings_per_container=data['nutrition_facts']['servings_per_container'],
                 calories=data['nutrition_facts']['calories'],
@@ -268,9 +341,13 @@ IMPORTANT:
                 regulatory_notes=data['regulatory_notes'],
                 market_specific_warnings=data['market_specific_warnings']
             )
+            BEDROCK_SECONDS.observe(time.perf_counter() - start, operation="parse", outcome="ok")
+            return parsed
             
         except Exception as e:
             logger.error(f"Error parsing response: {str(e)}")
+            BEDROCK_SECONDS.observe(time.perf_counter() - start, operation="parse", outcome="fallback")
+            ERRORS.inc(stage="parse", type=type(e).__name__)
             # Return fallback data
             return NutritionData(
                 serving_size="1 serving",
@@ -284,6 +361,90 @@ IMPORTANT:
                 market_specific_warnings=""
             )
 
+class BedrockOverloadedError(RuntimeError):
+    """Raised when more Bedrock requests are queued than the client accepts"""
+
+
+class ConcurrentBedrockClient:
+    """Keeps up to ``max_concurrency`` Bedrock requests in flight from one process
+
+    Requests run on a dedicated thread pool sized to the botocore connection
+    pool of the wrapped BedrockClient. At most ``max_queue`` further requests
+    may wait for a free slot; beyond that, submissions fail fast with
+    BedrockOverloadedError so callers can shed load instead of piling up.
+    Both a Future-based API (for Flask handlers and worker threads) and
+    asyncio coroutines are provided.
+    """
+
+    def __init__(self, bedrock_client: BedrockClient, max_concurrency: int = 8, max_queue: int = 64):
+        self.bedrock_client = bedrock_client
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(max_concurrency + max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="bedrock")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    @classmethod
+    def create(cls, region: str = "us-east-1", model_id: str = "anthropic.claude-3-5-sonnet-20241022-v2:0",
+               max_concurrency: int = 8, max_queue: int = 64, **client_kwargs) -> "ConcurrentBedrockClient":
+        """Build a BedrockClient whose connection pool matches the concurrency"""
+        client = BedrockClient(region=region, model_id=model_id,
+                               max_pool_connections=max_concurrency, **client_kwargs)
+        return cls(client, max_concurrency=max_concurrency, max_queue=max_queue)
+
+    def submit_prompt(self, prompt: str) -> Future:
+        """Send a prompt to Bedrock; the Future resolves to the response text"""
+        return self._submit(self.bedrock_client._call_bedrock, prompt)
+
+    def submit_nutrition_content(self, product_data: Dict, market: str) -> Future:
+        """Generate nutrition content; the Future resolves to NutritionData"""
+        return self._submit(self.bedrock_client.generate_nutrition_content, product_data, market)
+
+    async def call_bedrock(self, prompt: str) -> str:
+        import asyncio
+        return await asyncio.wrap_future(self.submit_prompt(prompt))
+
+    async def generate_nutrition_content(self, product_data: Dict, market: str) -> NutritionData:
+        import asyncio
+        return await asyncio.wrap_future(self.submit_nutrition_content(product_data, market))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def _submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise BedrockOverloadedError(
+                f"Bedrock request queue is full ({self.max_concurrency} in flight, {self.max_queue} queued)"
+            )
+        try:
+            # Run in the caller's context, so the Bedrock span joins the request's trace
+            return self._executor.submit(contextvars.copy_context().run, self._run, fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _run(self, fn, *args):
+        with self._lock:
+            self.in_flight += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
 # Crisis response functionality
 class CrisisResponseGenerator:
     """Handle crisis response for nutrition labels"""
@@ -0,0 +1,106 @@
+"""
+Batch label generation for SmartLabel AI Nutrition Label Generator
+Runs many products × markets through NutritionLabelGenerator with bounded concurrency
+"""
+
+import contextvars
+import json
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from label_generator import NutritionLabelGenerator, validate_product_data
+
+logger = logging.getLogger(__name__)
+
+
+def parse_ndjson(lines: Iterable) -> Iterator:
+    """Parse newline-delimited JSON; malformed lines yield a ValueError in place of the item"""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ValueError(f"Invalid JSON line: {e}")
+
+
+def expand_items(products: Iterable, markets: Optional[List[str]] = None) -> Iterator:
+    """Expand products × markets; without markets each product keeps its own market"""
+    for product in products:
+        if markets and isinstance(product, dict):
+            for market in markets:
+                yield {**product, "market": market}
+        else:
+            yield product
+
+
+class BatchLabelGenerator:
+    """Generate labels for many items, yielding per-item results as they complete"""
+
+    def __init__(self, label_generator: NutritionLabelGenerator, max_workers: int = 4):
+        self.label_generator = label_generator
+        self.max_workers = max(1, max_workers)
+
+    def generate(self, items: Iterable) -> Iterator[Dict]:
+        """
+        Generate labels for items, in completion order
+
+        At most ``max_workers`` labels are generated at once and only
+        ``2 * max_workers`` items are pulled from ``items`` ahead of the
+        results, so arbitrarily long (streamed) inputs use bounded memory.
+        A failing item produces an error result instead of stopping the batch.
+
+        Yields:
+            dict: {"index", "success", ...label result or "error"}
+        """
+        items = enumerate(items)
+        window = 2 * self.max_workers
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch-label") as executor:
+            pending = {}
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < window:
+                    try:
+                        index, item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    # In the caller's context, so the item's spans join the request's trace
+                    pending[executor.submit(contextvars.copy_context().run, self._generate_one, item)] = (index, item)
+
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, item = pending.pop(future)
+                    yield {"index": index, **future.result()}
+
+    def _generate_one(self, item) -> Dict:
+        base = {"product_name": None, "market": None}
+        if isinstance(item, dict):
+            base = {"product_name": item.get("product_name"), "market": item.get("market", "spain")}
+        if isinstance(item, Exception):
+            return {**base, "success": False, "error": str(item)}
+
+        error = validate_product_data(item)
+        if error:
+            return {**base, "success": False, "error": error}
+        try:
+            result = self.label_generator.generate_label(item)
+        except Exception as e:
+            logger.error(f"Batch item failed for {base['product_name']}: {e}")
+            return {**base, "success": False, "error": str(e)}
+        if result.get("error"):
+            return {**base, "success": False, "error": result["error"]}
+        return {
+            **base,
+            "success": True,
+            "image_base64": result["image_base64"],
+            "label_data": result["label_data"],
+            "filename": result["filename"],
+        }
@@ -0,0 +1,422 @@
+"""
+Micro-benchmarks for SmartLabel AI Nutrition Label Generator
+Run all benchmarks, or a single one by name:
+
+    python benchmarks.py
+    python benchmarks.py market_lookup
+"""
+
+import sys
+import os
+import time
+import timeit
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+MARKETS = ["spain", "angola", "macau", "brazil", "halal"]
+
+
+def _report(name: str, seconds: float, iterations: int):
+    per_call_us = seconds / iterations * 1e6
+    print(f"   {name:<40} {per_call_us:10.3f} µs/call")
+    return per_call_us
+
+
+def bench_market_lookup(iterations: int = 20000):
+    """Per-request market lookup: rebuilding the regulations vs the shared registry"""
+    from market_regulations import (
+        MARKET_REGISTRY, MarketRegistry, _build_regulations, get_market_data
+    )
+
+    print("📊 Market lookup (3 lookups per request, as in generate_label)")
+
+    def rebuild_per_call():
+        # Previous behaviour: every get_market_data() built a fresh MarketRegulations
+        for market in MARKETS[:3]:
+            MarketRegistry(_build_regulations()).get_legacy_view(market)
+
+    def registry_lookup():
+        for market in MARKETS[:3]:
+            get_market_data(market)
+
+    def regulation_lookup():
+        for market in MARKETS[:3]:
+            MARKET_REGISTRY.get(market)
+
+    legacy = _report("rebuild per call", timeit.timeit(rebuild_per_call, number=iterations // 10), iterations // 10)
+    shared = _report("shared registry (get_market_data)", timeit.timeit(registry_lookup, number=iterations), iterations)
+    _report("shared registry (MARKET_REGISTRY.get)", timeit.timeit(regulation_lookup, number=iterations), iterations)
+    print(f"   speedup: {legacy / shared:.0f}x")
+
+
+def bench_font_loading(iterations: int = 2000):
+    """Per-label font loading: parsing TTF files vs the shared font cache"""
+    from PIL import ImageFont
+    from visual_label_creator import FONT_CACHE, FontCache, NutritionLabelCreator, font_cache_stats
+
+    print("📊 Font loading (4 fonts per label, as in create_label)")
+    font_reqs = {"title_font_size": 16, "body_font_size": 12, "allergen_font_size": 10}
+    regular = getattr(FONT_CACHE.get(12), "path", None)
+    bold = getattr(FONT_CACHE.get(12, "bold"), "path", None)
+    if regular is None or bold is None:
+        print("   ⚠️  No TrueType font available; skipping")
+        return
+
+    def parse_per_label():
+        # Previous behaviour: four ImageFont.truetype calls for every label
+        ImageFont.truetype(regular, font_reqs["title_font_size"])
+        ImageFont.truetype(regular, font_reqs["body_font_size"])
+        ImageFont.truetype(regular, font_reqs["allergen_font_size"])
+        ImageFont.truetype(bold, font_reqs["body_font_size"])
+
+    creator = NutritionLabelCreator(font_cache=FontCache())
+
+    def cached():
+        creator._load_fonts(font_reqs)
+
+    uncached = _report("truetype per label", timeit.timeit(parse_per_label, number=iterations), iterations)
+    shared = _report("shared font cache", timeit.timeit(cached, number=iterations), iterations)
+    print(f"   speedup: {uncached / shared:.0f}x, cache stats: {creator.font_cache.stats()}")
+    print(f"   process-wide: {font_cache_stats()}")
+
+
+def bench_text_wrapping(iterations: int = 20):
+    """Wrapping a long ingredient declaration: per-word textbbox vs wrap_text"""
+    from PIL import Image, ImageDraw
+    from visual_label_creator import FONT_CACHE, text_width, wrap_text
+
+    words = ("Harina de trigo, azúcar, aceite de palma, cacao desgrasado en polvo (4%), "
+             "suero de leche en polvo, emulgente (lecitina de soja), sal, aroma.").split()
+    ingredients = " ".join(words * 40)
+    print(f"📊 Text wrapping ({len(ingredients.split())} words, 380px lines)")
+    font = FONT_CACHE.get(12)
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+
+    def textbbox_per_word():
+        # Previous behaviour: re-measure the whole growing line for every word
+        lines, current_line = [], ""
+        for word in ingredients.split():
+            test_line = current_line + " " + word if current_line else word
+            bbox = draw.textbbox((0, 0), test_line, font=font)
+            if bbox[2] - bbox[0] <= 380:
+                current_line = test_line
+            else:
+                if current_line:
+                    lines.append(current_line)
+                current_line = word
+        if current_line:
+            lines.append(current_line)
+
+    def wrap_cold():
+        text_width.cache_clear()
+        wrap_text(ingredients, font, 380)
+
+    def wrap_warm():
+        wrap_text(ingredients, font, 380)
+
+    legacy = _report("textbbox per word", timeit.timeit(textbbox_per_word, number=iterations), iterations)
+    cold = _report("wrap_text (cold metrics cache)", timeit.timeit(wrap_cold, number=iterations), iterations)
+    warm = _report("wrap_text (warm metrics cache)", timeit.timeit(wrap_warm, number=iterations), iterations)
+    print(f"   speedup: {legacy / cold:.0f}x cold, {legacy / warm:.0f}x warm")
+
+
+def bench_render_scaling(labels: int = 160):
+    """Concurrent label renders: threads in one process vs the process render pool"""
+    from concurrent.futures import ThreadPoolExecutor
+    from render_pool import LocalRenderer, ProcessRenderPool
+    from sample_data import SAMPLE_LABEL
+
+    print(f"📊 Render scaling ({labels} labels, render + PNG encode, {os.cpu_count()} CPUs)")
+    jobs = [(SAMPLE_LABEL, MARKETS[i % len(MARKETS)]) for i in range(labels)]
+
+    def throughput(renderer, workers):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            start = timeit.default_timer()
+            list(executor.map(lambda job: renderer.render(*job), jobs))
+            return labels / (timeit.default_timer() - start)
+
+    local = LocalRenderer()
+    local.render(*jobs[0])
+    single = throughput(local, 1)
+    print(f"   {'1 thread':<40} {single:10.1f} labels/s")
+    print(f"   {'8 threads (one process)':<40} {throughput(local, 8):10.1f} labels/s")
+    for processes in (1, 2, 4, 8):
+        pool = ProcessRenderPool(processes)
+        try:
+            pool.warm_up()
+            rate = throughput(pool, processes * 2)
+        finally:
+            pool.close()
+        print(f"   {f'{processes} render processes':<40} {rate:10.1f} labels/s  ({rate / single:.1f}x)")
+
+
+def bench_encoders(iterations: int = 20):
+    """Encode time and output size of every label encoder"""
+    from label_encoder import ENCODERS
+    from visual_label_creator import NutritionLabelCreator
+    from sample_data import SAMPLE_LABEL
+
+    creator = NutritionLabelCreator()
+    labels = {
+        "label": creator.create_label(SAMPLE_LABEL, "spain"),
+        "crisis label": creator.create_label(SAMPLE_LABEL, "spain", "recall"),
+    }
+    for title, image in labels.items():
+        print(f"📊 Encoders ({title}, {image.width}x{image.height})")
+        baseline = len(ENCODERS["png"].encode(image))
+        for name, encoder in ENCODERS.items():
+            if encoder.vector:
+                continue
+            size = len(encoder.encode(image))
+            per_call_ms = timeit.timeit(lambda: encoder.encode(image), number=iterations) / iterations * 1e3
+            print(f"   {name:<24} {per_call_ms:8.2f} ms/encode {size:9d} bytes ({size / baseline:4.0%} of png)")
+
+
+def bench_vector_output(iterations: int = 5):
+    """Print output: upscaling the raster label to 300 DPI vs SVG/PDF from the layout"""
+    import tempfile
+    from vector_label import VectorLabelRenderer
+    from visual_label_creator import NutritionLabelCreator
+    from sample_data import SAMPLE_LABEL
+
+    print("📊 Print-quality output (crisis label)")
+    creator = NutritionLabelCreator()
+    vector = VectorLabelRenderer(creator)
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = {
+            "raster + save_label(dpi=300)": (os.path.join(tmp, "label.png"), lambda path: creator.save_label(
+                creator.create_label(SAMPLE_LABEL, "spain", "recall"), path)),
+            "SVG": (os.path.join(tmp, "label.svg"), lambda path: vector.save_label(SAMPLE_LABEL, "spain", path, "recall")),
+            "PDF": (os.path.join(tmp, "label.pdf"), lambda path: vector.save_label(SAMPLE_LABEL, "spain", path, "recall")),
+        }
+        for name, (path, save) in outputs.items():
+            save(path)
+            per_call_ms = timeit.timeit(lambda: save(path), number=iterations) / iterations * 1e3
+            print(f"   {name:<32} {per_call_ms:8.2f} ms {os.path.getsize(path):10d} bytes")
+
+
+def bench_label_sizes(iterations: int = 5):
+    """Preview, thumbnail and 300 DPI print: render-then-resize vs native scaled drawing"""
+    from PIL import Image
+    from visual_label_creator import LABEL_SIZES, NutritionLabelCreator
+    from sample_data import SAMPLE_LABEL
+
+    print("📊 Label sizes (preview + thumbnail + print)")
+    creator = NutritionLabelCreator()
+    creator.create_label_sizes(SAMPLE_LABEL, "spain")
+
+    def resize_each():
+        # Previous behaviour: one full render per output, then LANCZOS resampling
+        for scale in LABEL_SIZES.values():
+            img = creator.create_label(SAMPLE_LABEL, "spain")
+            img.resize((int(img.width * scale), int(img.height * scale)), Image.Resampling.LANCZOS)
+
+    def native():
+        creator.create_label_sizes(SAMPLE_LABEL, "spain")
+
+    legacy = timeit.timeit(resize_each, number=iterations) / iterations * 1e3
+    scaled = timeit.timeit(native, number=iterations) / iterations * 1e3
+    print(f"   {'render + resize per size':<40} {legacy:10.2f} ms")
+    print(f"   {'one layout, drawn at each size':<40} {scaled:10.2f} ms")
+    print(f"   speedup: {legacy / scaled:.1f}x")
+
+
+def bench_label_templates(iterations: int = 50):
+    """Per-label rendering: drawing every section vs pasting the compiled market template"""
+    from PIL import Image, ImageDraw
+    from visual_label_creator import NutritionLabelCreator
+    from sample_data import SAMPLE_LABEL
+
+    print("📊 Label templates")
+    creator = NutritionLabelCreator()
+    creator.preload_fonts()
+    layout = creator.record_layout(SAMPLE_LABEL, "spain")
+
+    def direct():
+        # Previous behaviour: every text run of the label is rasterized per request
+        img = Image.new("RGB", (layout.width, layout.height), layout.background)
+        layout.replay(ImageDraw.Draw(img))
+
+    def template():
+        creator.render_layout(layout)
+
+    drawn = timeit.timeit(direct, number=iterations) / iterations * 1e3
+    pasted = timeit.timeit(template, number=iterations) / iterations * 1e3
+    compile_ms = timeit.timeit(lambda: creator._compile_template(
+        "spain", creator.regulations.get_regulation("spain"),
+        creator._load_fonts(creator.regulations.get_regulation("spain").font_requirements), layout.width),
+        number=iterations) / iterations * 1e3
+    print(f"   {'draw every section':<40} {drawn:10.2f} ms")
+    print(f"   {'paste static strips, draw values':<40} {pasted:10.2f} ms")
+    print(f"   {'compile one market template':<40} {compile_ms:10.2f} ms")
+    print(f"   speedup: {drawn / pasted:.1f}x")
+
+
+def bench_crisis_banners(labels: int = 100):
+    """Mass recall re-labeling: drawing each crisis banner vs the precomputed banner matrix"""
+    from market_regulations import MARKET_REGISTRY
+    from visual_label_creator import NutritionLabelCreator
+    from sample_data import SAMPLE_LABEL
+
+    print(f"📊 Crisis banners ({labels} recall labels)")
+    creator = NutritionLabelCreator()
+    banners = 0
+
+    def precompute():
+        nonlocal banners
+        banners = creator.precompute_crisis_banners()
+
+    elapsed = timeit.timeit(precompute, number=1) * 1e3
+    print(f"   {f'precompute {banners} banners':<40} {elapsed:10.2f} ms")
+    markets = MARKET_REGISTRY.markets
+
+    def relabel(precomputed: bool):
+        for index in range(labels):
+            if not precomputed:
+                # Previous behaviour: the banner text is wrapped and drawn for every label
+                creator._banners.clear()
+            creator.create_label(dict(SAMPLE_LABEL, calories=str(index)), markets[index % len(markets)], "recall")
+
+    drawn = timeit.timeit(lambda: relabel(False), number=1) / labels * 1e3
+    creator.precompute_crisis_banners()
+    cached = timeit.timeit(lambda: relabel(True), number=1) / labels * 1e3
+    print(f"   {'draw banner per label':<40} {drawn:10.2f} ms")
+    print(f"   {'composite precomputed banner':<40} {cached:10.2f} ms")
+    print(f"   speedup: {drawn / cached:.1f}x")
+
+
+def bench_crisis_rerender(labels: int = 50):
+    """Crisis label for a product with a cached regular label: full generation vs compositing the banner"""
+    from aws_bedrock_client import BedrockClient
+    from crisis_response import CrisisResponseGenerator
+    from label_cache import LabelCache
+    from visual_label_creator import NutritionLabelCreator
+    from sample_data import SAMPLE_PRODUCT
+
+    print(f"📊 Crisis re-render ({labels} labels, mock Bedrock)")
+    creator = NutritionLabelCreator()
+    creator.preload_fonts()
+    products = [dict(SAMPLE_PRODUCT, product_name=f"Product {index}") for index in range(labels)]
+
+    def crisis_labels(incremental: bool):
+        generator = CrisisResponseGenerator(BedrockClient(), creator, LabelCache(max_entries=4 * labels))
+        for product in products:
+            generator.label_generator.generate_label(product)
+            if not incremental:
+                # Previous behaviour: the crisis label is generated from scratch
+                generator.cache.clear()
+        start = time.perf_counter()
+        for product in products:
+            generator.generate_crisis_label(product, {"type": "recall", "details": "Batch 42"})
+        return (time.perf_counter() - start) / labels * 1e3
+
+    full = crisis_labels(False)
+    incremental = crisis_labels(True)
+    print(f"   {'content + full render':<40} {full:10.2f} ms")
+    print(f"   {'banner onto cached label':<40} {incremental:10.2f} ms")
+    print(f"   speedup: {full / incremental:.1f}x (excluding the Bedrock call it also skips)")
+
+
+def bench_daily_values(products: int = 10000):
+    """Catalog-wide DV%: scalar get_daily_value_percentage calls vs the standards matrix"""
+    import numpy as np
+    from daily_values import get_daily_value_standards
+    from market_regulations import MarketRegulations
+
+    standards = get_daily_value_standards()
+    print(f"📊 Daily values ({products} products × {len(standards.nutrients)} nutrients × "
+          f"{len(standards.markets)} markets)")
+    amounts = np.random.default_rng(0).uniform(0, 300, size=(products, len(standards.nutrients)))
+    rows = amounts.tolist()
+    regulations = MarketRegulations()
+
+    def scalar():
+        for market in standards.markets:
+            for row in rows:
+                for nutrient, amount in zip(standards.nutrients, row):
+                    regulations.get_daily_value_percentage(nutrient, amount, market)
+
+    looped = timeit.timeit(scalar, number=1) * 1e3
+    vectorized = timeit.timeit(lambda: standards.percentages(amounts), number=10) / 10 * 1e3
+    print(f"   {'scalar calls':<40} {looped:10.2f} ms")
+    print(f"   {'vectorized':<40} {vectorized:10.2f} ms")
+    print(f"   speedup: {looped / vectorized:.0f}x")
+
+
+def bench_metrics(iterations: int = 100000):
+    """Cost of the pipeline's stage timers and counters, against a ~30 ms label render"""
+    from metrics import MetricsRegistry
+
+    print("📊 Metrics overhead (per instrumented stage)")
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_seconds", "", ("stage", "market"))
+    counter = registry.counter("bench_total", "", ("market", "outcome"))
+
+    def timed():
+        with histogram.time(stage="draw", market="spain"):
+            pass
+
+    _report("empty block", timeit.timeit(lambda: None, number=iterations), iterations)
+    timer = _report("timed block", timeit.timeit(timed, number=iterations), iterations)
+    _report("counter increment", timeit.timeit(lambda: counter.inc(market="spain", outcome="cached"),
+                                               number=iterations), iterations)
+    # Seven timed stages and two counters per generated label
+    print(f"   per label: ~{9 * timer:.0f} µs, {9 * timer / 30000 * 100:.2f}% of a 30 ms render")
+
+
+def bench_tracing(iterations: int = 100000):
+    """Cost of a pipeline span when tracing is off, sampled out, and sampled into a JSON file"""
+    import tempfile
+    from tracing import JsonFileExporter, Tracer
+
+    print("📊 Tracing overhead (per span)")
+    tracer = Tracer()
+
+    def traced():
+        with tracer.start_trace("request"):
+            for _ in range(8):
+                with tracer.span("stage", market="spain"):
+                    pass
+
+    runs = iterations // 10
+    _report("off (no exporter)", timeit.timeit(traced, number=runs), runs * 9)
+    with tempfile.TemporaryDirectory() as directory:
+        tracer.configure(JsonFileExporter(os.path.join(directory, "traces.jsonl")), sample_rate=1e-9)
+        _report("on, trace not sampled", timeit.timeit(traced, number=runs), runs * 9)
+        tracer.configure(tracer.exporter, sample_rate=1.0)
+        sampled = _report("on, sampled, JSON file", timeit.timeit(traced, number=runs // 10), runs // 10 * 9)
+    # About nine spans per generated label
+    print(f"   sampled label: ~{9 * sampled:.0f} µs; at TRACE_SAMPLE_RATE=0.01 ~{0.09 * sampled:.1f} µs per label")
+
+
+BENCHMARKS = {
+    "market_lookup": bench_market_lookup,
+    "font_loading": bench_font_loading,
+    "text_wrapping": bench_text_wrapping,
+    "render_scaling": bench_render_scaling,
+    "encoders": bench_encoders,
+    "vector_output": bench_vector_output,
+    "label_sizes": bench_label_sizes,
+    "label_templates": bench_label_templates,
+    "crisis_banners": bench_crisis_banners,
+    "crisis_rerender": bench_crisis_rerender,
+    "daily_values": bench_daily_values,
+    "metrics": bench_metrics,
+    "tracing": bench_tracing,
+}
+
+
+def main():
+    """Run the selected benchmarks"""
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        if name not in BENCHMARKS:
+            print(f"❌ Unknown benchmark: {name} (available: {', '.join(BENCHMARKS)})")
+            continue
+        BENCHMARKS[name]()
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+"""
+Crisis re-labeling campaigns for SmartLabel AI Nutrition Label Generator
+Regenerates crisis labels for every selected product × market, in priority order, with progress and resume
+"""
+
+import base64
+import fcntl
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from batch_generator import parse_ndjson
+from crisis_response import CrisisResponseGenerator
+from label_cache import label_cache_key, normalize_product
+from label_generator import validate_product_data
+from market_regulations import MARKET_REGISTRY
+from tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+CAMPAIGN_FILE = "campaign.json"
+RESULTS_FILE = "results.jsonl"
+LABELS_DIR = "labels"
+# Run state shared by every process serving the campaign: run() holds an
+# exclusive lock on LOCK_FILE, STATUS_FILE records the last run, and
+# CANCEL_FILE asks the running process to stop
+LOCK_FILE = "run.lock"
+STATUS_FILE = "status.json"
+CANCEL_FILE = "cancel"
+
+# Products without a "priority" field; lower priorities are generated first
+DEFAULT_PRIORITY = 100
+
+
+class CampaignRunning(RuntimeError):
+    """The campaign is already being run, possibly by another process"""
+
+
+def load_catalog(path: str) -> List[Dict]:
+    """Read a product catalog: a JSON array or newline-delimited JSON"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    products = []
+    for number, product in enumerate(parse_ndjson(text.splitlines()), 1):
+        if isinstance(product, Exception):
+            raise ValueError(f"{path}: product {number}: {product}")
+        products.append(product)
+    return products
+
+
+def _text(value: Any) -> str:
+    return str(value).strip().lower()
+
+
+def matches(product: Dict, where: Optional[Dict] = None, contains: Optional[Dict] = None) -> bool:
+    """Whether a product passes a selector filter
+
+    ``where`` maps fields to a value or a list of accepted values (list
+    fields such as certifications match if any element is accepted);
+    ``contains`` maps fields to text that must occur in them, e.g.
+    {"ingredients": "peanut"}. Comparisons ignore case.
+    """
+    for field, expected in (where or {}).items():
+        accepted = {_text(option) for option in (expected if isinstance(expected, list) else [expected])}
+        value = product.get(field)
+        values = value if isinstance(value, list) else [value]
+        if not any(value is not None and _text(value) in accepted for value in values):
+            return False
+    for field, needle in (contains or {}).items():
+        value = product.get(field)
+        haystack = " ".join(map(str, value)) if isinstance(value, list) else str(value or "")
+        if _text(needle) not in haystack.lower():
+            return False
+    return True
+
+
+def select_products(selector: Dict, catalog_dir: Optional[str] = None) -> List[Dict]:
+    """Products selected for a campaign
+
+    The selector is {"products": [...]} for an explicit list, or
+    {"catalog": path, "where": {...}, "contains": {...}} to filter a
+    catalog file (see matches). When ``catalog_dir`` is given, catalog
+    paths are resolved inside it and may not leave it.
+    """
+    if isinstance(selector.get("products"), list):
+        products = selector["products"]
+    elif selector.get("catalog"):
+        path = selector["catalog"]
+        if catalog_dir is not None:
+            root = os.path.realpath(catalog_dir)
+            path = os.path.realpath(os.path.join(root, path))
+            if os.path.commonpath([root, path]) != root:
+                raise ValueError(f"Catalog must be inside {catalog_dir}")
+        products = load_catalog(path)
+    else:
+        raise ValueError("Selector requires 'products' or 'catalog'")
+    return [product for product in products
+            if isinstance(product, dict) and matches(product, selector.get("where"), selector.get("contains"))]
+
+
+def unique_products(products: List[Dict]) -> List[Dict]:
+    """Products in order without repeats (equal once normalized, as in label cache keys)"""
+    seen = set()
+    unique = []
+    for product in products:
+        key = json.dumps(normalize_product(product), sort_keys=True, ensure_ascii=False)
+        if key not in seen:
+            seen.add(key)
+            unique.append(product)
+    return unique
+
+
+def default_priority(product: Dict, market: str, markets: List[str]) -> Tuple:
+    """The product's "priority" field (default 100), then the order of the campaign markets"""
+    try:
+        priority = float(product.get("priority", DEFAULT_PRIORITY))
+    except (TypeError, ValueError):
+        priority = DEFAULT_PRIORITY
+    return priority, markets.index(market) if market in markets else len(markets)
+
+
+def _apply_result(succeeded: Dict[str, Dict], failed: Dict[str, Dict], entry: Dict):
+    if entry["success"]:
+        succeeded[entry["item_id"]] = entry
+        failed.pop(entry["item_id"], None)
+    else:
+        failed[entry["item_id"]] = entry
+
+
+def _read_results(directory: str) -> List[Dict]:
+    """The recorded results of a campaign, in the order they finished"""
+    path = os.path.join(directory, RESULTS_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    # A line cut off by an interruption is skipped; its item is generated again
+    return [entry for entry in parse_ndjson(lines) if isinstance(entry, dict) and "item_id" in entry]
+
+
+def _progress(status: str, total: int, succeeded: int, failed: int, resumed: int, elapsed: float,
+              processed: int) -> Dict:
+    rate = processed / elapsed if elapsed else 0.0
+    remaining = total - succeeded
+    return {
+        "status": status,
+        "total": total,
+        "succeeded": succeeded,
+        "failed": failed,
+        "remaining": remaining,
+        "resumed": resumed,
+        "percent": round(100.0 * succeeded / total, 1) if total else 100.0,
+        "elapsed_seconds": round(elapsed, 2),
+        "labels_per_second": round(rate, 2),
+        "eta_seconds": round(remaining / rate, 1) if rate and status == "running" else None,
+    }
+
+
+class CrisisCampaign:
+    """A crisis re-labeling job over many products × markets
+
+    Labels are generated by ``max_workers`` threads, always taking the
+    pending item with the lowest priority. Every finished item is appended
+    to ``results.jsonl`` in the campaign directory (images go to
+    ``labels/``), so an interrupted campaign resumes where it stopped:
+    items that already succeeded are skipped, failed ones are retried.
+
+    A run holds an exclusive lock on the directory, so one process at a
+    time runs a campaign, and records its status there for the other
+    processes (see read_progress, campaign_running and request_cancel).
+    """
+
+    def __init__(self, crisis_generator: CrisisResponseGenerator, directory: str, products: List[Dict],
+                 crisis_info: Dict, markets: Optional[List[str]] = None, max_workers: int = 4,
+                 priority: Optional[Callable[[Dict, str, List[str]], Any]] = None,
+                 on_progress: Optional[Callable[[Dict], None]] = None):
+        self.crisis_generator = crisis_generator
+        self.directory = directory
+        self.products = products
+        self.crisis_info = crisis_info
+        self.markets = list(dict.fromkeys(market.strip().lower() for market in (markets or MARKET_REGISTRY.markets)))
+        self.max_workers = max(1, max_workers)
+        self.priority = priority or default_priority
+        self.on_progress = on_progress
+        self.status = "pending"
+        self.succeeded: Dict[str, Dict] = {}
+        self.failed: Dict[str, Dict] = {}
+        self.resumed = 0
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._queue: List[Tuple] = []
+        self._processed = 0
+        self._started: Optional[float] = None
+        self._started_at: Optional[str] = None
+        self._lock_file = None
+        # Item id -> (product index, market); products that are the same label share one item
+        self.items: Dict[str, Tuple[int, str]] = {}
+        for index, product in enumerate(products):
+            for market in self.markets:
+                self.items.setdefault(self.item_id(product, market), (index, market))
+        os.makedirs(os.path.join(directory, LABELS_DIR), exist_ok=True)
+        self._load_results()
+
+    @classmethod
+    def create(cls, crisis_generator: CrisisResponseGenerator, directory: str, selector: Dict, crisis_info: Dict,
+               markets: Optional[List[str]] = None, catalog_dir: Optional[str] = None, **kwargs) -> "CrisisCampaign":
+        """Select the products and record the campaign in ``directory``
+
+        Repeated products are dropped. Raises ValueError for an unknown market.
+        """
+        if os.path.exists(os.path.join(directory, CAMPAIGN_FILE)):
+            raise ValueError(f"A campaign already exists in {directory} - resume it instead")
+        markets = list(dict.fromkeys(market.strip().lower() for market in markets)) if markets \
+            else list(MARKET_REGISTRY.markets)
+        unsupported = [market for market in markets if market not in MARKET_REGISTRY]
+        if unsupported:
+            raise ValueError(f"Unsupported markets: {', '.join(unsupported)}")
+        products = unique_products(select_products(selector, catalog_dir))
+        os.makedirs(directory, exist_ok=True)
+        spec = {
+            "crisis_info": crisis_info,
+            "markets": markets,
+            "selector": {key: value for key, value in selector.items() if key != "products"},
+            "products": products,
+            "created_at": datetime.now().isoformat(),
+        }
+        path = os.path.join(directory, CAMPAIGN_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(spec, f, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+        return cls(crisis_generator, directory, products, crisis_info, spec["markets"], **kwargs)
+
+    @classmethod
+    def resume(cls, crisis_generator: CrisisResponseGenerator, directory: str, **kwargs) -> "CrisisCampaign":
+        """Reopen the campaign recorded in ``directory`` with its persisted results"""
+        with open(os.path.join(directory, CAMPAIGN_FILE), "r", encoding="utf-8") as f:
+            spec = json.load(f)
+        return cls(crisis_generator, directory, spec["products"], spec["crisis_info"], spec["markets"], **kwargs)
+
+    def item_id(self, product: Dict, market: str) -> str:
+        """Stable id of a product × market item, the same across runs"""
+        return label_cache_key(product, market, self.crisis_info)[:16]
+
+    def claim(self):
+        """Take the campaign's run lock; run() takes it itself when it is not held yet
+
+        Raises CampaignRunning if the campaign is run by this or another
+        process. Claiming before starting run() in a thread lets the caller
+        report that.
+        """
+        with self._lock:
+            if self.status == "running" or self._lock_file is not None:
+                raise CampaignRunning(f"Campaign {self.directory} is already running")
+            lock_file = open(os.path.join(self.directory, LOCK_FILE), "a")
+            # A status read (campaign_running) holds a shared lock for an instant
+            for attempt in range(5):
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if attempt == 4:
+                        lock_file.close()
+                        raise CampaignRunning(f"Campaign {self.directory} is already running in another process")
+                    time.sleep(0.02)
+            self._lock_file = lock_file
+            self._started_at = datetime.now().isoformat()
+        try:
+            os.remove(os.path.join(self.directory, CANCEL_FILE))
+        except FileNotFoundError:
+            pass
+        self._terminate_results()
+        self._write_status("running")
+
+    def run(self) -> Dict:
+        """Generate every pending item; returns the final progress"""
+        if self._lock_file is None:
+            self.claim()
+        with self._lock:
+            self.status = "running"
+            self._cancel.clear()
+            self._started = time.monotonic()
+            self._processed = 0
+            self._queue = [(self.priority(self.products[index], market, self.markets), index, market, item_id)
+                           for item_id, (index, market) in self.items.items() if item_id not in self.succeeded]
+            heapq.heapify(self._queue)
+        logger.info(f"Crisis campaign {self.directory}: {len(self._queue)} labels to generate")
+
+        status = "failed"
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crisis-campaign") as executor:
+                workers = [executor.submit(self._work) for _ in range(self.max_workers)]
+                for worker in workers:
+                    worker.result()
+            status = "cancelled" if self._cancel.is_set() and self._queue else "completed"
+        finally:
+            # Never left "running": a failed campaign can still be resumed
+            with self._lock:
+                self.status = status
+            self._release(status)
+        progress = self.progress()
+        logger.info(f"Crisis campaign {self.directory} {self.status}: {progress['succeeded']} succeeded, "
+                    f"{progress['failed']} failed")
+        return progress
+
+    def cancel(self):
+        """Stop after the labels currently being generated; run() or resume() continues later
+
+        From another process, use request_cancel(directory).
+        """
+        self._cancel.set()
+
+    def progress(self) -> Dict:
+        """Counts, throughput and estimated time remaining"""
+        with self._lock:
+            elapsed = time.monotonic() - self._started if self._started else 0.0
+            return _progress(self.status, len(self.items), len(self.succeeded), len(self.failed), self.resumed,
+                             elapsed, self._processed)
+
+    def results(self) -> List[Dict]:
+        """The latest result of every finished item"""
+        with self._lock:
+            return list(self.succeeded.values()) + list(self.failed.values())
+
+    def _next(self) -> Optional[Tuple]:
+        if os.path.exists(os.path.join(self.directory, CANCEL_FILE)):
+            self._cancel.set()
+        with self._lock:
+            if self._cancel.is_set() or not self._queue:
+                return None
+            return heapq.heappop(self._queue)
+
+    def _work(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            priority, index, market, item_id = item
+            self._record(item_id, self._generate(self.products[index], market))
+            if self.on_progress:
+                self.on_progress(self.progress())
+
+    def _generate(self, product: Dict, market: str) -> Dict:
+        base = {"product_name": product.get("product_name"), "market": market}
+        item = {**product, "market": market}
+        error = validate_product_data(item)
+        if error:
+            return {**base, "success": False, "error": error}
+        try:
+            with TRACER.start_trace("crisis_campaign.item", market=market, campaign=os.path.basename(self.directory)):
+                result = self.crisis_generator.generate_crisis_label(item, self.crisis_info)
+            if result.get("error"):
+                return {**base, "success": False, "error": result["error"]}
+            path = os.path.join(self.directory, LABELS_DIR, os.path.basename(result["filename"]))
+            with open(path, "wb") as f:
+                f.write(base64.b64decode(result["image_base64"]))
+        except Exception as e:
+            logger.error(f"Crisis campaign item failed for {base['product_name']} ({market}): {e}")
+            return {**base, "success": False, "error": str(e)}
+        return {
+            **base,
+            "success": True,
+            "filename": result["filename"],
+            "crisis_communication_text": result["crisis_communication_text"],
+        }
+
+    def _record(self, item_id: str, result: Dict):
+        entry = {"item_id": item_id, **result, "finished_at": datetime.now().isoformat()}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(os.path.join(self.directory, RESULTS_FILE), "a", encoding="utf-8") as f:
+                f.write(line)
+            self._processed += 1
+            _apply_result(self.succeeded, self.failed, entry)
+
+    def _load_results(self):
+        # Read only: another process may be running the campaign
+        for entry in _read_results(self.directory):
+            _apply_result(self.succeeded, self.failed, entry)
+        self.resumed = len(self.succeeded)
+
+    def _terminate_results(self):
+        path = os.path.join(self.directory, RESULTS_FILE)
+        if not os.path.exists(path) or not os.path.getsize(path):
+            return
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            cut_off = f.read(1) != b"\n"
+        if cut_off:
+            # Terminate the cut-off line so the next result starts on a line of its own
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n")
+
+    def _write_status(self, status: str):
+        state = {"status": status, "total": len(self.items), "resumed": self.resumed,
+                 "started_at": self._started_at, "pid": os.getpid()}
+        if status != "running":
+            state["finished_at"] = datetime.now().isoformat()
+        path = os.path.join(self.directory, STATUS_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _release(self, status: str):
+        try:
+            # Recorded before the lock is released: readers never see a finished run as running
+            self._write_status(status)
+        finally:
+            with self._lock:
+                lock_file, self._lock_file = self._lock_file, None
+            lock_file.close()
+
+
+def campaign_running(directory: str) -> bool:
+    """Whether a process (this one included) holds the run lock of the campaign in ``directory``"""
+    try:
+        lock_file = open(os.path.join(directory, LOCK_FILE), "r")
+    except FileNotFoundError:
+        return False
+    with lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+    return False
+
+
+def request_cancel(directory: str) -> bool:
+    """Ask the process running the campaign in ``directory`` to stop; False if none is running"""
+    if not campaign_running(directory):
+        return False
+    with open(os.path.join(directory, CANCEL_FILE), "w", encoding="utf-8"):
+        pass
+    return True
+
+
+def read_progress(directory: str, results: bool = False) -> Dict:
+    """Progress of the campaign in ``directory`` as CrisisCampaign.progress() reports it, from its files
+
+    Safe in any process, while another one runs the campaign: nothing is
+    written. A run whose process died is reported as "interrupted", a
+    campaign that never ran as "pending". ``results`` adds the latest
+    result of every finished item.
+    """
+    running = campaign_running(directory)
+    with open(os.path.join(directory, CAMPAIGN_FILE), "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    try:
+        with open(os.path.join(directory, STATUS_FILE), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        state = {"status": "pending"}
+    if state["status"] == "running" and not running and not campaign_running(directory):
+        state["status"] = "interrupted"
+
+    entries = _read_results(directory)
+    succeeded, failed = {}, {}
+    for entry in entries:
+        _apply_result(succeeded, failed, entry)
+    elapsed, processed = 0.0, 0
+    if state.get("started_at"):
+        started = datetime.fromisoformat(state["started_at"])
+        finished = datetime.fromisoformat(state["finished_at"]) if state.get("finished_at") else datetime.now()
+        elapsed = (finished - started).total_seconds()
+        processed = sum(1 for entry in entries if datetime.fromisoformat(entry["finished_at"]) >= started)
+    total = state.get("total", len(spec["products"]) * len(spec["markets"]))
+    progress = _progress(state["status"], total, len(succeeded), len(failed), state.get("resumed", 0),
+                         elapsed, processed)
+    if results:
+        progress["results"] = list(succeeded.values()) + list(failed.values())
+    return progress
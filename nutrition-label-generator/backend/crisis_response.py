@@ -1,63 +1,80 @@
-import json
-from datetime import datetime
-from aws_bedrock_client import BedrockClient
-from market_regulations import get_market_data
+import base64
+from typing import Optional
+from aws_bedrock_client import BedrockClient, BedrockOverloadedError, ConcurrentBedrockClient
+from label_cache import CachedLabel, LabelCache, label_filename, strip_strings
+from label_encoder import EncoderPolicy, LabelEncoder
+from market_regulations import MARKET_REGISTRY
 from visual_label_creator import NutritionLabelCreator
 from label_generator import NutritionLabelGenerator
+from render_pool import LocalRenderer
+from single_flight import SingleFlight
+from tracing import TRACER
 
 class CrisisResponseGenerator:
-    def __init__(self, bedrock_client: BedrockClient, visual_creator: NutritionLabelCreator):
+    def __init__(self, bedrock_client: BedrockClient, visual_creator: NutritionLabelCreator,
+                 cache: Optional[LabelCache] = None, renderer=None,
+                 encoders: Optional[EncoderPolicy] = None,
+                 concurrent_bedrock: Optional[ConcurrentBedrockClient] = None):
         self.bedrock_client = bedrock_client
+        # Bounds Bedrock calls in flight per process and sheds the excess (see aws_bedrock_client)
+        self.concurrent_bedrock = concurrent_bedrock
         self.visual_creator = visual_creator
-        self.label_generator = NutritionLabelGenerator(bedrock_client, visual_creator)
-
-           def generate_crisis_label(self, original_product_data: dict, crisis_info: dict) -> dict:
-               crisis_type = crisis_info.get("type", "recall")
-               crisis_details = crisis_info.get("details", "Urgent safety recall.")
-               
-               market = original_product_data.get("market", "spain")
-               if isinstance(market, str):
-                   market = market.lower()
-               market_data = get_market_data(market)
-
-        if not market_data:
+        self.cache = cache
+        self.renderer = renderer or LocalRenderer(visual_creator)
+        self.single_flight = SingleFlight()
+        self.encoders = encoders or EncoderPolicy()
+        self.label_generator = NutritionLabelGenerator(bedrock_client, visual_creator, cache, self.renderer,
+                                                       self.encoders, concurrent_bedrock)
+        self.incremental = 0
+        self.full = 0
+
+    def generate_crisis_label(self, original_product_data: dict, crisis_info: dict) -> dict:
+        crisis_type = crisis_info.get("type", "recall")
+        crisis_details = crisis_info.get("details", "Urgent safety recall.")
+        
+        market = original_product_data.get("market", "spain")
+        if isinstance(market, str):
+            market = market.lower()
+        if market not in MARKET_REGISTRY:
             return {"error": f"Unsupported market: {market}"}
+        encoder = self.encoders.select(market)
+
+        cache_key = self.label_generator.cache_key(original_product_data, market,
+                                                   {"type": crisis_type, "details": crisis_details},
+                                                   encoder=encoder.name)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return self._crisis_result(cached)
+
+        # Identical requests arriving while this label is generated share the result
+        return self.single_flight.do(cache_key, lambda: self._build_crisis_label(
+            original_product_data, market, crisis_type, crisis_details, cache_key, encoder))
+
+    def _build_crisis_label(self, original_product_data: dict, market: str, crisis_type: str,
+                            crisis_details: str, cache_key: str, encoder: LabelEncoder) -> dict:
+        """Generate content and render the crisis label (runs once per in-flight cache key)"""
+        original_product_data, crisis_type, crisis_details = strip_strings(
+            [original_product_data, crisis_type, crisis_details])
+        label = self._rerender_label(original_product_data, market, crisis_type, crisis_details, cache_key, encoder)
+        if label is not None:
+            self.incremental += 1
+            if self.cache is not None:
+                self.cache.put(cache_key, label)
+            return self._crisis_result(label)
+        self.full += 1
 
         # Augment original product data with crisis information for Bedrock
         augmented_product_data = original_product_data.copy()
         augmented_product_data["crisis_type"] = crisis_type
         augmented_product_data["crisis_details"] = crisis_details
 
-        prompt = f"""
-        You are an expert in food safety and labeling for {market_data.get('name')}.
-        An urgent crisis has occurred for the product: {original_product_data.get('product_name')}.
-        Crisis Type: {crisis_type}
-        Crisis Details: {crisis_details}
-
-        Original Product Data:
-        {json.dumps(original_product_data, indent=2)}
-
-        Generate an UPDATED nutrition label content in JSON format, similar to the standard label generation,
-        but with a prominent "market_specific_warnings" section reflecting the crisis.
-        Also, generate a brief "crisis_communication_text" suitable for public announcement.
-
-        Ensure the "market_specific_warnings" is highly visible and clear, using language appropriate for {market_data.get('name')} ({market_data.get('language')}).
-
-        JSON Structure for output:
-        {{
-          "nutrition_facts": {{...}},
-          "ingredients": "...",
-          "allergens": "...",
-          "certifications": ["...", "..."],
-          "regulatory_notes": "...",
-          "market_specific_warnings": "...",
-          "crisis_communication_text": "..."
-        }}
-        """
-
         try:
             # Use the existing BedrockClient method
-            response = self.bedrock_client.generate_nutrition_content(augmented_product_data, market)
+            if self.concurrent_bedrock is not None:
+                response = self.concurrent_bedrock.submit_nutrition_content(augmented_product_data, market).result()
+            else:
+                response = self.bedrock_client.generate_nutrition_content(augmented_product_data, market)
             
             # Convert to dict format and add crisis communication
             bedrock_output = {
@@ -72,8 +89,11 @@ class CrisisResponseGenerator:
                 "certifications": response.certifications,
                 "regulatory_notes": response.regulatory_notes,
                 "market_specific_warnings": response.market_specific_warnings,
-                "crisis_communication_text": f"URGENT: {crisis_type.upper()} - {crisis_details} Please contact manufacturer immediately."
+                "crisis_communication_text": self._communication_text(crisis_type, crisis_details)
             }
+        except BedrockOverloadedError:
+            # Not a failed label: the caller sheds the request (503 from the API)
+            raise
         except Exception as e:
             print(f"Error generating crisis content with Bedrock: {e}")
             return {"error": str(e)}
@@ -85,28 +105,77 @@ class CrisisResponseGenerator:
             **bedrock_output
         }
 
-               # 2. Create visual label with crisis warning
-               try:
-                   image = self.visual_creator.create_label(final_label_data, market)
-                   
-                   # Convert PIL Image to base64 string
-                   import io
-                   import base64
-                   
-                   # Save image to bytes buffer
-                   img_buffer = io.BytesIO()
-                   image.save(img_buffer, format='PNG')
-                   img_buffer.seek(0)
-                   
-                   # Encode to base64
-                   image_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
-                   
-                   return {
-                       "image_base64": image_base64,
-                       "label_data": final_label_data,
-                       "crisis_communication_text": bedrock_output.get("crisis_communication_text", "No specific communication text generated."),
-                       "filename": f"crisis_label_{market}_{original_product_data.get('product_name', 'unknown').replace(' ', '_')}_{datetime.now().strftime('%Y%m%d%H%M%S')}.png"
-                   }
+        # 2. Create visual label with crisis warning
+        try:
+            label = CachedLabel(
+                image_bytes=self.renderer.render(final_label_data, market, crisis_type, encoder=encoder.name),
+                label_data=final_label_data,
+                filename=self._filename(original_product_data, market, cache_key, encoder),
+                mimetype=encoder.mimetype
+            )
         except Exception as e:
             print(f"Error creating visual crisis label: {e}")
-            return {"error": f"Failed to create visual crisis label: {e}"}
\ No newline at end of file
+            return {"error": f"Failed to create visual crisis label: {e}"}
+
+        if self.cache is not None:
+            self.cache.put(cache_key, label)
+        return self._crisis_result(label)
+
+    def _rerender_label(self, original_product_data: dict, market: str, crisis_type: str, crisis_details: str,
+                        cache_key: str, encoder: LabelEncoder) -> Optional[CachedLabel]:
+        """Derive the crisis label from the product's regular label, if it is cached
+
+        The nutrition content of a crisis label is the product's regular
+        content, so Bedrock is skipped: the regular label's data gets the
+        market's crisis warning and communication text, and the precomputed
+        crisis banner is stacked above its image, reusing the encoded rows
+        where the format allows (vector labels are re-laid out from the data).
+        Returns None when there is no regular label to start from.
+        """
+        if self.cache is None:
+            return None
+        base = self.cache.get(self.label_generator.cache_key(original_product_data, market, encoder=encoder.name))
+        if base is None or base.mimetype != encoder.mimetype:
+            return None
+
+        label_data = {
+            **base.label_data,
+            "market_specific_warnings": self.visual_creator.crisis_regulations.get_crisis_warning(crisis_type, market),
+            "crisis_communication_text": self._communication_text(crisis_type, crisis_details),
+        }
+        try:
+            if encoder.vector:
+                image_bytes = self.renderer.render(label_data, market, crisis_type, encoder=encoder.name)
+            else:
+                with TRACER.span("stack_crisis_banner", market=market, crisis_type=crisis_type,
+                                 encoder=encoder.name):
+                    image_bytes = encoder.encode_below(self.visual_creator.crisis_banner_image(market, crisis_type),
+                                                       base.image_bytes)
+        except Exception as e:
+            print(f"Error re-rendering crisis label, generating it from scratch: {e}")
+            return None
+        return CachedLabel(image_bytes=image_bytes, label_data=label_data,
+                           filename=self._filename(original_product_data, market, cache_key, encoder),
+                           mimetype=encoder.mimetype)
+
+    def stats(self) -> dict:
+        """How many crisis labels were derived from a cached label vs generated from scratch"""
+        return {"incremental": self.incremental, "full": self.full}
+
+    @staticmethod
+    def _communication_text(crisis_type: str, crisis_details: str) -> str:
+        return f"URGENT: {crisis_type.upper()} - {crisis_details} Please contact manufacturer immediately."
+
+    @staticmethod
+    def _filename(original_product_data: dict, market: str, cache_key: str, encoder: LabelEncoder) -> str:
+        return label_filename("crisis_label", original_product_data.get("product_name"), market, cache_key,
+                              encoder.extension)
+
+    @staticmethod
+    def _crisis_result(label: CachedLabel) -> dict:
+        return {
+            "image_base64": base64.b64encode(label.image_bytes).decode('utf-8'),
+            "label_data": label.label_data,
+            "crisis_communication_text": label.label_data.get("crisis_communication_text", "No specific communication text generated."),
+            "filename": label.filename
+        }
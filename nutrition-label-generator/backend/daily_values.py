@@ -0,0 +1,111 @@
+"""
+Batched daily values for SmartLabel AI Nutrition Label Generator
+DV percentages for a whole catalog (products × nutrients) in every market at once, with NumPy
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from market_regulations import MARKET_REGISTRY, MarketRegistry
+
+# Standard used for nutrients a market does not define, as get_daily_value_percentage
+DEFAULT_STANDARD = 100.0
+
+_AMOUNT = re.compile(r"([-+]?\d+(?:[.,]\d+)?)\s*([a-zµμ]+)?", re.IGNORECASE)
+
+# Market standards are in kcal for energy and grams for every other nutrient (see market_regulations);
+# amounts are converted to that unit, and amounts in other units (or another dimension) are rejected
+ENERGY_NUTRIENTS = frozenset({"calories", "energy"})
+MASS_UNITS = {"g": 1.0, "gram": 1.0, "grams": 1.0, "kg": 1000.0, "mg": 1e-3, "mcg": 1e-6, "µg": 1e-6,
+              "μg": 1e-6, "ug": 1e-6}
+ENERGY_UNITS = {"kcal": 1.0, "cal": 1.0, "calories": 1.0, "kj": 1 / 4.184}
+
+
+class DailyValueStandards:
+    """The daily_value_standards of every market as one markets × nutrients matrix
+
+    Built once; percentages() then computes the DV% of any number of
+    products for all markets in a single vectorized operation, rounded
+    exactly like MarketRegulations.get_daily_value_percentage.
+    """
+
+    def __init__(self, nutrients: Optional[Sequence[str]] = None, registry: MarketRegistry = MARKET_REGISTRY):
+        self.markets = registry.markets
+        regulations = [registry.get(market) for market in self.markets]
+        if nutrients is None:
+            # Every nutrient any market defines, in order of first appearance
+            nutrients = list(dict.fromkeys(name for regulation in regulations
+                                           for name in regulation.daily_value_standards))
+        self.nutrients = tuple(name.lower() for name in nutrients)
+        self.matrix = np.array([[regulation.daily_value_standards.get(name, DEFAULT_STANDARD)
+                                 for name in self.nutrients] for regulation in regulations], dtype=np.float64)
+        self.matrix.setflags(write=False)
+        self._market_index = {market: index for index, market in enumerate(self.markets)}
+
+    def percentages(self, amounts, markets: Optional[Iterable[str]] = None) -> np.ndarray:
+        """DV percentages for a products × nutrients matrix of amounts
+
+        Columns follow ``self.nutrients``; NaN marks a missing amount and
+        stays NaN. Returns an array of shape (markets, products, nutrients),
+        for ``markets`` in the given order or all markets.
+        """
+        amounts = np.asarray(amounts, dtype=np.float64)
+        if amounts.ndim != 2 or amounts.shape[1] != len(self.nutrients):
+            raise ValueError(f"Expected a products × {len(self.nutrients)} matrix of amounts "
+                             f"({', '.join(self.nutrients)}), got shape {amounts.shape}")
+        standards = self.matrix if markets is None else self.matrix[self._rows(markets)]
+        # Same operation order as the scalar version, so results round identically
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.round(amounts[np.newaxis, :, :] / standards[:, np.newaxis, :] * 100, 0)
+
+    def percentages_by_market(self, amounts, markets: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """percentages() as {market: products × nutrients array}"""
+        markets = list(markets) if markets is not None else list(self.markets)
+        return dict(zip((market.strip().lower() for market in markets), self.percentages(amounts, markets)))
+
+    def amounts_matrix(self, products: Iterable[Dict]) -> np.ndarray:
+        """Products × nutrients amounts read from product fields named like the nutrients
+
+        Accepts numbers or text such as "12g", "500 mg" or "3,5". Amounts
+        are converted to the unit of the standards: kcal for energy (kJ is
+        converted too), grams for everything else; a bare number is taken
+        to be in that unit. Absent or unparsable amounts, and amounts in a
+        unit of another kind (e.g. "20 kJ" of fat), become NaN.
+        """
+        units = [ENERGY_UNITS if name in ENERGY_NUTRIENTS else MASS_UNITS for name in self.nutrients]
+        rows = [[_amount(product.get(name), unit) for name, unit in zip(self.nutrients, units)]
+                for product in products]
+        return np.array(rows, dtype=np.float64).reshape(len(rows), len(self.nutrients))
+
+    def _rows(self, markets: Iterable[str]) -> List[int]:
+        rows = []
+        for market in markets:
+            key = market.strip().lower()
+            if key not in self._market_index:
+                raise ValueError(f"{market!r} is not a valid Market")
+            rows.append(self._market_index[key])
+        return rows
+
+
+def _amount(value, units: Dict[str, float]) -> float:
+    if isinstance(value, bool) or value is None:
+        return np.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _AMOUNT.search(str(value))
+    if not match:
+        return np.nan
+    number = float(match.group(1).replace(",", "."))
+    if match.group(2) is None:
+        return number
+    scale = units.get(match.group(2).lower())
+    return number * scale if scale is not None else np.nan
+
+
+@lru_cache(maxsize=1)
+def get_daily_value_standards() -> DailyValueStandards:
+    """The shared standards matrix over all nutrients of the market registry"""
+    return DailyValueStandards()
@@ -0,0 +1,53 @@
+"""
+Gunicorn configuration for SmartLabel AI Nutrition Label Generator
+Preforked workers sharing a preloaded app, each warmed up before it takes requests
+"""
+
+import multiprocessing
+import os
+
+# Run from the backend directory, so the flat module imports resolve
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "wsgi:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+
+# Label rendering is CPU bound (one process per core); threads overlap Bedrock calls and I/O
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.environ.get("THREADS", 4))
+
+# Import the app (and its caches, fonts and templates) once in the master; workers fork from it
+preload_app = os.environ.get("PRELOAD_APP", "true").lower() == "true"
+
+# Graceful reload: on HUP workers are replaced one by one, finishing in-flight requests first
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+timeout = int(os.environ.get("WORKER_TIMEOUT", 120))
+keepalive = 5
+# Recycle workers now and then to cap memory growth (0 disables)
+max_requests = int(os.environ.get("MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+pidfile = os.environ.get("PIDFILE", os.path.join(chdir, "gunicorn.pid"))
+accesslog = os.environ.get("ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    # Metrics files left by an earlier run would add to this run's totals (see METRICS_DIR)
+    if os.environ.get("METRICS_DIR"):
+        from metrics import clear_shared
+        clear_shared(os.environ["METRICS_DIR"])
+
+
+def when_ready(server):
+    # Load the shared label assets in the master, so every forked worker starts with them
+    if preload_app:
+        import api_server
+        api_server.warm_up()
+
+
+def post_fork(server, worker):
+    import api_server
+    api_server.init_worker()
+    server.log.info(f"Worker {worker.pid} warmed up")
@@ -0,0 +1,659 @@
+"""
+Job Queue for SmartLabel AI Nutrition Label Generator
+Asynchronous label jobs: pluggable queues (in-process, SQLite, Redis) and a local worker pool
+"""
+
+import json
+import logging
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+FINISHED = (COMPLETED, FAILED)
+
+# Seconds a worker may hold a claimed job before it is presumed dead, and runs before a job is given up
+DEFAULT_LEASE = 600.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+@dataclass
+class Job:
+    """A unit of work and, once finished, its result or error"""
+    job_id: str
+    kind: str
+    payload: Dict[str, Any]
+    status: str = QUEUED
+    created: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    # Token of the claim holding a running job; finishing it requires the same token
+    lease_owner: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public view of the job, as returned by the API"""
+        record = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": _isoformat(self.created),
+            "started_at": _isoformat(self.started),
+            "finished_at": _isoformat(self.finished),
+        }
+        if self.status == COMPLETED:
+            record["result"] = self.result
+        elif self.status == FAILED:
+            record["error"] = self.error
+        return record
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+def new_job(kind: str, payload: Dict[str, Any]) -> Job:
+    return Job(job_id=uuid.uuid4().hex, kind=kind, payload=payload, created=time.time())
+
+
+def _lease_owner() -> str:
+    return uuid.uuid4().hex
+
+
+class JobQueue(ABC):
+    """Interface for job queues
+
+    Jobs are claimed in submission order. Finished jobs, with their
+    results, are kept ``result_ttl`` seconds (``None`` = forever) for
+    clients to retrieve. Every claim gets its own ``lease_owner`` token;
+    workers pass it when finishing the job, so a worker whose job was
+    queued again after its lease ran out cannot overwrite the new run.
+    """
+
+    # How often the polling implementations of claim() and wait() look for changes
+    poll_interval = 0.05
+
+    def __init__(self, result_ttl: Optional[float] = None):
+        self.result_ttl = result_ttl
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.requeued = 0
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> Job:
+        return self.submit_many(kind, [payload])[0]
+
+    @abstractmethod
+    def submit_many(self, kind: str, payloads: Iterable[Dict[str, Any]]) -> List[Job]:
+        """Queue one job per payload"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job, or None if it is unknown or expired"""
+
+    def claim(self, timeout: float = 0.0) -> Optional[Job]:
+        """Take the oldest queued job and mark it running; waits up to ``timeout`` seconds for one"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self._claim()
+            if job is not None or time.monotonic() >= deadline:
+                return job
+            time.sleep(self.poll_interval)
+
+    def complete(self, job_id: str, result: Dict[str, Any], lease_owner: Optional[str] = None) -> bool:
+        """Record the job's result; False if the job is gone or ``lease_owner`` no longer holds it"""
+        finished = self._finish(job_id, COMPLETED, result=result, lease_owner=lease_owner)
+        if finished:
+            self.completed += 1
+        return finished
+
+    def fail(self, job_id: str, error: str, lease_owner: Optional[str] = None) -> bool:
+        """Record the job's error; False if the job is gone or ``lease_owner`` no longer holds it"""
+        finished = self._finish(job_id, FAILED, error=error, lease_owner=lease_owner)
+        if finished:
+            self.failed += 1
+        return finished
+
+    def wait(self, job_id: str, timeout: float, status: Optional[str] = None) -> Optional[Job]:
+        """The job once its status is no longer ``status`` (by default: once it has finished)
+
+        Returns the job as it is after ``timeout`` seconds if that does not
+        happen, and None for an unknown job.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or _changed(job, status) or time.monotonic() >= deadline:
+                return job
+            time.sleep(self.poll_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """Job counters for instrumentation"""
+        return {
+            "type": type(self).__name__,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "requeued": self.requeued,
+            "queued": self.queued(),
+            "result_ttl": self.result_ttl,
+        }
+
+    @abstractmethod
+    def queued(self) -> int:
+        """Number of jobs waiting to be claimed"""
+
+    @abstractmethod
+    def _claim(self) -> Optional[Job]:
+        """Take the oldest queued job, if any, without waiting"""
+
+    @abstractmethod
+    def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None,
+                lease_owner: Optional[str] = None) -> bool:
+        """Record the outcome; with ``lease_owner``, only while that claim still runs the job"""
+
+
+def _changed(job: Job, status: Optional[str]) -> bool:
+    return job.done if status is None else job.status != status
+
+
+class MemoryJobQueue(JobQueue):
+    """Thread-safe in-process queue; jobs are lost when the process exits"""
+
+    def __init__(self, result_ttl: Optional[float] = None):
+        super().__init__(result_ttl)
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Deque[str] = deque()
+        self._finished: Deque[Tuple[float, str]] = deque()
+        self._changed = threading.Condition()
+
+    def submit_many(self, kind: str, payloads: Iterable[Dict[str, Any]]) -> List[Job]:
+        jobs = [new_job(kind, payload) for payload in payloads]
+        with self._changed:
+            self._expire()
+            for job in jobs:
+                self._jobs[job.job_id] = job
+                self._queue.append(job.job_id)
+            self.submitted += len(jobs)
+            self._changed.notify_all()
+        return [_copy(job) for job in jobs]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return _copy(job) if job is not None else None
+
+    def claim(self, timeout: float = 0.0) -> Optional[Job]:
+        with self._changed:
+            self._changed.wait_for(lambda: self._queue, timeout)
+            return self._claim()
+
+    def wait(self, job_id: str, timeout: float, status: Optional[str] = None) -> Optional[Job]:
+        with self._changed:
+            self._changed.wait_for(lambda: job_id not in self._jobs or _changed(self._jobs[job_id], status), timeout)
+            return self.get(job_id)
+
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def _claim(self) -> Optional[Job]:
+        if not self._queue:
+            return None
+        job = self._jobs[self._queue.popleft()]
+        job.status, job.started, job.attempts, job.lease_owner = RUNNING, time.time(), job.attempts + 1, _lease_owner()
+        self._changed.notify_all()
+        return _copy(job)
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None,
+                lease_owner: Optional[str] = None) -> bool:
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None or (lease_owner is not None and (job.status, job.lease_owner) != (RUNNING, lease_owner)):
+                return False
+            job.status, job.finished, job.result, job.error = status, time.time(), result, error
+            self._finished.append((job.finished, job_id))
+            self._changed.notify_all()
+            return True
+
+    def _expire(self):
+        if self.result_ttl is None:
+            return
+        cutoff = time.time() - self.result_ttl
+        while self._finished and self._finished[0][0] < cutoff:
+            self._jobs.pop(self._finished.popleft()[1], None)
+
+
+def _copy(job: Job) -> Job:
+    # Callers get a snapshot; the queue's own record keeps changing under its lock
+    return Job(**asdict(job))
+
+
+class SQLiteJobQueue(JobQueue):
+    """Queue persisted in a SQLite database, shared by every process (server worker) using the same file
+
+    A claimed job is leased for ``lease`` seconds. A job still running
+    after that lost its worker (the process died), so the next claim
+    queues it again, or fails it once it has been started
+    ``max_attempts`` times. ``lease`` must exceed the longest job.
+    """
+
+    _COLUMNS = "job_id, kind, payload, status, created, started, finished, result, error, attempts, lease_owner"
+
+    def __init__(self, path: str, result_ttl: Optional[float] = None, lease: Optional[float] = DEFAULT_LEASE,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        super().__init__(result_ttl)
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        with self._lock:
+            self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        """This process's connection (call with the lock held)
+
+        SQLite connections must not be used across fork(), so server
+        workers forked from a preloaded app open their own on first use.
+        """
+        if self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL, "
+                "created REAL NOT NULL, started REAL, finished REAL, result TEXT, error TEXT, "
+                "attempts INTEGER NOT NULL DEFAULT 0, lease_owner TEXT)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            # Databases created before leases
+            if "attempts" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            if "lease_owner" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease_owner TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def submit_many(self, kind: str, payloads: Iterable[Dict[str, Any]]) -> List[Job]:
+        jobs = [new_job(kind, payload) for payload in payloads]
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.result_ttl is not None:
+                    conn.execute("DELETE FROM jobs WHERE finished < ?", (time.time() - self.result_ttl,))
+                conn.executemany(
+                    "INSERT INTO jobs (job_id, kind, payload, status, created) VALUES (?, ?, ?, ?, ?)",
+                    [(job.job_id, kind, json.dumps(job.payload), QUEUED, job.created) for job in jobs]
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self.submitted += len(jobs)
+        return jobs
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT {self._COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self._job(row) if row is not None else None
+
+    def queued(self) -> int:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "path": self.path, "lease": self.lease}
+
+    def _claim(self) -> Optional[Job]:
+        with self._lock:
+            conn = self._connection()
+            # The write lock makes select-then-update atomic across processes
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                if self.lease is not None:
+                    self._release_expired(conn, now)
+                row = conn.execute(
+                    f"SELECT {self._COLUMNS} FROM jobs WHERE status = ? ORDER BY created, rowid LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    owner = _lease_owner()
+                    conn.execute("UPDATE jobs SET status = ?, started = ?, attempts = attempts + 1, lease_owner = ? "
+                                 "WHERE job_id = ?", (RUNNING, now, owner, row[0]))
+                    row = row[:3] + (RUNNING, row[4], now) + row[6:9] + (row[9] + 1, owner)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return self._job(row) if row is not None else None
+
+    def _release_expired(self, conn: sqlite3.Connection, now: float):
+        """Queue the running jobs whose lease ran out again, or fail them after max_attempts"""
+        expired = now - self.lease
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished = ?, error = ? WHERE status = ? AND started < ? AND attempts >= ?",
+            (FAILED, now, f"Abandoned after {self.max_attempts} attempts: its worker stopped while running it",
+             RUNNING, expired, self.max_attempts)
+        )
+        requeued = conn.execute("UPDATE jobs SET status = ?, started = NULL, lease_owner = NULL "
+                                "WHERE status = ? AND started < ?", (QUEUED, RUNNING, expired)).rowcount
+        if requeued:
+            self.requeued += requeued
+            logger.warning(f"Requeued {requeued} label jobs whose worker stopped")
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None,
+                lease_owner: Optional[str] = None) -> bool:
+        sql = "UPDATE jobs SET status = ?, finished = ?, result = ?, error = ? WHERE job_id = ?"
+        params = (status, time.time(), json.dumps(result) if result is not None else None, error, job_id)
+        if lease_owner is not None:
+            # Zero rows: the lease ran out and the job was queued again (or finished by its new run)
+            sql += " AND status = ? AND lease_owner = ?"
+            params += (RUNNING, lease_owner)
+        with self._lock:
+            return self._connection().execute(sql, params).rowcount > 0
+
+    @staticmethod
+    def _job(row: Tuple) -> Job:
+        job_id, kind, payload, status, created, started, finished, result, error, attempts, lease_owner = row
+        return Job(job_id, kind, json.loads(payload), status, created, started, finished,
+                   json.loads(result) if result is not None else None, error, attempts, lease_owner)
+
+
+class RedisJobQueue(JobQueue):
+    """Queue in Redis or a Redis-compatible server (Valkey, KeyDB, ...), shared by every host using it
+
+    Requires the ``redis`` package (and Redis 6.2 for LMOVE/BLMOVE). Jobs
+    are JSON strings under ``<prefix>:job:<id>``; queued ids wait in the
+    ``<prefix>:queue`` list. A claim moves the id atomically into the
+    ``<prefix>:processing`` list, then starts the job: running ids are
+    leased in the ``<prefix>:running`` sorted set, scored by lease expiry,
+    and queued again as in SQLiteJobQueue. An id left in the processing
+    list by a worker that died before starting it is queued again once it
+    has been there for a lease. Job records change in WATCH/MULTI
+    transactions, so a requeue and a late finish never overwrite each other.
+    """
+
+    def __init__(self, url: str, result_ttl: Optional[float] = None, prefix: str = "label-jobs", client=None,
+                 lease: Optional[float] = DEFAULT_LEASE, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        super().__init__(result_ttl)
+        self.lease = lease
+        self.max_attempts = max(1, max_attempts)
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The Redis job queue requires the 'redis' package (pip install redis)") from e
+        self._watch_error = redis.WatchError
+        if client is None:
+            client = redis.Redis.from_url(url)
+        self.url = url
+        self.client = client
+        self.prefix = prefix
+
+    def submit_many(self, kind: str, payloads: Iterable[Dict[str, Any]]) -> List[Job]:
+        jobs = [new_job(kind, payload) for payload in payloads]
+        for job in jobs:
+            self._store(job)
+        if jobs:
+            self.client.lpush(f"{self.prefix}:queue", *[job.job_id for job in jobs])
+        self.submitted += len(jobs)
+        return jobs
+
+    def get(self, job_id: str) -> Optional[Job]:
+        value = self.client.get(self._key(job_id))
+        return Job(**json.loads(value)) if value is not None else None
+
+    def claim(self, timeout: float = 0.0) -> Optional[Job]:
+        if timeout <= 0:
+            return self._claim()
+        if self.lease is not None:
+            self._release_expired()
+        # BLMOVE blocks server-side; it takes whole seconds
+        job_id = self.client.blmove(f"{self.prefix}:queue", f"{self.prefix}:processing", max(1, round(timeout)),
+                                    "RIGHT", "LEFT")
+        return self._start(job_id) if job_id is not None else None
+
+    def queued(self) -> int:
+        return self.client.llen(f"{self.prefix}:queue")
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "url": self.url, "lease": self.lease}
+
+    def _claim(self) -> Optional[Job]:
+        if self.lease is not None:
+            self._release_expired()
+        job_id = self.client.lmove(f"{self.prefix}:queue", f"{self.prefix}:processing", "RIGHT", "LEFT")
+        return self._start(job_id) if job_id is not None else None
+
+    def _start(self, job_id) -> Optional[Job]:
+        job_id = _decode(job_id)
+        owner = _lease_owner()
+
+        def start(job: Job) -> bool:
+            if job.status != QUEUED:
+                return False  # queued again by a sweep while this claim was starting it
+            job.status, job.started, job.attempts, job.lease_owner = RUNNING, time.time(), job.attempts + 1, owner
+            return True
+
+        def lease(pipe, job: Job):
+            if self.lease is not None:
+                pipe.zadd(f"{self.prefix}:running", {job.job_id: job.started + self.lease})
+            pipe.lrem(f"{self.prefix}:processing", 1, job.job_id)
+            pipe.zrem(f"{self.prefix}:processing:seen", job.job_id)
+
+        job = self._update(job_id, start, then=lease)
+        if job is None:
+            self.client.lrem(f"{self.prefix}:processing", 1, job_id)
+        return job
+
+    def _release_expired(self):
+        """Queue the running jobs whose lease ran out again, or fail them after max_attempts"""
+        now = time.time()
+        for job_id in self.client.zrangebyscore(f"{self.prefix}:running", "-inf", now):
+            # Whoever removes the lease handles the job, so it is requeued once
+            if not self.client.zrem(f"{self.prefix}:running", job_id):
+                continue
+            job_id = _decode(job_id)
+
+            def release(job: Job) -> bool:
+                if job.done:
+                    return False
+                if job.attempts >= self.max_attempts:
+                    job.status, job.finished = FAILED, now
+                    job.error = f"Abandoned after {self.max_attempts} attempts: its worker stopped while running it"
+                else:
+                    job.status, job.started, job.lease_owner = QUEUED, None, None
+                return True
+
+            def requeue(pipe, job: Job):
+                if job.status == QUEUED:
+                    # The consuming end of the list: requeued jobs go first, as they are the oldest
+                    pipe.rpush(f"{self.prefix}:queue", job.job_id)
+
+            job = self._update(job_id, release, then=requeue,
+                               ttl=lambda job: self.result_ttl if job.done else None)
+            if job is not None and job.status == QUEUED:
+                self.requeued += 1
+                logger.warning(f"Requeued label job {job_id} whose worker stopped")
+        self._release_unstarted(now)
+
+    def _release_unstarted(self, now: float):
+        """Queue again the ids a claim moved to the processing list but never started"""
+        processing, seen = f"{self.prefix}:processing", f"{self.prefix}:processing:seen"
+        for job_id in self.client.lrange(processing, 0, -1):
+            # Claims start their job within milliseconds; one seen here a lease ago lost its worker
+            self.client.zadd(seen, {job_id: now}, nx=True)
+            first_seen = self.client.zscore(seen, job_id)
+            if first_seen is None or first_seen > now - self.lease:
+                continue
+            self.client.zrem(seen, job_id)
+            # Whoever removes it from the processing list requeues it
+            if self.client.lrem(processing, 1, job_id):
+                self.client.rpush(f"{self.prefix}:queue", job_id)
+                self.requeued += 1
+                logger.warning(f"Requeued label job {_decode(job_id)} whose worker stopped before starting it")
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None,
+                lease_owner: Optional[str] = None) -> bool:
+        def finish(job: Job) -> bool:
+            if lease_owner is not None and (job.status, job.lease_owner) != (RUNNING, lease_owner):
+                return False  # the lease ran out and the job was queued again (or finished by its new run)
+            job.status, job.finished, job.result, job.error = status, time.time(), result, error
+            return True
+
+        def release(pipe, job: Job):
+            if self.lease is not None:
+                pipe.zrem(f"{self.prefix}:running", job_id)
+
+        return self._update(job_id, finish, then=release, ttl=lambda job: self.result_ttl) is not None
+
+    def _update(self, job_id: str, change: Callable[[Job], bool], then: Optional[Callable] = None,
+                ttl: Optional[Callable[[Job], Optional[float]]] = None) -> Optional[Job]:
+        """Apply ``change`` to the stored job in a transaction, with ``then`` adding commands to it
+
+        Retried if the job changes meanwhile. Returns None if the job is gone
+        or ``change`` declines (returns False).
+        """
+        key = self._key(job_id)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    value = pipe.get(key)
+                    job = Job(**json.loads(value)) if value is not None else None
+                    if job is None or not change(job):
+                        pipe.unwatch()
+                        return None
+                    pipe.multi()
+                    expiry = ttl(job) if ttl is not None else None
+                    pipe.set(key, json.dumps(asdict(job)), ex=int(expiry) if expiry else None)
+                    if then is not None:
+                        then(pipe, job)
+                    pipe.execute()
+                    return job
+                except self._watch_error:
+                    continue
+
+    def _store(self, job: Job, ttl: Optional[float] = None):
+        self.client.set(self._key(job.job_id), json.dumps(asdict(job)), ex=int(ttl) if ttl else None)
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+
+def _decode(job_id) -> str:
+    return job_id.decode() if isinstance(job_id, bytes) else job_id
+
+
+def build_job_queue(backend: str = "memory", path: Optional[str] = None, url: Optional[str] = None,
+                    result_ttl: Optional[float] = None, lease: Optional[float] = DEFAULT_LEASE) -> JobQueue:
+    """Queue for the configured backend: "memory", "sqlite" (``path``) or "redis" (``url``)
+
+    ``lease`` applies to the shared queues (see SQLiteJobQueue); in-memory
+    jobs end with their process anyway.
+    """
+    backend = backend.strip().lower()
+    if backend == "memory":
+        return MemoryJobQueue(result_ttl)
+    if backend == "sqlite":
+        return SQLiteJobQueue(path or "jobs.db", result_ttl, lease)
+    if backend == "redis":
+        return RedisJobQueue(url or "redis://localhost:6379/0", result_ttl, lease=lease)
+    raise ValueError(f"Unknown job queue backend: {backend!r} (expected memory, sqlite or redis)")
+
+
+class JobWorkers:
+    """Local threads that claim jobs from a queue and run them with the handler for their kind
+
+    A handler takes the job payload and returns a result dict; a dict with
+    an "error" key, or an exception, fails the job. Started lazily and per
+    process, so workers forked from a preloaded app start their own threads.
+    """
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, Callable[[Dict], Dict]], workers: int = 4):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def ensure_started(self):
+        """Start the worker threads in this process unless they already run"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._threads = [threading.Thread(target=self._work, name=f"label-job-{index}", daemon=True)
+                             for index in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+            logger.info(f"Started {self.workers} label job workers on {type(self.queue).__name__}")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Let the workers finish their current job and exit"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._pid = None
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(timeout=1.0)
+            except Exception as e:
+                logger.error(f"Claiming a label job failed: {e}")
+                time.sleep(1.0)
+                continue
+            if job is not None:
+                self._run(job)
+
+    def _run(self, job: Job):
+        handler = self.handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {job.kind}")
+            # Continues the trace of the request that submitted the job, if it was sampled
+            with TRACER.start_trace(f"job.{job.kind}", job.payload.get("traceparent"), job_id=job.job_id):
+                result = handler(job.payload)
+        except Exception as e:
+            logger.error(f"Label job {job.job_id} failed: {e}")
+            finished = self.queue.fail(job.job_id, str(e), job.lease_owner)
+        else:
+            if isinstance(result, dict) and result.get("error"):
+                finished = self.queue.fail(job.job_id, result["error"], job.lease_owner)
+            else:
+                finished = self.queue.complete(job.job_id, result, job.lease_owner)
+        if not finished:
+            logger.warning(f"Label job {job.job_id} outlived its lease and was queued again; its outcome is dropped")
@@ -0,0 +1,197 @@
+"""
+Label Cache for SmartLabel AI Nutrition Label Generator
+Content-addressed cache of rendered labels: in-memory LRU with an optional on-disk tier
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedLabel:
+    """A rendered label as stored in the cache"""
+    image_bytes: bytes
+    label_data: Dict[str, Any]
+    filename: str
+    mimetype: str = "image/png"
+
+
+def _normalize(value: Any) -> Any:
+    """Normalize product data so equivalent payloads hash identically"""
+    if isinstance(value, dict):
+        return {str(key): _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, bool) or value is None:
+        return value
+    # Numbers and other scalars compare by their text, as they are rendered
+    return str(value)
+
+
+def strip_strings(value: Any) -> Any:
+    """``value`` with surrounding whitespace removed from every string in it
+
+    Cache keys ignore that whitespace (see _normalize), so labels are
+    generated from the stripped values: requests sharing a key render the
+    same text.
+    """
+    if isinstance(value, dict):
+        return {key: strip_strings(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [strip_strings(item) for item in value]
+    return value.strip() if isinstance(value, str) else value
+
+
+def normalize_product(product_data: Dict) -> Dict:
+    """Market-independent normalized product data, as hashed into cache keys"""
+    return _normalize({key: value for key, value in product_data.items() if key != "market"})
+
+
+def label_cache_key(product_data: Dict, market: str, crisis: Optional[Dict] = None,
+                    renderer_version: str = "", model_id: str = "",
+                    normalized_product: Optional[Dict] = None, encoder: str = "") -> str:
+    """Canonical SHA-256 key for a label request
+
+    Pass ``normalized_product`` (from normalize_product) to reuse the
+    normalization across several markets of the same product.
+    """
+    if normalized_product is None:
+        normalized_product = normalize_product(product_data)
+    payload = {
+        "product": normalized_product,
+        "market": market.strip().lower(),
+        "crisis": _normalize(crisis) if crisis else None,
+        "renderer_version": renderer_version,
+        "model_id": model_id,
+        "encoder": encoder,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w.-]+")
+
+
+def label_filename(prefix: str, product_name: Any, market: str, cache_key: str, extension: str) -> str:
+    """File name for a label, e.g. nutrition_label_spain_Premium_Whey_3f9a1c0b7d2e.png
+
+    Spaces, path separators and other characters unsafe in file names (or
+    Content-Disposition headers) in the product name become "_".
+    """
+    name = _UNSAFE_FILENAME_CHARS.sub("_", str(product_name or "")).strip("._")[:80] or "unknown"
+    return f"{prefix}_{market}_{name}_{cache_key[:12]}{extension}"
+
+
+class LabelCache:
+    """Thread-safe LRU cache of rendered labels keyed by label_cache_key
+
+    When ``disk_dir`` is set, every label is also written there as the image
+    (``<key>.png``, ``<key>.webp``, ...) plus ``<key>.json``, and memory
+    misses fall back to disk.
+    """
+
+    def __init__(self, max_entries: int = 256, disk_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._entries: "OrderedDict[str, CachedLabel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[CachedLabel]:
+        """Get a cached label, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, entry)
+            return entry
+
+    def put(self, key: str, entry: CachedLabel):
+        """Store a rendered label"""
+        with self._lock:
+            self._store(key, entry)
+        self._write_disk(key, entry)
+
+    def clear(self):
+        """Drop all in-memory entries (the disk tier is kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters for instrumentation"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk_dir": self.disk_dir,
+        }
+
+    def _store(self, key: str, entry: CachedLabel):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, key: str) -> Optional[CachedLabel]:
+        if not self.disk_dir:
+            return None
+        base = os.path.join(self.disk_dir, key)
+        try:
+            with open(f"{base}.json", "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            with open(base + os.path.splitext(metadata["filename"])[1], "rb") as f:
+                image_bytes = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+        return CachedLabel(image_bytes=image_bytes, label_data=metadata["label_data"], filename=metadata["filename"],
+                           mimetype=metadata.get("mimetype", "image/png"))
+
+    def _write_disk(self, key: str, entry: CachedLabel):
+        if not self.disk_dir:
+            return
+        base = os.path.join(self.disk_dir, key)
+        image_path = base + os.path.splitext(entry.filename)[1]
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            # Write the image first and the metadata last (atomically), so a
+            # reader never sees metadata without its image
+            with open(f"{image_path}.{suffix}", "wb") as f:
+                f.write(entry.image_bytes)
+            os.replace(f"{image_path}.{suffix}", image_path)
+            with open(f"{base}.json.{suffix}", "w", encoding="utf-8") as f:
+                json.dump({"label_data": entry.label_data, "filename": entry.filename, "mimetype": entry.mimetype},
+                          f, ensure_ascii=False)
+            os.replace(f"{base}.json.{suffix}", f"{base}.json")
+        except OSError as e:
+            logger.warning(f"Failed to write label cache entry {key}: {e}")
@@ -0,0 +1,184 @@
+"""
+Label image encoders for SmartLabel AI Nutrition Label Generator
+Named output formats (PNG variants, palette/1-bit PNG, lossless WebP, SVG/PDF) and per-market selection
+"""
+
+import io
+import struct
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+from PIL import Image
+
+DEFAULT_ENCODER = "png"
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_ADLER_BASE = 65521
+
+
+def _png_chunks(data: bytes) -> Iterator[Tuple[bytes, bytes]]:
+    position = len(PNG_SIGNATURE)
+    while position + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[position:position + 8])
+        yield kind, data[position + 8:position + 8 + length]
+        position += 12 + length
+
+
+def _png_chunk(kind: bytes, body: bytes) -> bytes:
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+
+def _adler32_combine(adler1: int, adler2: int, length2: int) -> int:
+    """Adler-32 of two concatenated buffers from their checksums (zlib's adler32_combine)"""
+    remainder = length2 % _ADLER_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = (remainder * sum1) % _ADLER_BASE
+    sum1 = (sum1 + (adler2 & 0xFFFF) + _ADLER_BASE - 1) % _ADLER_BASE
+    sum2 = (sum2 + (adler1 >> 16) + (adler2 >> 16) + _ADLER_BASE - remainder) % _ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+def stack_png(top: Image.Image, png: bytes, compress_level: int = 6) -> Optional[bytes]:
+    """PNG of ``top`` stacked above the image encoded in ``png``, reusing its compressed rows
+
+    Only ``top`` is compressed: its rows become the first deflate blocks and
+    the existing stream follows unchanged. Works for 8-bit RGB, non-interlaced
+    PNGs whose first row is not filtered against the row above it (None or
+    Sub, as for a plain first row); returns None for anything else.
+    """
+    if not png.startswith(PNG_SIGNATURE) or top.mode != "RGB":
+        return None
+    chunks = list(_png_chunks(png))
+    if not chunks or chunks[0][0] != b"IHDR":
+        return None
+    width, height, depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", chunks[0][1])
+    stream = b"".join(body for kind, body in chunks if kind == b"IDAT")
+    if (width, depth, color_type, interlace) != (top.width, 8, 2, 0) or len(stream) < 6:
+        return None
+    if zlib.decompressobj().decompress(stream, 1) not in (b"\x00", b"\x01"):
+        return None
+
+    row = 3 * width
+    raw = top.tobytes()
+    rows = b"".join(b"\x00" + raw[offset:offset + row] for offset in range(0, len(raw), row))
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+    # A sync flush ends the new blocks on a byte boundary without marking the last block
+    head = compressor.compress(rows) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    adler = _adler32_combine(zlib.adler32(rows), struct.unpack(">I", stream[-4:])[0], height * (row + 1))
+    idat = stream[:2] + head + stream[2:-4] + struct.pack(">I", adler)
+
+    header = struct.pack(">IIBBBBB", width, top.height + height, 8, 2, 0, 0, 0)
+    return (PNG_SIGNATURE + _png_chunk(b"IHDR", header)
+            + b"".join(_png_chunk(kind, body) for kind, body in chunks[1:] if kind not in (b"IDAT", b"IEND"))
+            + _png_chunk(b"IDAT", idat) + _png_chunk(b"IEND", b""))
+
+
+@dataclass(frozen=True)
+class LabelEncoder:
+    """An output format plus the settings used to encode a rendered label
+
+    ``mode`` is "RGB" (as rendered), "P" (quantized to ``colors`` palette
+    entries) or "1" (black and white). ``options`` are passed to Image.save.
+    Vector encoders (SVG, PDF) encode the label layout instead of an image.
+    """
+    name: str
+    format: str = "PNG"
+    mode: str = "RGB"
+    colors: int = 256
+    options: Mapping[str, Any] = field(default_factory=dict)
+    vector: bool = False
+    media_type: str = ""
+
+    @property
+    def mimetype(self) -> str:
+        return self.media_type or f"image/{self.format.lower()}"
+
+    @property
+    def extension(self) -> str:
+        return f".{self.format.lower()}"
+
+    def encode(self, image: Image.Image) -> bytes:
+        """Encode a rendered (RGB) label"""
+        if self.mode == "P":
+            # Labels are black, white, red and gray plus antialiasing shades,
+            # which a small palette reproduces without dithering noise
+            image = image.quantize(colors=self.colors, method=Image.Quantize.FASTOCTREE,
+                                   dither=Image.Dither.NONE)
+        elif self.mode == "1":
+            image = image.convert("1", dither=Image.Dither.NONE)
+        buffer = io.BytesIO()
+        image.save(buffer, format=self.format, **self.options)
+        return buffer.getvalue()
+
+    def encode_below(self, top: Image.Image, encoded: bytes) -> bytes:
+        """Encode ``top`` stacked above an image this encoder produced
+
+        RGB PNGs are extended without re-encoding the existing image (see
+        stack_png); other formats are decoded, stacked and encoded again, so
+        palette encoders may pick slightly different colors than for a
+        single render.
+        """
+        if self.format == "PNG" and self.mode == "RGB":
+            stacked = stack_png(top, encoded, self.options.get("compress_level", 6))
+            if stacked is not None:
+                return stacked
+        with Image.open(io.BytesIO(encoded)) as image:
+            canvas = Image.new("RGB", (image.width, top.height + image.height))
+            canvas.paste(top.convert("RGB"), (0, 0))
+            canvas.paste(image.convert("RGB"), (0, top.height))
+        return self.encode(canvas)
+
+    def encode_layout(self, layout) -> bytes:
+        """Encode a LabelLayout (vector encoders only)"""
+        from vector_label import render_pdf, render_svg
+        if self.format == "SVG":
+            return render_svg(layout).encode("utf-8")
+        return render_pdf(layout)
+
+
+ENCODERS: Dict[str, LabelEncoder] = {encoder.name: encoder for encoder in [
+    # Pillow's defaults, as labels were always encoded
+    LabelEncoder("png"),
+    LabelEncoder("png-fast", options={"compress_level": 1}),
+    LabelEncoder("png-small", options={"compress_level": 9, "optimize": True}),
+    LabelEncoder("png-palette", mode="P", colors=16),
+    # Black and white only: crisis banners lose their red
+    LabelEncoder("png-1bit", mode="1", options={"compress_level": 9}),
+    LabelEncoder("webp-lossless", format="WEBP", options={"lossless": True, "quality": 50, "method": 4}),
+    LabelEncoder("webp-lossless-fast", format="WEBP", options={"lossless": True, "quality": 50, "method": 0}),
+    LabelEncoder("svg", format="SVG", vector=True, media_type="image/svg+xml"),
+    LabelEncoder("pdf", format="PDF", vector=True, media_type="application/pdf"),
+]}
+
+
+def get_encoder(name: str) -> LabelEncoder:
+    """Look up an encoder by name; raises ValueError for unknown names"""
+    encoder = ENCODERS.get(name.strip().lower()) if isinstance(name, str) else None
+    if encoder is None:
+        raise ValueError(f"Unknown encoder: {name} (available: {', '.join(ENCODERS)})")
+    return encoder
+
+
+def parse_market_encoders(spec: str) -> Dict[str, str]:
+    """Parse "market=encoder,market=encoder" (e.g. from LABEL_MARKET_ENCODERS)"""
+    markets = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        market, sep, name = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid market encoder '{item}' - expected market=encoder")
+        markets[market.strip().lower()] = name.strip().lower()
+    return markets
+
+
+class EncoderPolicy:
+    """Chooses the encoder for a label: the request's choice, else the market's, else the default"""
+
+    def __init__(self, default: str = DEFAULT_ENCODER, per_market: Optional[Dict[str, str]] = None):
+        self.default = get_encoder(default)
+        self.per_market = {market: get_encoder(name) for market, name in (per_market or {}).items()}
+
+    def select(self, market: str, requested: Optional[str] = None) -> LabelEncoder:
+        if requested:
+            return get_encoder(requested)
+        return self.per_market.get(market, self.default)
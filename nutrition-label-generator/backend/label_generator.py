@@ -1,65 +1,61 @@
-import json
-from datetime import datetime
-from aws_bedrock_client import BedrockClient
-from market_regulations import get_market_data
-from visual_label_creator import NutritionLabelCreator
+import base64
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
+from aws_bedrock_client import BedrockClient, BedrockOverloadedError, ConcurrentBedrockClient
+from label_cache import CachedLabel, LabelCache, label_cache_key, label_filename, normalize_product, strip_strings
+from label_encoder import DEFAULT_ENCODER, EncoderPolicy, LabelEncoder
+from market_regulations import MARKET_REGISTRY
+from metrics import ERRORS, LABELS, STAGE_SECONDS
+from render_pool import LocalRenderer
+from single_flight import SingleFlight
+from tracing import TRACER
+from visual_label_creator import RENDERER_VERSION, NutritionLabelCreator
+
+
+REQUIRED_FIELDS = ['product_name', 'serving_size', 'servings_per_container', 'calories']
+
+
+def validate_product_data(product_data) -> Optional[str]:
+    """Return an error message if product data is unusable, else None"""
+    if not isinstance(product_data, dict) or not product_data:
+        return "Invalid input data - JSON object required"
+    missing_fields = [field for field in REQUIRED_FIELDS if not product_data.get(field)]
+    if missing_fields:
+        return f"Missing required fields: {', '.join(missing_fields)}"
+    return None
+
 
 class NutritionLabelGenerator:
-    def __init__(self, bedrock_client: BedrockClient, visual_creator: NutritionLabelCreator):
+    def __init__(self, bedrock_client: BedrockClient, visual_creator: NutritionLabelCreator,
+                 cache: Optional[LabelCache] = None, renderer=None,
+                 encoders: Optional[EncoderPolicy] = None,
+                 concurrent_bedrock: Optional[ConcurrentBedrockClient] = None):
         self.bedrock_client = bedrock_client
+        # Bounds Bedrock calls in flight per process and sheds the excess (see aws_bedrock_client)
+        self.concurrent_bedrock = concurrent_bedrock
         self.visual_creator = visual_creator
+        self.cache = cache
+        # LocalRenderer or ProcessRenderPool (see render_pool)
+        self.renderer = renderer or LocalRenderer(visual_creator)
+        self.encoders = encoders or EncoderPolicy()
+        self.single_flight = SingleFlight()
 
-    def _generate_bedrock_content(self, product_data: dict, market: str) -> dict:
-        market_info = get_market_data(market)
-        market_name = market_info.get("name", market)
-        market_language = market_info.get("language", "en")
-
-        prompt = f"""
-        You are an expert in food labeling regulations for {market_name} ({market_language}).
-        Generate comprehensive nutrition label content based on the following product data.
-        Ensure compliance with {market_name}'s specific regulations (e.g., EU Regulation 1169/2011 for Spain, ANVISA RDC 429/2020 for Brazil, ARSO for Angola, Macau SAR requirements for Macau, Islamic dietary compliance for Halal).
-
-        Product Name: {product_data.get('product_name')}
-        Serving Size: {product_data.get('serving_size')}
-        Servings Per Container: {product_data.get('servings_per_container')}
-        Calories: {product_data.get('calories')}
-        Nutritional Values (per serving):
-        {json.dumps(product_data.get('nutritional_values', {}), indent=2)}
-        Ingredients List: {product_data.get('ingredients_list')}
-        Certifications: {', '.join(product_data.get('certifications', []))}
-        Target Market: {market_name}
-
-        Based on this, generate a JSON object with the following structure:
-        {{
-          "nutrition_facts": {{
-            "serving_size": "...",
-            "servings_per_container": "...",
-            "calories": "...",
-            "nutrients": [
-              {{"name": "Total Fat", "amount": "...", "unit": "g", "daily_value": "...", "major": true}},
-              {{"name": "Saturated Fat", "amount": "...", "unit": "g", "daily_value": "...", "indented": true}}
-              // ... other nutrients
-            ]
-          }},
-          "ingredients": "...",
-          "allergens": "...",
-          "certifications": ["...", "..."],
-          "regulatory_notes": "...",
-          "market_specific_warnings": "..."
-        }}
-
-        Ensure:
-        - Nutritional values are correctly formatted and daily values are calculated based on {market_name} standards.
-        - Ingredients list is compliant and translated if necessary for {market_name}.
-        - Allergens are clearly identified and prefixed with "{market_info.get('allergen_prefix', 'Contains:')}".
-        - Regulatory notes are specific to {market_name}.
-        - Certifications are listed.
-        - Use {market_language} for market-specific text where appropriate, but keep nutrient names in English for consistency unless explicitly required otherwise by {market_name} regulations.
-        - For Halal, include relevant Islamic dietary compliance notes.
-        """
-        
+    def cache_key(self, product_data: dict, market: str, crisis_info: Optional[dict] = None,
+                  normalized_product: Optional[dict] = None, encoder: str = DEFAULT_ENCODER) -> str:
+        """Content-addressed cache key for a label request"""
+        return label_cache_key(product_data, market, crisis_info,
+                               renderer_version=RENDERER_VERSION,
+                               model_id=getattr(self.bedrock_client, "model_id", ""),
+                               normalized_product=normalized_product, encoder=encoder)
+
+    def _generate_bedrock_content(self, product_data: dict, market: str) -> Union[CachedLabel, dict]:
         try:
-            response = self.bedrock_client.generate_nutrition_content(product_data, market)
+            with TRACER.span("generate_bedrock_content", market=market):
+                if self.concurrent_bedrock is not None:
+                    response = self.concurrent_bedrock.submit_nutrition_content(product_data, market).result()
+                else:
+                    response = self.bedrock_client.generate_nutrition_content(product_data, market)
             # Convert the NutritionData object to dict format expected by visual creator
             return {
                 "nutrition_facts": {
@@ -74,17 +70,96 @@ class NutritionLabelGenerator:
                 "regulatory_notes": response.regulatory_notes,
                 "market_specific_warnings": response.market_specific_warnings
             }
+        except BedrockOverloadedError:
+            # Not a failed label: the caller sheds the request (503 from the API)
+            ERRORS.inc(stage="bedrock", type="BedrockOverloadedError")
+            raise
         except Exception as e:
             print(f"Error generating content with Bedrock: {e}")
+            ERRORS.inc(stage="bedrock", type=type(e).__name__)
             return {"error": str(e)}
 
-    def generate_label(self, product_data: dict) -> dict:
-        market = product_data.get("market", "spain").lower()
-        market_data = get_market_data(market)
+    def generate_label(self, product_data: dict, encoder: Optional[str] = None) -> dict:
+        return self._label_result(self.generate_label_file(product_data, encoder))
+
+    def generate_label_file(self, product_data: dict, encoder: Optional[str] = None) -> Union[CachedLabel, dict]:
+        """Like generate_label, but returns the encoded image bytes as a CachedLabel (or an error dict)
 
-        if not market_data:
+        ``encoder`` names a label_encoder encoder; by default the market's
+        configured encoder is used.
+        """
+        market = product_data.get("market", "spain").lower()
+        if market not in MARKET_REGISTRY:
+            ERRORS.inc(stage="request", type="UnsupportedMarket")
             return {"error": f"Unsupported market: {market}"}
+        try:
+            label_encoder = self.encoders.select(market, encoder)
+        except ValueError as e:
+            ERRORS.inc(stage="request", type=type(e).__name__)
+            return {"error": str(e)}
+        return self._generate_for_market(product_data, market, label_encoder)
 
+    def generate_labels_for_markets(self, product_data: dict, markets: List[str],
+                                    max_workers: Optional[int] = None,
+                                    encoder: Optional[str] = None) -> Dict[str, dict]:
+        """
+        Generate labels for one product in several markets at once
+
+        Normalization is computed once and shared; market content is
+        generated and labels are rendered in parallel.
+
+        Returns:
+            dict: market -> generate_label result (or {"error": ...}), in the order given
+        """
+        markets = list(dict.fromkeys(market.strip().lower() for market in markets))
+        results, label_encoders = {}, {}
+        for market in markets:
+            if market not in MARKET_REGISTRY:
+                results[market] = {"error": f"Unsupported market: {market}"}
+                continue
+            try:
+                label_encoders[market] = self.encoders.select(market, encoder)
+            except ValueError as e:
+                ERRORS.inc(stage="request", type=type(e).__name__)
+                results[market] = {"error": str(e)}
+        if label_encoders:
+            normalized_product = normalize_product(product_data)
+            with ThreadPoolExecutor(max_workers=max_workers or len(label_encoders),
+                                    thread_name_prefix="market-label") as executor:
+                # Each market runs in the caller's context, so its spans join the request's trace
+                futures = {
+                    market: executor.submit(contextvars.copy_context().run, self._generate_for_market,
+                                            {**product_data, "market": market}, market, label_encoder,
+                                            normalized_product)
+                    for market, label_encoder in label_encoders.items()
+                }
+                for market, future in futures.items():
+                    try:
+                        results[market] = self._label_result(future.result())
+                    except Exception as e:
+                        print(f"Error generating label for market {market}: {e}")
+                        results[market] = {"error": str(e)}
+        return {market: results[market] for market in markets}
+
+    def _generate_for_market(self, product_data: dict, market: str, encoder: LabelEncoder,
+                             normalized_product: Optional[dict] = None) -> Union[CachedLabel, dict]:
+        cache_key = self.cache_key(product_data, market, normalized_product=normalized_product,
+                                   encoder=encoder.name)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                LABELS.inc(market=market, outcome="cached")
+                return cached
+
+        # Identical requests arriving while this label is generated share the result
+        label = self.single_flight.do(cache_key, lambda: self._build_label(product_data, market, cache_key, encoder))
+        LABELS.inc(market=market, outcome="generated" if isinstance(label, CachedLabel) else "error")
+        return label
+
+    def _build_label(self, product_data: dict, market: str, cache_key: str,
+                     encoder: LabelEncoder) -> Union[CachedLabel, dict]:
+        """Generate content and render the label (runs once per in-flight cache key)"""
+        product_data = strip_strings(product_data)
         # 1. Generate content using AWS Bedrock
         bedrock_output = self._generate_bedrock_content(product_data, market)
         if bedrock_output.get("error"):
@@ -99,25 +174,33 @@ class NutritionLabelGenerator:
 
         # 2. Create visual label
         try:
-            image = self.visual_creator.create_label(final_label_data, market)
-            
-            # Convert PIL Image to base64 string
-            import io
-            import base64
-            
-            # Save image to bytes buffer
-            img_buffer = io.BytesIO()
-            image.save(img_buffer, format='PNG')
-            img_buffer.seek(0)
-            
-            # Encode to base64
-            image_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
-            
-            return {
-                "image_base64": image_base64,
-                "label_data": final_label_data,
-                "filename": f"nutrition_label_{market}_{product_data.get('product_name', 'unknown').replace(' ', '_')}_{datetime.now().strftime('%Y%m%d%H%M%S')}.png"
-            }
+            with STAGE_SECONDS.time(stage="render", market=market), \
+                    TRACER.span("render", market=market, renderer=type(self.renderer).__name__):
+                image_bytes = self.renderer.render(final_label_data, market, encoder=encoder.name)
+            label = CachedLabel(
+                image_bytes=image_bytes,
+                label_data=final_label_data,
+                filename=label_filename("nutrition_label", product_data.get("product_name"), market, cache_key,
+                                        encoder.extension),
+                mimetype=encoder.mimetype
+            )
         except Exception as e:
             print(f"Error creating visual label: {e}")
-            return {"error": f"Failed to create visual label: {e}"}
\ No newline at end of file
+            ERRORS.inc(stage="render", type=type(e).__name__)
+            return {"error": f"Failed to create visual label: {e}"}
+
+        if self.cache is not None:
+            self.cache.put(cache_key, label)
+        return label
+
+    @staticmethod
+    def _label_result(label: Union[CachedLabel, dict]) -> dict:
+        if not isinstance(label, CachedLabel):
+            return label
+        with STAGE_SECONDS.time(stage="base64", market=label.label_data.get("market", "")):
+            image_base64 = base64.b64encode(label.image_bytes).decode('utf-8')
+        return {
+            "image_base64": image_base64,
+            "label_data": label.label_data,
+            "filename": label.filename
+        }
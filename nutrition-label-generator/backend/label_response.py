@@ -0,0 +1,107 @@
+"""
+Label response formats for SmartLabel AI Nutrition Label Generator
+Content negotiation between JSON (base64 image), raw image and multipart responses
+"""
+
+import base64
+import json
+import uuid
+from typing import Dict, Iterator
+
+from flask import Response, jsonify
+
+from label_cache import CachedLabel
+from label_encoder import DEFAULT_ENCODER, LabelEncoder, get_encoder
+from metrics import STAGE_SECONDS
+
+JSON_FORMAT = "application/json"
+IMAGE_FORMAT = "image/*"
+MULTIPART_FORMAT = "multipart/mixed"
+
+# Image types a client may ask for; the label is sent in its encoder's type
+IMAGE_MIMETYPES = ("image/png", "image/webp", "image/svg+xml", "application/pdf", IMAGE_FORMAT)
+
+# Encoder answering a request for an image type the label's configured encoder doesn't produce
+MIMETYPE_ENCODERS = {"image/png": "png", "image/webp": "webp-lossless", "image/svg+xml": "svg",
+                     "application/pdf": "pdf", IMAGE_FORMAT: DEFAULT_ENCODER}
+
+# ?format= shortcuts for clients that cannot set the Accept header
+FORMAT_ALIASES = {"json": JSON_FORMAT, "png": "image/png", "svg": "image/svg+xml", "pdf": "application/pdf",
+                  "image": IMAGE_FORMAT, "multipart": MULTIPART_FORMAT}
+
+
+class NotAcceptable(ValueError):
+    """The client accepts none of the image types the label can be sent in"""
+
+
+def negotiate_format(request) -> str:
+    """Response format from the ``format`` query parameter or the Accept header
+
+    JSON wins ties (e.g. ``Accept: */*``), so existing clients keep getting
+    JSON. Image requests return the preferred image type (one of
+    IMAGE_MIMETYPES).
+    """
+    requested = request.args.get("format")
+    if requested in FORMAT_ALIASES:
+        return FORMAT_ALIASES[requested]
+    return request.accept_mimetypes.best_match([JSON_FORMAT, *IMAGE_MIMETYPES, MULTIPART_FORMAT], default=JSON_FORMAT)
+
+
+def _accepts(request, response_format: str, mimetype: str) -> bool:
+    if request.args.get("format") in FORMAT_ALIASES:
+        return response_format in (mimetype, IMAGE_FORMAT)
+    return request.accept_mimetypes.quality(mimetype) > 0
+
+
+def negotiate_encoder(request, response_format: str, encoder: LabelEncoder, requested: bool = False) -> LabelEncoder:
+    """The encoder for a label sent in ``response_format`` (see negotiate_format)
+
+    ``encoder`` is the one selected for the label. JSON and multipart
+    responses carry any image type, so it is kept; so are image responses
+    whose Accept header allows its type. Otherwise the encoder for the
+    accepted type is used, unless the request named ``encoder`` itself
+    (``requested``): then, as when no encoder produces the accepted type,
+    NotAcceptable is raised.
+    """
+    if response_format not in IMAGE_MIMETYPES or _accepts(request, response_format, encoder.mimetype):
+        return encoder
+    if requested or response_format not in MIMETYPE_ENCODERS:
+        raise NotAcceptable(f"Encoder {encoder.name} produces {encoder.mimetype}, "
+                            f"which the request does not accept ({response_format})")
+    return get_encoder(MIMETYPE_ENCODERS[response_format])
+
+
+def _metadata(label: CachedLabel, extra: Dict) -> Dict:
+    return {"success": True, "label_data": label.label_data, "filename": label.filename,
+            "mimetype": label.mimetype, **extra}
+
+
+def _multipart_body(metadata: Dict, label: CachedLabel, boundary: str) -> Iterator[bytes]:
+    yield (f"--{boundary}\r\nContent-Type: {JSON_FORMAT}\r\n\r\n"
+           f"{json.dumps(metadata, ensure_ascii=False)}\r\n").encode("utf-8")
+    yield (f"--{boundary}\r\nContent-Type: {label.mimetype}\r\n"
+           f"Content-Disposition: inline; filename=\"{label.filename}\"\r\n"
+           f"Content-Length: {len(label.image_bytes)}\r\n\r\n").encode("utf-8")
+    # The cached image bytes are written as-is, without base64 or another copy
+    yield label.image_bytes
+    yield f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+
+def label_response(label: CachedLabel, response_format: str, **extra) -> Response:
+    """Build the response for a rendered label in the negotiated format
+
+    ``extra`` fields are added to the JSON body or the multipart JSON part.
+    """
+    if response_format in IMAGE_MIMETYPES:
+        response = Response(label.image_bytes, mimetype=label.mimetype)
+        response.headers["Content-Disposition"] = f"inline; filename=\"{label.filename}\""
+    elif response_format == MULTIPART_FORMAT:
+        boundary = uuid.uuid4().hex
+        response = Response(_multipart_body(_metadata(label, extra), label, boundary),
+                            content_type=f"{MULTIPART_FORMAT}; boundary={boundary}")
+    else:
+        with STAGE_SECONDS.time(stage="base64", market=label.label_data.get("market", "")):
+            image_base64 = base64.b64encode(label.image_bytes).decode("ascii")
+        response = jsonify({**_metadata(label, extra), "image_base64": image_base64})
+    response.headers["Vary"] = "Accept"
+    return response
@@ -0,0 +1,211 @@
+"""
+LLM Response Cache for SmartLabel AI Nutrition Label Generator
+Pluggable caches for Bedrock responses: in-memory LRU, SQLite, or both tiered
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def response_cache_key(model_id: str, prompt: str, params: Dict[str, Any]) -> str:
+    """Cache key from the model id, prompt hash and generation parameters"""
+    payload = {
+        "model_id": model_id,
+        "prompt_sha256": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        "params": params,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(ABC):
+    """Interface for Bedrock response caches
+
+    Entries expire ``ttl`` seconds after being stored (``None`` = never), and
+    at most ``max_entries`` are kept, evicting the least recently used.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Cached response for ``key``, or ``None`` on a miss"""
+
+    @abstractmethod
+    def put(self, key: str, value: str):
+        """Store ``value`` under ``key``"""
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters for instrumentation"""
+        lookups = self.hits + self.misses
+        return {
+            "type": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+        }
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+
+class MemoryResponseCache(ResponseCache):
+    """Thread-safe in-process LRU response cache"""
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        super().__init__(max_entries, ttl)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[0], now):
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "entries": len(self._entries)}
+
+
+class SQLiteResponseCache(ResponseCache):
+    """Response cache persisted in a SQLite database, shared across restarts and processes"""
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: Optional[float] = None):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        with self._lock:
+            self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        """This process's connection (call with the lock held)
+
+        SQLite connections must not be used across fork(), so server
+        workers forked from a preloaded app open their own on first use.
+        """
+        if self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self._expired(row[1], now):
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.expirations += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            excess = self._count() - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed LIMIT ?)", (excess,)
+                )
+                self.evictions += excess
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._count()
+        return {**super().stats(), "entries": entries, "path": self.path}
+
+    def _count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class TieredResponseCache(ResponseCache):
+    """Memory LRU in front of a persistent backend"""
+
+    def __init__(self, memory: ResponseCache, backend: ResponseCache):
+        super().__init__(memory.max_entries, memory.ttl)
+        self.memory = memory
+        self.backend = backend
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is None:
+            value = self.backend.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: str):
+        self.memory.put(key, value)
+        self.backend.put(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "memory": self.memory.stats(), "backend": self.backend.stats()}
+
+
+def build_response_cache(max_entries: int = 1024, ttl: Optional[float] = None,
+                         sqlite_path: Optional[str] = None, sqlite_max_entries: int = 10000) -> ResponseCache:
+    """Memory cache, tiered over SQLite when a database path is given"""
+    memory = MemoryResponseCache(max_entries=max_entries, ttl=ttl)
+    if not sqlite_path:
+        return memory
+    return TieredResponseCache(memory, SQLiteResponseCache(sqlite_path, max_entries=sqlite_max_entries, ttl=ttl))
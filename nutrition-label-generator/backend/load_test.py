@@ -0,0 +1,143 @@
+"""
+Load test for SmartLabel AI Nutrition Label Generator
+Concurrent label requests against a running API, or the Flask development server vs gunicorn side by side:
+
+    python load_test.py --url http://localhost:5001
+    python load_test.py --compare --requests 400 --concurrency 16
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+ENDPOINT = "/api/nutrition/generate-label"
+MARKETS = ("spain", "angola", "macau", "brazil", "halal")
+
+
+def product(index: int) -> dict:
+    """A distinct product per request, so every request renders a label instead of hitting the caches"""
+    return {
+        "product_name": f"Load Test Bar {index}",
+        "serving_size": "1 bar (40g)",
+        "servings_per_container": "6",
+        "calories": str(120 + index % 200),
+        "ingredients_list": "Oats, honey, almonds",
+        "market": MARKETS[index % len(MARKETS)],
+    }
+
+
+def post(url: str, index: int) -> float:
+    """One label request; returns its latency in seconds"""
+    body = json.dumps(product(index)).encode("utf-8")
+    req = urllib.request.Request(url + ENDPOINT, data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=60) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def run_load(url: str, requests: int, concurrency: int, offset: int = 0) -> dict:
+    """Send ``requests`` label requests, ``concurrency`` at a time"""
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(post, url, offset + index) for index in range(requests)]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except (OSError, urllib.error.URLError):
+                errors += 1
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+    }
+
+
+def wait_until_healthy(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(url + "/health", timeout=2):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become healthy within {timeout:.0f}s")
+
+
+def serve(command, port: int, env: dict) -> subprocess.Popen:
+    env = {**os.environ, **env, "PORT": str(port)}
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def compare(requests: int, concurrency: int, workers: int, threads: int, port: int):
+    """Same load against the development server and gunicorn, one after the other"""
+    servers = {
+        "flask dev server": ([sys.executable, "api_server.py"], {}),
+        f"gunicorn ({workers} workers × {threads} threads)": (
+            [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py"],
+            {"WEB_CONCURRENCY": str(workers), "THREADS": str(threads), "ACCESS_LOG": "/dev/null",
+             "PIDFILE": os.path.join(BACKEND_DIR, f"load_test_{port}.pid")}),
+    }
+    results = {}
+    for name, (command, env) in servers.items():
+        process = serve(command, port, env)
+        try:
+            url = f"http://127.0.0.1:{port}"
+            wait_until_healthy(url, process)
+            run_load(url, min(requests, 4 * concurrency), concurrency, offset=10**6)  # warm-up
+            results[name] = run_load(url, requests, concurrency)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        report(name, results[name])
+
+    baseline, production = results.values()
+    print(f"Throughput gain: {production['requests_per_second'] / baseline['requests_per_second']:.2f}x")
+
+
+def report(name: str, result: dict):
+    print(f"{name:>40}: {result['requests_per_second']:7.1f} req/s  p50 {result['p50_ms']:6.1f} ms  "
+          f"p95 {result['p95_ms']:6.1f} ms  ({result['requests']} requests, {result['errors']} errors, "
+          f"{result['seconds']:.1f} s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the label generation endpoint")
+    parser.add_argument("--url", default="http://localhost:5001", help="running API to load (default: %(default)s)")
+    parser.add_argument("--compare", action="store_true",
+                        help="start the development server, then gunicorn, and compare their throughput")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="gunicorn workers for --compare")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker for --compare")
+    parser.add_argument("--port", type=int, default=5099, help="port of the servers started by --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.requests, args.concurrency, args.workers, args.threads, args.port)
+    else:
+        report(args.url, run_load(args.url.rstrip("/"), args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,8 @@ Market Regulations for SmartLabel AI Nutrition Label Generator
 Defines compliance requirements and standards for different international markets
 """
 
-from typing import Dict, List, Optional, Any
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Any, Tuple, Union
 from dataclasses import dataclass
 from enum import Enum
 
@@ -14,9 +15,14 @@ class Market(Enum):
     BRAZIL = "brazil"
     HALAL = "halal"
 
-@dataclass
+@dataclass(frozen=True)
 class MarketRegulation:
-    """Market-specific regulation information"""
+    """Market-specific regulation information (immutable, shared process-wide)"""
+    __slots__ = (
+        "market", "title", "language", "regulation", "energy_unit", "daily_value_standards",
+        "mandatory_warnings", "allergen_prefix", "certification_requirements", "font_requirements"
+    )
+
     market: Market
     title: str
     language: str
@@ -28,166 +34,245 @@ class MarketRegulation:
     certification_requirements: List[str]
     font_requirements: Dict[str, any]
 
+    def __post_init__(self):
+        # Freeze the container fields so the shared instances cannot be mutated
+        object.__setattr__(self, "daily_value_standards", MappingProxyType(dict(self.daily_value_standards)))
+        object.__setattr__(self, "mandatory_warnings", tuple(self.mandatory_warnings))
+        object.__setattr__(self, "certification_requirements", tuple(self.certification_requirements))
+        object.__setattr__(self, "font_requirements", MappingProxyType({
+            key: tuple(value) if isinstance(value, list) else value
+            for key, value in self.font_requirements.items()
+        }))
+
+def _build_regulations() -> Dict[Market, MarketRegulation]:
+    """Build all market regulations (runs once, at import time)"""
+    return {
+        Market.SPAIN: MarketRegulation(
+            market=Market.SPAIN,
+            title="Información Nutricional",
+            language="Spanish",
+            regulation="EU Regulation 1169/2011",
+            energy_unit="kJ and kcal",
+            daily_value_standards={
+                "total_fat": 70.0,  # g
+                "saturated_fat": 20.0,  # g
+                "sugars": 90.0,  # g
+                "salt": 6.0,  # g
+                "fiber": 25.0,  # g
+                "protein": 50.0,  # g
+                "calories": 2000.0  # kcal
+            },
+            mandatory_warnings=[
+                "Cumple con Reglamento (UE) Nº 1169/2011",
+                "Información nutricional por 100g"
+            ],
+            allergen_prefix="Contiene:",
+            certification_requirements=["EU Organic", "IFS", "BRC"],
+            font_requirements={
+                "title_font_size": 16,
+                "body_font_size": 12,
+                "allergen_font_size": 10,
+                "bold_required": ["title", "allergens", "daily_values"]
+            }
+        ),
+        
+        Market.ANGOLA: MarketRegulation(
+            market=Market.ANGOLA,
+            title="Informação Nutricional",
+            language="Portuguese",
+            regulation="ARSO standards",
+            energy_unit="kcal",
+            daily_value_standards={
+                "total_fat": 65.0,  # g
+                "saturated_fat": 20.0,  # g
+                "sugars": 90.0,  # g
+                "salt": 5.0,  # g
+                "fiber": 25.0,  # g
+                "protein": 50.0,  # g
+                "calories": 2000.0  # kcal
+            },
+            mandatory_warnings=[
+                "Produto importado - cumpre padrões ARSO",
+                "Informação nutricional por 100g"
+            ],
+            allergen_prefix="ALÉRGENOS:",
+            certification_requirements=["ARSO", "IFS", "Halal"],
+            font_requirements={
+                "title_font_size": 16,
+                "body_font_size": 12,
+                "allergen_font_size": 10,
+                "bold_required": ["title", "allergens", "import_warning"]
+            }
+        ),
+        
+        Market.MACAU: MarketRegulation(
+            market=Market.MACAU,
+            title="營養標籤",
+            language="Chinese Traditional and English",
+            regulation="Macau SAR requirements",
+            energy_unit="kcal",
+            daily_value_standards={
+                "total_fat": 60.0,  # g
+                "saturated_fat": 20.0,  # g
+                "sugars": 90.0,  # g
+                "salt": 5.0,  # g
+                "fiber": 25.0,  # g
+                "protein": 50.0,  # g
+                "calories": 2000.0  # kcal
+            },
+            mandatory_warnings=[
+                "符合澳門特別行政區食品安全標準",
+                "Nutritional information per 100g"
+            ],
+            allergen_prefix="過敏原 / Allergens:",
+            certification_requirements=["Macau Food Safety", "Halal", "Organic"],
+            font_requirements={
+                "title_font_size": 16,
+                "body_font_size": 12,
+                "allergen_font_size": 10,
+                "bold_required": ["title", "allergens", "chinese_text"]
+            }
+        ),
+        
+        Market.BRAZIL: MarketRegulation(
+            market=Market.BRAZIL,
+            title="Informação Nutricional",
+            language="Portuguese",
+            regulation="ANVISA RDC 429/2020",
+            energy_unit="kcal",
+            daily_value_standards={
+                "total_fat": 55.0,  # g
+                "saturated_fat": 22.0,  # g
+                "sugars": 50.0,  # g
+                "salt": 2.0,  # g
+                "fiber": 25.0,  # g
+                "protein": 75.0,  # g
+                "calories": 2000.0  # kcal
+            },
+            mandatory_warnings=[
+                "Cumpre com RDC ANVISA 429/2020",
+                "Informação nutricional por 100g",
+                "ALÉRGENOS: Contém derivados de leite"
+            ],
+            allergen_prefix="ALÉRGENOS:",
+            certification_requirements=["ANVISA", "IFS", "BRC", "Halal"],
+            font_requirements={
+                "title_font_size": 16,
+                "body_font_size": 12,
+                "allergen_font_size": 10,
+                "bold_required": ["title", "allergens", "anvisa_compliance"]
+            }
+        ),
+        
+        Market.HALAL: MarketRegulation(
+            market=Market.HALAL,
+            title="Nutrition Facts / معلومات التغذية",
+            language="English and Arabic",
+            regulation="Islamic dietary compliance",
+            energy_unit="kcal",
+            daily_value_standards={
+                "total_fat": 65.0,  # g
+                "saturated_fat": 20.0,  # g
+                "sugars": 90.0,  # g
+                "salt": 6.0,  # g
+                "fiber": 25.0,  # g
+                "protein": 50.0,  # g
+                "calories": 2000.0  # kcal
+            },
+            mandatory_warnings=[
+                "Halal Certified - Certified by Islamic authority",
+                "مُصادق عليه حلال - مُعتمد من السلطة الإسلامية"
+            ],
+            allergen_prefix="ALÉRGENOS / المواد المسببة للحساسية:",
+            certification_requirements=["Halal", "Islamic Authority", "IFS"],
+            font_requirements={
+                "title_font_size": 16,
+                "body_font_size": 12,
+                "allergen_font_size": 10,
+                "bold_required": ["title", "halal_certification", "arabic_text"]
+            }
+        )
+    }
+
+
+class MarketRegistry:
+    """Immutable, process-wide lookup table of market regulations
+
+    Built once at import time and shared by every module. Lookups are a single
+    dictionary hit on the normalized market key, and the legacy dictionary
+    views returned by ``get_market_data`` are precomputed alongside.
+    """
+
+    __slots__ = ("_regulations", "_by_key", "_legacy_views")
+
+    def __init__(self, regulations: Dict[Market, MarketRegulation]):
+        self._regulations = MappingProxyType(dict(regulations))
+        self._by_key = {market.value: regulation for market, regulation in regulations.items()}
+        self._legacy_views = {
+            key: MappingProxyType(_legacy_view(regulation))
+            for key, regulation in self._by_key.items()
+        }
+
+    @property
+    def regulations(self) -> Mapping[Market, MarketRegulation]:
+        return self._regulations
+
+    @property
+    def markets(self) -> Tuple[str, ...]:
+        return tuple(self._by_key)
+
+    def get(self, market: Union[str, Market]) -> MarketRegulation:
+        """Get regulation for a market name or ``Market`` member"""
+        key = normalize_market(market)
+        try:
+            return self._by_key[key]
+        except KeyError:
+            raise ValueError(f"{market!r} is not a valid Market") from None
+
+    def get_legacy_view(self, market: Union[str, Market]) -> Mapping[str, Any]:
+        """Get the read-only legacy dictionary view for a market"""
+        key = normalize_market(market)
+        try:
+            return self._legacy_views[key]
+        except KeyError:
+            raise ValueError(f"{market!r} is not a valid Market") from None
+
+    def __contains__(self, market: object) -> bool:
+        return isinstance(market, (str, Market)) and normalize_market(market) in self._by_key
+
+
+def normalize_market(market: Union[str, Market]) -> str:
+    """Normalize a market name or ``Market`` member to its registry key"""
+    if isinstance(market, Market):
+        return market.value
+    return market.strip().lower()
+
+
+def _legacy_view(regulation: MarketRegulation) -> Dict[str, Any]:
+    """Convert a MarketRegulation to the dictionary shape of get_market_data"""
+    return {
+        "name": regulation.market.value.title(),
+        "language": regulation.language,
+        "title": regulation.title,
+        "calories_unit": regulation.energy_unit,
+        "daily_value_source": regulation.regulation,
+        "allergen_prefix": regulation.allergen_prefix,
+        "notes": regulation.mandatory_warnings[0] if regulation.mandatory_warnings else ""
+    }
+
+
+MARKET_REGISTRY = MarketRegistry(_build_regulations())
+
+
 class MarketRegulations:
     """Centralized market regulation definitions"""
     
     def __init__(self):
-        self.regulations = self._initialize_regulations()
+        self.regulations = MARKET_REGISTRY.regulations
     
     def get_regulation(self, market: str) -> MarketRegulation:
         """Get regulation for specific market"""
-        market_enum = Market(market.lower())
-        return self.regulations[market_enum]
-    
-    def _initialize_regulations(self) -> Dict[Market, MarketRegulation]:
-        """Initialize all market regulations"""
-        return {
-            Market.SPAIN: MarketRegulation(
-                market=Market.SPAIN,
-                title="Información Nutricional",
-                language="Spanish",
-                regulation="EU Regulation 1169/2011",
-                energy_unit="kJ and kcal",
-                daily_value_standards={
-                    "total_fat": 70.0,  # g
-                    "saturated_fat": 20.0,  # g
-                    "sugars": 90.0,  # g
-                    "salt": 6.0,  # g
-                    "fiber": 25.0,  # g
-                    "protein": 50.0,  # g
-                    "calories": 2000.0  # kcal
-                },
-                mandatory_warnings=[
-                    "Cumple con Reglamento (UE) Nº 1169/2011",
-                    "Información nutricional por 100g"
-                ],
-                allergen_prefix="Contiene:",
-                certification_requirements=["EU Organic", "IFS", "BRC"],
-                font_requirements={
-                    "title_font_size": 16,
-                    "body_font_size": 12,
-                    "allergen_font_size": 10,
-                    "bold_required": ["title", "allergens", "daily_values"]
-                }
-            ),
-            
-            Market.ANGOLA: MarketRegulation(
-                market=Market.ANGOLA,
-                title="Informação Nutricional",
-                language="Portuguese",
-                regulation="ARSO standards",
-                energy_unit="kcal",
-                daily_value_standards={
-                    "total_fat": 65.0,  # g
-                    "saturated_fat": 20.0,  # g
-                    "sugars": 90.0,  # g
-                    "salt": 5.0,  # g
-                    "fiber": 25.0,  # g
-                    "protein": 50.0,  # g
-                    "calories": 2000.0  # kcal
-                },
-                mandatory_warnings=[
-                    "Produto importado - cumpre padrões ARSO",
-                    "Informação nutricional por 100g"
-                ],
-                allergen_prefix="ALÉRGENOS:",
-                certification_requirements=["ARSO", "IFS", "Halal"],
-                font_requirements={
-                    "title_font_size": 16,
-                    "body_font_size": 12,
-                    "allergen_font_size": 10,
-                    "bold_required": ["title", "allergens", "import_warning"]
-                }
-            ),
-            
-            Market.MACAU: MarketRegulation(
-                market=Market.MACAU,
-                title="營養標籤",
-                language="Chinese Traditional and English",
-                regulation="Macau SAR requirements",
-                energy_unit="kcal",
-                daily_value_standards={
-                    "total_fat": 60.0,  # g
-                    "saturated_fat": 20.0,  # g
-                    "sugars": 90.0,  # g
-                    "salt": 5.0,  # g
-                    "fiber": 25.0,  # g
-                    "protein": 50.0,  # g
-                    "calories": 2000.0  # kcal
-                },
-                mandatory_warnings=[
-                    "符合澳門特別行政區食品安全標準",
-                    "Nutritional information per 100g"
-                ],
-                allergen_prefix="過敏原 / Allergens:",
-                certification_requirements=["Macau Food Safety", "Halal", "Organic"],
-                font_requirements={
-                    "title_font_size": 16,
-                    "body_font_size": 12,
-                    "allergen_font_size": 10,
-                    "bold_required": ["title", "allergens", "chinese_text"]
-                }
-            ),
-            
-            Market.BRAZIL: MarketRegulation(
-                market=Market.BRAZIL,
-                title="Informação Nutricional",
-                language="Portuguese",
-                regulation="ANVISA RDC 429/2020",
-                energy_unit="kcal",
-                daily_value_standards={
-                    "total_fat": 55.0,  # g
-                    "saturated_fat": 22.0,  # g
-                    "sugars": 50.0,  # g
-                    "salt": 2.0,  # g
-                    "fiber": 25.0,  # g
-                    "protein": 75.0,  # g
-                    "calories": 2000.0  # kcal
-                },
-                mandatory_warnings=[
-                    "Cumpre com RDC ANVISA 429/2020",
-                    "Informação nutricional por 100g",
-                    "ALÉRGENOS: Contém derivados de leite"
-                ],
-                allergen_prefix="ALÉRGENOS:",
-                certification_requirements=["ANVISA", "IFS", "BRC", "Halal"],
-                font_requirements={
-                    "title_font_size": 16,
-                    "body_font_size": 12,
-                    "allergen_font_size": 10,
-                    "bold_required": ["title", "allergens", "anvisa_compliance"]
-                }
-            ),
-            
-            Market.HALAL: MarketRegulation(
-                market=Market.HALAL,
-                title="Nutrition Facts / معلومات التغذية",
-                language="English and Arabic",
-                regulation="Islamic dietary compliance",
-                energy_unit="kcal",
-                daily_value_standards={
-                    "total_fat": 65.0,  # g
-                    "saturated_fat": 20.0,  # g
-                    "sugars": 90.0,  # g
-                    "salt": 6.0,  # g
-                    "fiber": 25.0,  # g
-                    "protein": 50.0,  # g
-                    "calories": 2000.0  # kcal
-                },
-                mandatory_warnings=[
-                    "Halal Certified - Certified by Islamic authority",
-                    "مُصادق عليه حلال - مُعتمد من السلطة الإسلامية"
-                ],
-                allergen_prefix="ALÉRGENOS / المواد المسببة للحساسية:",
-                certification_requirements=["Halal", "Islamic Authority", "IFS"],
-                font_requirements={
-                    "title_font_size": 16,
-                    "body_font_size": 12,
-                    "allergen_font_size": 10,
-                    "bold_required": ["title", "halal_certification", "arabic_text"]
-                }
-            )
-        }
+        return MARKET_REGISTRY.get(market)
     
     def get_daily_value_percentage(self, nutrient: str, amount: float, market: str) -> float:
         """Calculate daily value percentage for nutrient in specific market"""
@@ -195,10 +280,15 @@ class MarketRegulations:
         standard = regulation.daily_value_standards.get(nutrient.lower(), 100.0)
         return round((amount / standard) * 100, 0)
     
+    def get_daily_value_percentages(self, amounts, markets: Optional[List[str]] = None):
+        """DV percentages of a products × nutrients matrix for all markets at once (see daily_values)"""
+        from daily_values import get_daily_value_standards
+        return get_daily_value_standards().percentages(amounts, markets)
+    
     def get_mandatory_warnings(self, market: str) -> List[str]:
         """Get mandatory warnings for market"""
         regulation = self.get_regulation(market)
-        return regulation.mandatory_warnings
+        return list(regulation.mandatory_warnings)
     
     def format_allergen_statement(self, allergens: str, market: str) -> str:
         """Format allergen statement according to market requirements"""
@@ -232,40 +322,69 @@ class MarketRegulations:
         return regulation.font_requirements
 
 # Crisis response regulations
+CRISIS_WARNINGS: Dict[str, Dict[str, str]] = {
+    "recall": {
+        "spain": "RETIRADA DEL PRODUCTO - No consumir",
+        "angola": "RECALL DO PRODUTO - Não consumir",
+        "macau": "產品回收 - 請勿食用 / Product Recall - Do not consume",
+        "brazil": "RECALL DO PRODUTO - Não consumir",
+        "halal": "Product Recall / سحب المنتج - Do not consume / لا تستهلك"
+    },
+    "allergen": {
+        "spain": "ADVERTENCIA DE ALÉRGENOS - Puede contener alérgenos no declarados",
+        "angola": "AVISO DE ALÉRGENOS - Pode conter alérgenos não declarados",
+        "macau": "過敏原警告 / Allergen Warning - May contain undeclared allergens",
+        "brazil": "AVISO DE ALÉRGENOS - Pode conter alérgenos não declarados",
+        "halal": "Allergen Warning / تحذير المواد المسببة للحساسية - May contain undeclared allergens"
+    },
+    "contamination": {
+        "spain": "ADVERTENCIA DE CONTAMINACIÓN - Producto puede estar contaminado",
+        "angola": "AVISO DE CONTAMINAÇÃO - Produto pode estar contaminado",
+        "macau": "污染警告 / Contamination Warning - Product may be contaminated",
+        "brazil": "AVISO DE CONTAMINAÇÃO - Produto pode estar contaminado",
+        "halal": "Contamination Warning / تحذير التلوث - Product may be contaminated"
+    },
+    "regulatory": {
+        "spain": "ACTUALIZACIÓN REGULATORIA - Nuevos requisitos de cumplimiento",
+        "angola": "ATUALIZAÇÃO REGULATÓRIA - Novos requisitos de conformidade",
+        "macau": "法規更新 / Regulatory Update - New compliance requirements",
+        "brazil": "ATUALIZAÇÃO REGULATÓRIA - Novos requisitos de conformidade",
+        "halal": "Regulatory Update / تحديث تنظيمي - New compliance requirements"
+    }
+}
+
+CRISIS_CONTACT_INFO: Dict[str, str] = {
+    "spain": "Para más información: +34 900 123 456",
+    "angola": "Para mais informações: +244 222 123 456",
+    "macau": "更多資訊 / More info: +853 2856 3333",
+    "brazil": "Para mais informações: 0800 123 456",
+    "halal": "For more information / لمزيد من المعلومات: +1 800 123 456"
+}
+
+
+def _frozen_warnings(crisis_warnings: Mapping[str, Mapping[str, str]]) -> Mapping[str, Mapping[str, str]]:
+    return MappingProxyType({crisis.lower(): MappingProxyType(dict(texts))
+                             for crisis, texts in crisis_warnings.items()})
+
+
 class CrisisRegulations:
-    """Crisis-specific regulation handling"""
+    """Crisis-specific regulation handling
+
+    ``crisis_warnings`` and ``contact_info`` are read-only views; reload()
+    swaps in new ones instead of changing the shared module data.
+    """
     
     def __init__(self):
-        self.crisis_warnings = {
-            "recall": {
-                "spain": "RETIRADA DEL PRODUCTO - No consumir",
-                "angola": "RECALL DO PRODUTO - Não consumir",
-                "macau": "產品回收 - 請勿食用 / Product Recall - Do not consume",
-                "brazil": "RECALL DO PRODUTO - Não consumir",
-                "halal": "Product Recall / سحب المنتج - Do not consume / لا تستهلك"
-            },
-            "allergen": {
-                "spain": "ADVERTENCIA DE ALÉRGENOS - Puede contener alérgenos no declarados",
-                "angola": "AVISO DE ALÉRGENOS - Pode conter alérgenos não declarados",
-                "macau": "過敏原警告 / Allergen Warning - May contain undeclared allergens",
-                "brazil": "AVISO DE ALÉRGENOS - Pode conter alérgenos não declarados",
-                "halal": "Allergen Warning / تحذير المواد المسببة للحساسية - May contain undeclared allergens"
-            },
-            "contamination": {
-                "spain": "ADVERTENCIA DE CONTAMINACIÓN - Producto puede estar contaminado",
-                "angola": "AVISO DE CONTAMINAÇÃO - Produto pode estar contaminado",
-                "macau": "污染警告 / Contamination Warning - Product may be contaminated",
-                "brazil": "AVISO DE CONTAMINAÇÃO - Produto pode estar contaminado",
-                "halal": "Contamination Warning / تحذير التلوث - Product may be contaminated"
-            },
-            "regulatory": {
-                "spain": "ACTUALIZACIÓN REGULATORIA - Nuevos requisitos de cumplimiento",
-                "angola": "ATUALIZAÇÃO REGULATÓRIA - Novos requisitos de conformidade",
-                "macau": "法規更新 / Regulatory Update - New compliance requirements",
-                "brazil": "ATUALIZAÇÃO REGULATÓRIA - Novos requisitos de conformidade",
-                "halal": "Regulatory Update / تحديث تنظيمي - New compliance requirements"
-            }
-        }
+        self.crisis_warnings = _frozen_warnings(CRISIS_WARNINGS)
+        self.contact_info = MappingProxyType(dict(CRISIS_CONTACT_INFO))
+    
+    def reload(self, crisis_warnings: Optional[Dict[str, Dict[str, str]]] = None,
+               contact_info: Optional[Dict[str, str]] = None):
+        """Replace the crisis warning texts and/or contact details (e.g. after a regulation update)"""
+        if crisis_warnings is not None:
+            self.crisis_warnings = _frozen_warnings(crisis_warnings)
+        if contact_info is not None:
+            self.contact_info = MappingProxyType(dict(contact_info))
     
     def get_crisis_warning(self, crisis_type: str, market: str) -> str:
         """Get crisis warning text for specific crisis type and market"""
@@ -274,28 +393,12 @@ class CrisisRegulations:
     
     def get_crisis_contact_info(self, market: str) -> str:
         """Get crisis contact information for market"""
-        contact_info = {
-            "spain": "Para más información: +34 900 123 456",
-            "angola": "Para mais informações: +244 222 123 456",
-            "macau": "更多資訊 / More info: +853 2856 3333",
-            "brazil": "Para mais informações: 0800 123 456",
-            "halal": "For more information / لمزيد من المعلومات: +1 800 123 456"
-        }
-        return contact_info.get(market.lower(), "For more information: +1 800 123 456")
+        return self.contact_info.get(market.lower(), "For more information: +1 800 123 456")
 
 
-def get_market_data(market: str) -> Dict[str, Any]:
-    """Legacy function to get market data for backward compatibility"""
-    market_regulations = MarketRegulations()
-    regulation = market_regulations.get_regulation(market)
-    
-    # Convert MarketRegulation object to dictionary for backward compatibility
-    return {
-        "name": regulation.market.value.title(),
-        "language": regulation.language,
-        "title": regulation.title,
-        "calories_unit": regulation.energy_unit,
-        "daily_value_source": regulation.regulation,
-        "allergen_prefix": regulation.allergen_prefix,
-        "notes": regulation.mandatory_warnings[0] if regulation.mandatory_warnings else ""
-    }
+def get_market_data(market: str) -> Mapping[str, Any]:
+    """Legacy function to get market data for backward compatibility
+
+    Returns the precomputed read-only view from the shared registry.
+    """
+    return MARKET_REGISTRY.get_legacy_view(market)
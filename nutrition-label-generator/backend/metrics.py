@@ -0,0 +1,311 @@
+"""
+Metrics for SmartLabel AI Nutrition Label Generator
+Counters and latency histograms in the Prometheus text exposition format, without extra dependencies
+"""
+
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# From base64 of a cached label (well under a millisecond) to a slow Bedrock call
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labelnames: Tuple[str, ...], labels: Dict[str, str]) -> Tuple[str, ...]:
+    if len(labels) != len(labelnames) or not all(name in labels for name in labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self) -> List:
+        """The values as JSON (see MetricsRegistry.share)"""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    @staticmethod
+    def merge(values: Dict, snapshot: List):
+        """Add a snapshot of another process into ``values``"""
+        for key, value in snapshot:
+            key = tuple(key)
+            values[key] = values.get(key, 0) + value
+
+    def samples(self, values: Optional[Dict] = None) -> List[str]:
+        """Exposition lines for this process's values, or for ``values`` merged from several"""
+        if values is None:
+            with self._lock:
+                values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: "Histogram", labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Observations:
+    """Histogram observations recorded in one process to be replayed in another
+
+    Stands in for a Histogram (observe() and time()), e.g. in render pool
+    processes, whose metrics are never scraped.
+    """
+
+    def __init__(self):
+        self.values: List[Tuple[float, Dict[str, str]]] = []
+
+    def observe(self, value: float, **labels):
+        self.values.append((value, labels))
+
+    def time(self, **labels) -> _Timer:
+        return _Timer(self, labels)
+
+    def replay(self, histogram: "Histogram"):
+        for value, labels in self.values:
+            histogram.observe(value, **labels)
+
+
+class Histogram:
+    """Observations counted into cumulative buckets per label combination, with their count and sum"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label combination: [count per bucket (+Inf last)], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def time(self, **labels) -> _Timer:
+        """Context manager observing the seconds its block takes"""
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(_label_key(self.labelnames, labels))
+        return sum(entry[0]) if entry else 0
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self) -> List:
+        """The bucket counts and sums as JSON (see MetricsRegistry.share)"""
+        with self._lock:
+            return [[list(key), list(counts), total[0]] for key, (counts, total) in self._values.items()]
+
+    @staticmethod
+    def merge(values: Dict, snapshot: List):
+        """Add a snapshot of another process into ``values``"""
+        for key, counts, total in snapshot:
+            entry = values.setdefault(tuple(key), ([0] * len(counts), [0.0]))
+            for index, count in enumerate(counts):
+                entry[0][index] += count
+            entry[1][0] += total
+
+    def samples(self, values: Optional[Dict] = None) -> List[str]:
+        """Exposition lines for this process's values, or for ``values`` merged from several"""
+        if values is None:
+            with self._lock:
+                values = {key: (list(counts), list(total)) for key, (counts, total) in self._values.items()}
+        values = sorted((key, (counts, total[0])) for key, (counts, total) in values.items())
+        lines = []
+        names = self.labelnames + ("le",)
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (_format_value(bound),))} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics of a process, rendered together for a /metrics scrape
+
+    By default a scrape sees only the process that answers it. After
+    share(directory), every process using the registry (e.g. forked
+    server workers) writes its values to its own file in the directory,
+    and a scrape of any of them renders the sum over all files, as in
+    prometheus_client's multiprocess mode.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.directory: Optional[str] = None
+        self.interval = 1.0
+        self._writer_pid: Optional[int] = None
+
+    def share(self, directory: str, interval: float = 1.0):
+        """Aggregate the metrics of every process sharing ``directory``
+
+        Each process writes its file every ``interval`` seconds and at
+        exit. Files of exited processes keep counting, so counters never
+        go back; clear the directory (clear_shared) when the server starts.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.interval = interval
+        self.ensure_writer()
+
+    def ensure_writer(self):
+        """Start this process's writer thread (workers forked after share() call this)"""
+        if self.directory is None or self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            forked, self._writer_pid = self._writer_pid is not None, os.getpid()
+        if forked:
+            # Values copied from the parent at fork are in the parent's file already
+            for metric in list(self._metrics.values()):
+                metric.reset()
+        threading.Thread(target=self._write_periodically, name="metrics-writer", daemon=True).start()
+        atexit.register(self._write)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        merged = self._merge_shared() if self.directory is not None else None
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples(merged[metric.name] if merged is not None else None))
+        return "\n".join(lines) + "\n"
+
+    def _merge_shared(self) -> Dict[str, Dict]:
+        self._write()  # this process's file is current; the others are at most ``interval`` old
+        merged = {name: {} for name in self._metrics}
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping metrics file {path}: {e}")
+                continue
+            for name, metric in self._metrics.items():
+                metric.merge(merged[name], snapshot.get(name, []))
+        return merged
+
+    def _write(self):
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        snapshot = {name: metric.snapshot() for name, metric in list(self._metrics.items())}
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _write_periodically(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self._write()
+            except OSError as e:
+                logger.warning(f"Writing metrics to {self.directory} failed: {e}")
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+
+def clear_shared(directory: str):
+    """Remove the metrics files of an earlier run (at server start, before workers are forked)"""
+    for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+        os.remove(path)
+
+
+# Process-wide registry and the label pipeline's metrics
+METRICS = MetricsRegistry()
+
+REQUESTS = METRICS.counter("label_api_requests_total", "HTTP requests by endpoint, method and status",
+                           ("endpoint", "method", "status"))
+REQUEST_SECONDS = METRICS.histogram("label_api_request_duration_seconds",
+                                    "Time to the response (streamed bodies excluded) by endpoint", ("endpoint",))
+ERRORS = METRICS.counter("label_errors_total", "Label pipeline errors by stage and error type", ("stage", "type"))
+LABELS = METRICS.counter("labels_total", "Label requests by market and outcome (cached, generated, error)",
+                         ("market", "outcome"))
+STAGE_SECONDS = METRICS.histogram("label_stage_duration_seconds",
+                                  "Time spent in each label pipeline stage by market", ("stage", "market"))
+BEDROCK_SECONDS = METRICS.histogram("bedrock_request_duration_seconds",
+                                    "Bedrock model calls and response parsing by outcome", ("operation", "outcome"))
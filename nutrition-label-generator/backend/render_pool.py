@@ -0,0 +1,193 @@
+"""
+Label rendering backends for SmartLabel AI Nutrition Label Generator
+Render and encode labels in the calling thread or in a warm process pool
+"""
+
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from label_encoder import DEFAULT_ENCODER, get_encoder
+from metrics import STAGE_SECONDS, Observations
+from tracing import TRACER, Span, SpanCollector
+from visual_label_creator import NutritionLabelCreator
+
+logger = logging.getLogger(__name__)
+
+
+def render_label(creator: NutritionLabelCreator, label_data: Dict, market: str,
+                 crisis_type: Optional[str], encoder: str, stage_seconds=STAGE_SECONDS) -> bytes:
+    """Lay out, draw and encode a label (vector encoders skip rasterizing)
+
+    Stage timings go to ``stage_seconds``: STAGE_SECONDS, or Observations
+    to send back from a pool process.
+    """
+    label_encoder = get_encoder(encoder)
+    # create_label, in two stages
+    with TRACER.span("create_label", market=market):
+        with stage_seconds.time(stage="layout", market=market), TRACER.span("layout"):
+            layout = creator.record_layout(label_data, market, crisis_type)
+        if not label_encoder.vector:
+            with stage_seconds.time(stage="draw", market=market), TRACER.span("draw"):
+                image = creator.render_layout(layout)
+    with stage_seconds.time(stage="encode", market=market), TRACER.span("encode", encoder=encoder) as span:
+        image_bytes = label_encoder.encode_layout(layout) if label_encoder.vector else label_encoder.encode(image)
+        span.set_attribute("bytes", len(image_bytes))
+        return image_bytes
+
+
+class LocalRenderer:
+    """Renders labels in the calling thread"""
+
+    def __init__(self, visual_creator: Optional[NutritionLabelCreator] = None):
+        self.visual_creator = visual_creator or NutritionLabelCreator()
+
+    def render(self, label_data: Dict, market: str, crisis_type: Optional[str] = None,
+               encoder: str = DEFAULT_ENCODER) -> bytes:
+        """Render a label and return it encoded with the named encoder"""
+        return render_label(self.visual_creator, label_data, market, crisis_type, encoder)
+
+    def stats(self) -> Dict:
+        return {"type": type(self).__name__}
+
+    def close(self):
+        pass
+
+
+# Per-process label creator, set up once by the pool initializer
+_worker_creator: Optional[NutritionLabelCreator] = None
+
+
+def _init_worker(crisis_regulations: Optional[Tuple[Optional[Dict], Optional[Dict]]] = None):
+    global _worker_creator
+    _worker_creator = NutritionLabelCreator()
+    if crisis_regulations is not None:
+        # Texts reloaded in the parent (ProcessRenderPool.reload_crisis_regulations), before the banners render
+        _worker_creator.crisis_regulations.reload(*crisis_regulations)
+    _worker_creator.preload_fonts()
+    # Spans of traced renders are sent back with the label; the parent process exports them
+    TRACER.configure(exporter=SpanCollector(), sample_rate=1.0)
+
+
+def _render_in_worker(label_data: Dict, market: str, crisis_type: Optional[str], encoder: str,
+                      traceparent: Optional[str] = None) -> Tuple[bytes, List[Span], Observations]:
+    # Stage timings, like spans, go back to the parent: nothing scrapes this process's metrics
+    stage_seconds = Observations()
+    TRACER.exporter.drain()  # left over from a failed render
+    with TRACER.continue_trace(traceparent):
+        image_bytes = render_label(_worker_creator, label_data, market, crisis_type, encoder, stage_seconds)
+    return image_bytes, TRACER.exporter.drain(), stage_seconds
+
+
+def _worker_pid(_) -> int:
+    # Long enough that every idle worker picks up one of the warm-up tasks
+    time.sleep(0.05)
+    return os.getpid()
+
+
+class ProcessRenderPool:
+    """Renders labels in a pool of worker processes
+
+    Label drawing and PNG encoding are CPU bound and hold the GIL, so in a
+    threaded server concurrent renders share one core. The pool starts all
+    of its workers up front, each with its fonts already loaded, and returns
+    the encoded image bytes over the pool's pipes.
+
+    ``start_method`` defaults to "spawn": forking a process that already runs
+    server and boto3 threads is not safe. The worker processes start on
+    first use (or warm_up()), so a preloading server master that never
+    renders starts none. A process forked from one that did starts its
+    own pool and leaves the parent's alone.
+    """
+
+    def __init__(self, processes: Optional[int] = None, start_method: str = "spawn"):
+        self.processes = processes or os.cpu_count() or 1
+        self._context = multiprocessing.get_context(start_method)
+        self._lock = threading.Lock()
+        self._owner: Optional[int] = None
+        self._pool = None
+        # Crisis warnings and contact info replacing the defaults in the workers, once reloaded
+        self._crisis_regulations: Optional[Tuple[Optional[Dict], Optional[Dict]]] = None
+        self.renders = 0
+        atexit.register(self.close)
+
+    def _process_pool(self):
+        if self._owner != os.getpid():
+            with self._lock:
+                if self._owner != os.getpid():
+                    # An inherited pool's pipes and workers belong to the parent process
+                    self._pool = self._start_pool()
+                    self._owner = os.getpid()
+        return self._pool
+
+    def _start_pool(self):
+        return self._context.Pool(self.processes, initializer=_init_worker, initargs=(self._crisis_regulations,))
+
+    def reload_crisis_regulations(self, crisis_warnings: Optional[Dict[str, Dict[str, str]]] = None,
+                                  contact_info: Optional[Dict[str, str]] = None):
+        """Replace the crisis warning texts in the workers (see NutritionLabelCreator.reload_crisis_regulations)
+
+        The workers are replaced by new ones that render their banners with
+        the new texts; renders already submitted finish on the old workers.
+        """
+        with self._lock:
+            warnings, contacts = self._crisis_regulations or (None, None)
+            if crisis_warnings is not None:
+                warnings = {crisis: dict(texts) for crisis, texts in crisis_warnings.items()}
+            if contact_info is not None:
+                contacts = dict(contact_info)
+            self._crisis_regulations = (warnings, contacts)
+            if self._pool is None or self._owner != os.getpid():
+                return  # started with the new texts on first use
+            old, self._pool = self._pool, self._start_pool()
+        old.close()
+        threading.Thread(target=old.join, name="render-pool-retire", daemon=True).start()
+
+    def warm_up(self) -> int:
+        """Block until every worker has started; returns the number of live workers"""
+        pids = self._process_pool().map(_worker_pid, range(self.processes * 2), chunksize=1)
+        return len(set(pids))
+
+    def render(self, label_data: Dict, market: str, crisis_type: Optional[str] = None,
+               encoder: str = DEFAULT_ENCODER) -> bytes:
+        """Render and encode a label in a worker process"""
+        # The worker's spans join the current trace
+        parent = TRACER.current_span()
+        traceparent = parent.traceparent if parent is not None else None
+        args = (label_data, market, crisis_type, encoder, traceparent)
+        pool = self._process_pool()
+        try:
+            image_bytes, spans, stage_seconds = pool.apply(_render_in_worker, args)
+        except ValueError:
+            if pool is self._pool:
+                raise
+            # The pool was replaced by reload_crisis_regulations before the render was submitted
+            image_bytes, spans, stage_seconds = self._process_pool().apply(_render_in_worker, args)
+        TRACER.export(spans)
+        stage_seconds.replay(STAGE_SECONDS)
+        with self._lock:
+            self.renders += 1
+        return image_bytes
+
+    def stats(self) -> Dict:
+        return {"type": type(self).__name__, "processes": self.processes, "renders": self.renders}
+
+    def close(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            if self._owner == os.getpid():
+                self._pool.terminate()
+                self._pool.join()
+            self._pool = None
+            atexit.unregister(self.close)
+
+
+def build_renderer(processes: int = 0, visual_creator: Optional[NutritionLabelCreator] = None):
+    """In-thread renderer, or a process pool of ``processes`` workers when positive"""
+    if processes > 0:
+        return ProcessRenderPool(processes)
+    return LocalRenderer(visual_creator)
@@ -0,0 +1,31 @@
+"""
+Sample data for SmartLabel AI Nutrition Label Generator
+A product request and rendered label content, shared by the benchmarks and the tests
+"""
+
+# Label content as passed to the renderers (product fields plus generated nutrition content)
+SAMPLE_LABEL = {
+    "product_name": "Premium Whey Protein Powder",
+    "serving_size": "1 Scoop (37.4g)",
+    "servings_per_container": "25",
+    "calories": "150",
+    "nutrients": [
+        {"name": "Total Fat", "amount": "3", "unit": "g", "daily_value": "4", "major": True},
+        {"name": "Saturated Fat", "amount": "3", "unit": "g", "daily_value": "15", "indented": True},
+        {"name": "Protein", "amount": "25", "unit": "g", "daily_value": "50", "major": True},
+    ],
+    "ingredients": "Whey protein isolate, cocoa powder, natural flavours, sunflower lecithin, sucralose",
+    "allergens": "Milk, soy",
+    "certifications": ["Halal", "IFS"],
+}
+
+# A label request as posted to the API
+SAMPLE_PRODUCT = {
+    "product_name": "Test Protein Bar",
+    "serving_size": "1 bar (60g)",
+    "servings_per_container": "12",
+    "calories": "210",
+    "ingredients_list": "Whey protein, oats, honey, almonds",
+    "certifications": ["Halal"],
+    "market": "spain",
+}
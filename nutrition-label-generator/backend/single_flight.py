@@ -0,0 +1,58 @@
+"""
+Request coalescing for SmartLabel AI Nutrition Label Generator
+Concurrent calls with the same key share one in-flight computation
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait for and receive the same result, or the
+    same exception. Once the call completes the key is forgotten, so later
+    calls run again (pair this with a cache to reuse finished results).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.executions = 0
+        self.deduplicated = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                self.executions += 1
+            else:
+                self.deduplicated += 1
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        """How many calls ran and how many were served by an in-flight call"""
+        with self._lock:
+            in_flight = len(self._calls)
+        return {
+            "executions": self.executions,
+            "deduplicated": self.deduplicated,
+            "in_flight": in_flight,
+        }
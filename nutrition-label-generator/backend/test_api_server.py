@@ -0,0 +1,239 @@
+"""
+Tests for the Flask API server endpoints
+"""
+
+import sys
+import os
+import io
+import json
+import base64
+
+import pytest
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import api_server
+from api_server import app
+from aws_bedrock_client import ConcurrentBedrockClient
+
+PRODUCT = {
+    "product_name": "Test Protein Bar",
+    "serving_size": "1 bar (60g)",
+    "servings_per_container": "12",
+    "calories": "210",
+    "ingredients_list": "Whey protein, oats, honey, almonds",
+    "market": "spain",
+}
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def _ndjson(response):
+    return [json.loads(line) for line in response.data.decode("utf-8").splitlines()]
+
+
+def test_batch_generate_products_by_markets(client):
+    response = client.post("/api/nutrition/batch-generate", json={
+        "products": [PRODUCT, {"product_name": "Incomplete"}],
+        "markets": ["spain", "macau", "atlantis"],
+    })
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    results = {result["index"]: result for result in _ndjson(response)}
+    assert sorted(results) == list(range(6))
+    assert results[0]["success"] and results[0]["market"] == "spain" and results[0]["image_base64"]
+    assert results[1]["success"] and results[1]["market"] == "macau"
+    assert results[2] == {"index": 2, "product_name": "Test Protein Bar", "market": "atlantis",
+                          "success": False, "error": "Unsupported market: atlantis"}
+    assert all(not results[i]["success"] and "Missing required fields" in results[i]["error"] for i in (3, 4, 5))
+
+
+def test_batch_generate_ndjson_upload_reports_bad_lines(client):
+    body = "\n".join([json.dumps(PRODUCT), "{not json", json.dumps(dict(PRODUCT, market="brazil"))])
+
+    response = client.post("/api/nutrition/batch-generate", data=body, content_type="application/x-ndjson")
+    results = sorted(_ndjson(response), key=lambda result: result["index"])
+    assert [result["success"] for result in results] == [True, False, True]
+    assert results[1]["error"].startswith("Invalid JSON line")
+    assert results[2]["market"] == "brazil"
+
+    response = client.post("/api/nutrition/batch-generate", data={
+        "file": (io.BytesIO(body.encode("utf-8")), "products.jsonl"),
+        "markets": ["halal"],
+    }, content_type="multipart/form-data")
+    results = _ndjson(response)
+    assert len(results) == 3
+    assert {result["market"] for result in results if result["success"]} == {"halal"}
+
+
+def test_batch_generate_rejects_invalid_body(client):
+    response = client.post("/api/nutrition/batch-generate", json={"product_name": "Single"})
+    assert response.status_code == 400
+    response = client.post("/api/nutrition/batch-generate", json={"products": [PRODUCT], "markets": "spain"})
+    assert response.status_code == 400
+
+
+def test_generate_market_labels(client):
+    product = {key: value for key, value in PRODUCT.items() if key != "market"}
+    response = client.post("/api/nutrition/generate-market-labels",
+                           json={**product, "markets": ["spain", "brazil", "atlantis"]})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["success"] is False
+    assert set(body["labels"]) == {"spain", "brazil", "atlantis"}
+    assert body["labels"]["brazil"]["success"] and body["labels"]["brazil"]["image_base64"]
+    assert body["labels"]["atlantis"] == {"success": False, "error": "Unsupported market: atlantis"}
+
+    response = client.post("/api/nutrition/generate-market-labels", json={**product, "markets": "spain"})
+    assert response.status_code == 400
+
+
+def test_generate_label_content_negotiation(client):
+    as_json = client.post("/api/nutrition/generate-label", json=PRODUCT)
+    assert as_json.mimetype == "application/json"
+    body = as_json.get_json()
+    png_bytes = base64.b64decode(body["image_base64"])
+
+    as_png = client.post("/api/nutrition/generate-label", json=PRODUCT, headers={"Accept": "image/png"})
+    assert as_png.status_code == 200
+    assert as_png.mimetype == "image/png"
+    assert as_png.data == png_bytes
+    assert body["filename"] in as_png.headers["Content-Disposition"]
+
+    as_multipart = client.post("/api/nutrition/generate-label?format=multipart", json=PRODUCT)
+    assert as_multipart.mimetype == "multipart/mixed"
+    boundary = as_multipart.mimetype_params["boundary"].encode()
+    parts = as_multipart.data.split(b"--" + boundary)
+    metadata = json.loads(parts[1].split(b"\r\n\r\n", 1)[1])
+    assert metadata["filename"] == body["filename"] and metadata["label_data"] == body["label_data"]
+    assert parts[2].split(b"\r\n\r\n", 1)[1][:-2] == png_bytes
+    assert parts[3] == b"--\r\n"
+
+
+def test_generate_label_encoder_parameter(client):
+    response = client.post("/api/nutrition/generate-label?encoder=webp-lossless", json=PRODUCT,
+                           headers={"Accept": "image/*"})
+    assert response.mimetype == "image/webp"
+    assert response.headers["Content-Disposition"].endswith('.webp"')
+
+    response = client.post("/api/nutrition/generate-label?encoder=gif", json=PRODUCT)
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith("Unknown encoder: gif")
+
+
+def test_generate_label_accept_selects_encoder(client):
+    response = client.post("/api/nutrition/generate-label", json=PRODUCT, headers={"Accept": "image/webp"})
+    assert response.status_code == 200
+    assert response.mimetype == "image/webp" and response.data[8:12] == b"WEBP"
+    assert response.headers["Content-Disposition"].endswith('.webp"')
+
+    # The configured encoder is kept when its type is acceptable
+    response = client.post("/api/nutrition/generate-label", json=PRODUCT,
+                           headers={"Accept": "image/webp, image/png;q=0.5"})
+    assert response.mimetype == "image/png"
+
+    response = client.post("/api/nutrition/generate-label?encoder=png", json=PRODUCT,
+                           headers={"Accept": "image/webp"})
+    assert response.status_code == 406
+    assert "image/png" in response.get_json()["error"]
+
+
+def test_generate_label_accept_selects_vector_encoder(client):
+    response = client.post("/api/nutrition/generate-label", json=PRODUCT, headers={"Accept": "application/pdf"})
+    assert response.status_code == 200
+    assert response.mimetype == "application/pdf" and response.data.startswith(b"%PDF")
+    assert response.headers["Content-Disposition"].endswith('.pdf"')
+
+    response = client.post("/api/nutrition/generate-label", json=PRODUCT, headers={"Accept": "image/svg+xml"})
+    assert response.mimetype == "image/svg+xml" and b"<svg" in response.data
+
+    response = client.post("/api/nutrition/generate-label?format=svg", json=PRODUCT)
+    assert response.mimetype == "image/svg+xml"
+
+
+def test_generate_label_sheds_load_when_bedrock_is_overloaded(client, monkeypatch):
+    bedrock = ConcurrentBedrockClient(api_server.bedrock_client, max_concurrency=1, max_queue=0)
+    monkeypatch.setattr(api_server.label_generator, "concurrent_bedrock", bedrock)
+    product = {**PRODUCT, "product_name": "Overloaded Bar"}
+
+    bedrock._slots.acquire()  # the only slot is busy
+    response = client.post("/api/nutrition/generate-label", json=product)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(api_server.BEDROCK_RETRY_AFTER)
+    assert response.get_json()["error"].startswith("Bedrock request queue is full")
+
+    bedrock._slots.release()
+    response = client.post("/api/nutrition/generate-label", json=product)
+    assert response.status_code == 200
+    assert bedrock.stats()["rejected"] == 1
+    bedrock.shutdown()
+
+
+def test_crisis_label_sheds_load_when_bedrock_is_overloaded(client, monkeypatch):
+    bedrock = ConcurrentBedrockClient(api_server.bedrock_client, max_concurrency=1, max_queue=0)
+    monkeypatch.setattr(api_server.crisis_generator, "concurrent_bedrock", bedrock)
+    crisis = {"original_product_data": {**PRODUCT, "product_name": "Overloaded Crisis Bar"},
+              "crisis_info": {"type": "recall", "details": "Batch 7"}}
+
+    bedrock._slots.acquire()
+    response = client.post("/api/nutrition/crisis-response", json=crisis)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(api_server.BEDROCK_RETRY_AFTER)
+
+    bedrock._slots.release()
+    assert client.post("/api/nutrition/crisis-response", json=crisis).status_code == 200
+    assert bedrock.stats()["rejected"] == 1
+    bedrock.shutdown()
+
+
+def test_label_job_submit_and_long_poll(client):
+    response = client.post("/api/nutrition/jobs", json=PRODUCT)
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+
+    job = client.get(f"/api/nutrition/jobs/{job_id}?wait=30").get_json()
+    assert job["status"] == "completed" and job["result"]["image_base64"]
+    assert client.get("/api/nutrition/jobs/unknown").status_code == 404
+
+
+def test_label_jobs_for_products_by_markets(client):
+    response = client.post("/api/nutrition/jobs", json={"products": [PRODUCT], "markets": ["brazil", "atlantis"]})
+    assert response.status_code == 202
+    brazil, atlantis = response.get_json()["job_ids"]
+
+    assert client.get(f"/api/nutrition/jobs/{brazil}?wait=30").get_json()["result"]["label_data"]
+    assert client.get(f"/api/nutrition/jobs/{atlantis}?wait=30").get_json() \
+        ["error"] == "Unsupported market: atlantis"
+    assert client.post("/api/nutrition/jobs", json={"products": [PRODUCT, {"product_name": "x"}]}).status_code == 400
+
+
+def test_label_job_events(client):
+    job_id = client.post("/api/nutrition/jobs", json=PRODUCT).get_json()["job_id"]
+
+    response = client.get(f"/api/nutrition/jobs/{job_id}/events")
+    assert response.mimetype == "text/event-stream"
+    events = [block.split("\n") for block in response.data.decode("utf-8").strip().split("\n\n")]
+    final = events[-1]
+    assert final[0] == "event: completed" and json.loads(final[1][len("data: "):])["result"]["filename"]
+
+
+def test_metrics_endpoint(client):
+    from metrics import LABELS, STAGE_SECONDS
+    product = dict(PRODUCT, product_name="Metrics Bar", market="macau")
+    client.post("/api/nutrition/generate-label", json=product)
+    client.post("/api/nutrition/generate-label", json=product)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200 and response.mimetype == "text/plain"
+    text = response.data.decode("utf-8")
+    assert 'label_api_requests_total{endpoint="/api/nutrition/generate-label",method="POST",status="200"}' in text
+    assert LABELS.value(market="macau", outcome="generated") >= 1
+    assert LABELS.value(market="macau", outcome="cached") >= 1
+    for stage in ("bedrock", "render", "layout", "draw", "encode", "base64"):
+        assert STAGE_SECONDS.count(stage=stage, market="macau") >= 1
@@ -0,0 +1,107 @@
+"""
+Tests for the concurrent Bedrock client against a local stub server
+"""
+
+import sys
+import os
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aws_bedrock_client import BedrockClient, BedrockOverloadedError, ConcurrentBedrockClient
+
+STUB_LATENCY = 0.2
+
+
+class StubBedrockHandler(BaseHTTPRequestHandler):
+    """Answers InvokeModel requests after a fixed delay, tracking peak concurrency"""
+
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        try:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(STUB_LATENCY)
+            payload = json.dumps({"content": [{"text": "echo: " + body["messages"][0]["content"]}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    StubBedrockHandler.active = StubBedrockHandler.peak = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBedrockHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_keeps_bounded_requests_in_flight(stub_server):
+    client = ConcurrentBedrockClient.create(max_concurrency=4, max_queue=8, endpoint_url=stub_server)
+    client.bedrock_client.reset_client()  # boto3 client setup is lazy; keep it out of the timing
+
+    start = time.perf_counter()
+    futures = [client.submit_prompt(f"prompt {i}") for i in range(8)]
+    results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    assert results == [f"echo: prompt {i}" for i in range(8)]
+    assert StubBedrockHandler.peak == 4
+    assert elapsed < 8 * STUB_LATENCY / 2
+    client.shutdown()
+
+
+def test_asyncio_gather(stub_server):
+    client = ConcurrentBedrockClient.create(max_concurrency=4, max_queue=4, endpoint_url=stub_server)
+
+    async def run():
+        return await asyncio.gather(*(client.call_bedrock(f"prompt {i}") for i in range(6)))
+
+    assert asyncio.run(run()) == [f"echo: prompt {i}" for i in range(6)]
+    client.shutdown()
+
+
+def test_rejects_when_queue_is_full(stub_server):
+    client = ConcurrentBedrockClient.create(max_concurrency=1, max_queue=1, endpoint_url=stub_server)
+
+    futures = [client.submit_prompt("a"), client.submit_prompt("b")]
+    with pytest.raises(BedrockOverloadedError):
+        client.submit_prompt("c")
+    assert [future.result() for future in futures] == ["echo: a", "echo: b"]
+    assert client.stats()["rejected"] == 1
+
+    # Slots are released once requests complete
+    assert client.submit_prompt("d").result() == "echo: d"
+    client.shutdown()
+
+
+def test_reset_client_creates_a_new_client(stub_server):
+    bedrock = BedrockClient(endpoint_url=stub_server)
+    inherited = bedrock.client
+    client = bedrock.reset_client()
+    assert client is not inherited and bedrock.client is client
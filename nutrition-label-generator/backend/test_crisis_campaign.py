@@ -0,0 +1,211 @@
+"""
+Tests for crisis re-labeling campaigns
+"""
+
+import sys
+import os
+import json
+import time
+
+import pytest
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aws_bedrock_client import BedrockClient
+from crisis_campaign import (
+    RESULTS_FILE, STATUS_FILE, CampaignRunning, CrisisCampaign, read_progress, request_cancel, select_products
+)
+from crisis_response import CrisisResponseGenerator
+from visual_label_creator import NutritionLabelCreator
+
+CRISIS = {"type": "allergen", "details": "Undeclared peanut in batch 42"}
+
+
+def _product(name, **fields):
+    return {"product_name": name, "serving_size": "1 bar (60g)", "servings_per_container": "12",
+            "calories": "210", "ingredients_list": "Oats, honey", "market": "spain", **fields}
+
+
+CATALOG = [
+    _product("Peanut Bar", ingredients_list="Oats, peanuts", brand="Acme", priority=5),
+    _product("Oat Bar", brand="Acme"),
+    _product("Peanut Cookie", ingredients_list="Flour, PEANUT butter", brand="Other", priority=1),
+]
+
+
+class RecordingBedrockClient(BedrockClient):
+    """Mock-mode Bedrock client that records which products were generated, in order"""
+
+    def __init__(self, fail_for=()):
+        self.model_id = "test-model"
+        self.generated = []
+        self.fail_for = set(fail_for)
+
+    def generate_nutrition_content(self, product_data, market):
+        if product_data["product_name"] in self.fail_for:
+            raise RuntimeError("Bedrock unavailable")
+        self.generated.append((product_data["product_name"], market))
+        return self._generate_mock_content(product_data, market)
+
+
+def _generator(client):
+    return CrisisResponseGenerator(client, NutritionLabelCreator())
+
+
+def test_select_products_filters_catalog(tmp_path):
+    catalog = tmp_path / "catalog.jsonl"
+    catalog.write_text("\n".join(json.dumps(product) for product in CATALOG), encoding="utf-8")
+
+    selected = select_products({"catalog": "catalog.jsonl", "contains": {"ingredients_list": "peanut"}},
+                               catalog_dir=str(tmp_path))
+    assert [p["product_name"] for p in selected] == ["Peanut Bar", "Peanut Cookie"]
+    assert [p["product_name"] for p in select_products({"products": CATALOG, "where": {"brand": ["acme"]}})] \
+        == ["Peanut Bar", "Oat Bar"]
+    with pytest.raises(ValueError):
+        select_products({"catalog": "../catalog.jsonl"}, catalog_dir=str(tmp_path / "catalogs"))
+
+
+def test_campaign_runs_in_priority_order_and_persists(tmp_path):
+    client = RecordingBedrockClient()
+    progress = []
+    campaign = CrisisCampaign.create(_generator(client), str(tmp_path / "c1"), {"products": CATALOG}, CRISIS,
+                                     ["macau", "spain"], max_workers=1, on_progress=progress.append)
+    final = campaign.run()
+
+    assert client.generated == [("Peanut Cookie", "macau"), ("Peanut Cookie", "spain"),
+                                ("Peanut Bar", "macau"), ("Peanut Bar", "spain"),
+                                ("Oat Bar", "macau"), ("Oat Bar", "spain")]
+    assert final["status"] == "completed" and final["succeeded"] == final["total"] == 6
+    assert [p["succeeded"] for p in progress] == [1, 2, 3, 4, 5, 6]
+    results = [json.loads(line) for line in (tmp_path / "c1" / RESULTS_FILE).read_text().splitlines()]
+    assert len(results) == 6 and all(r["success"] for r in results)
+    assert all((tmp_path / "c1" / "labels" / r["filename"]).stat().st_size > 0 for r in results)
+
+
+def test_campaign_resumes_after_interruption(tmp_path):
+    directory = str(tmp_path / "c2")
+    first = RecordingBedrockClient(fail_for={"Oat Bar"})
+    campaign = CrisisCampaign.create(_generator(first), directory, {"products": CATALOG}, CRISIS, ["spain"],
+                                     max_workers=1)
+    campaign.on_progress = lambda progress: campaign.cancel() if progress["succeeded"] == 1 else None
+    assert campaign.run()["status"] == "cancelled"
+    # The process died while writing a result line
+    with open(os.path.join(directory, RESULTS_FILE), "a", encoding="utf-8") as f:
+        f.write('{"item_id": "trunc')
+
+    second = RecordingBedrockClient()
+    resumed = CrisisCampaign.resume(_generator(second), directory, max_workers=2)
+    assert resumed.resumed == 1
+    final = resumed.run()
+
+    assert final["status"] == "completed" and final["succeeded"] == 3 and final["failed"] == 0
+    assert sorted(second.generated) == [("Oat Bar", "spain"), ("Peanut Bar", "spain")]
+    assert CrisisCampaign.resume(_generator(second), directory).progress()["remaining"] == 0
+
+
+def test_campaign_sanitizes_label_filenames(tmp_path):
+    directory = tmp_path / "c3"
+    campaign = CrisisCampaign.create(_generator(RecordingBedrockClient()), str(directory),
+                                     {"products": [_product("Nuts 50/50 Mix"), _product("../Oat Bar")]}, CRISIS,
+                                     ["spain"], max_workers=1)
+    # Labels that cannot be written fail their items, not the campaign
+    (directory / "labels").rmdir()
+    (directory / "labels").write_text("")
+    final = campaign.run()
+    assert final["status"] == "completed" and final["failed"] == 2
+
+    (directory / "labels").unlink()
+    (directory / "labels").mkdir()
+    final = campaign.run()
+    assert final["status"] == "completed" and final["succeeded"] == 2 and final["failed"] == 0
+    filenames = sorted(result["filename"] for result in campaign.results())
+    assert filenames[0].startswith("crisis_label_spain_Nuts_50_50_Mix_")
+    assert filenames[1].startswith("crisis_label_spain_Oat_Bar_")
+    assert sorted(os.listdir(directory / "labels")) == filenames
+
+
+def test_campaign_counts_each_label_once(tmp_path):
+    client = RecordingBedrockClient()
+    products = [CATALOG[1], dict(CATALOG[1]), CATALOG[0]]
+    campaign = CrisisCampaign.create(_generator(client), str(tmp_path / "c5"), {"products": products}, CRISIS,
+                                     ["spain", " Spain"], max_workers=2)
+    assert len(campaign.products) == 2 and campaign.markets == ["spain"]
+    final = campaign.run()
+    assert final["total"] == 2 and final["remaining"] == 0 and final["percent"] == 100.0
+    assert sorted(client.generated) == [("Oat Bar", "spain"), ("Peanut Bar", "spain")]
+
+    # Campaigns recorded with repeated products still finish
+    repeated = CrisisCampaign(_generator(client), str(tmp_path / "c6"), products, CRISIS, ["spain"])
+    assert repeated.run()["remaining"] == 0
+
+    with pytest.raises(ValueError, match="atlantis"):
+        CrisisCampaign.create(_generator(client), str(tmp_path / "c7"), {"products": products}, CRISIS,
+                              ["spain", "atlantis"])
+    assert not (tmp_path / "c7").exists()
+
+
+def test_failed_campaign_is_not_left_running(tmp_path):
+    def crash(progress):
+        raise OSError("disk full")
+
+    campaign = CrisisCampaign.create(_generator(RecordingBedrockClient()), str(tmp_path / "c4"),
+                                     {"products": CATALOG}, CRISIS, ["spain"], max_workers=1, on_progress=crash)
+    with pytest.raises(OSError):
+        campaign.run()
+    assert campaign.progress()["status"] == "failed"
+
+    campaign.on_progress = None
+    assert campaign.run()["status"] == "completed"
+
+
+def test_campaign_run_state_is_shared_through_the_directory(tmp_path):
+    directory = str(tmp_path / "c8")
+    campaign = CrisisCampaign.create(_generator(RecordingBedrockClient()), directory, {"products": CATALOG}, CRISIS,
+                                     ["spain"], max_workers=1)
+    assert read_progress(directory)["status"] == "pending"
+    campaign.claim()
+
+    # As seen from another server process: running, and not startable a second time
+    other = CrisisCampaign.resume(_generator(RecordingBedrockClient()), directory, max_workers=1)
+    with pytest.raises(CampaignRunning):
+        other.claim()
+    assert read_progress(directory)["status"] == "running"
+    assert request_cancel(directory)
+    assert campaign.run()["status"] == "cancelled"
+    assert read_progress(directory)["status"] == "cancelled"
+    assert not request_cancel(directory)
+
+    assert other.run()["status"] == "completed"
+    progress = read_progress(directory, results=True)
+    assert progress["status"] == "completed" and progress["remaining"] == 0 and len(progress["results"]) == 3
+    assert progress["labels_per_second"] > 0
+
+    # The process running the campaign died: its status is left behind, its lock is not
+    path = os.path.join(directory, STATUS_FILE)
+    with open(path, encoding="utf-8") as f:
+        status = json.load(f)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({**status, "status": "running"}, f)
+    assert read_progress(directory)["status"] == "interrupted"
+
+
+def test_campaign_api(tmp_path, monkeypatch):
+    import api_server
+    monkeypatch.setattr(api_server, "CAMPAIGN_DIR", str(tmp_path))
+    client = api_server.app.test_client()
+
+    response = client.post("/api/nutrition/crisis-campaign", json={
+        "products": CATALOG, "where": {"brand": "Acme"}, "markets": ["spain", "brazil"], "crisis_info": CRISIS})
+    assert response.status_code == 202
+    campaign_id = response.get_json()["campaign_id"]
+
+    for _ in range(200):
+        status = client.get(f"/api/nutrition/crisis-campaign/{campaign_id}?results=true").get_json()
+        if status["status"] == "completed":
+            break
+        time.sleep(0.05)
+    assert status["total"] == 4 and status["succeeded"] == 4 and len(status["results"]) == 4
+    assert client.post(f"/api/nutrition/crisis-campaign/{campaign_id}/cancel").status_code == 409
+    assert client.get("/api/nutrition/crisis-campaign/000000000000").status_code == 404
+    assert client.post("/api/nutrition/crisis-campaign", json={"products": CATALOG}).status_code == 400
@@ -0,0 +1,59 @@
+"""
+Tests for batched daily value computation
+"""
+
+import sys
+import os
+
+import numpy as np
+import pytest
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from daily_values import DailyValueStandards, get_daily_value_standards
+from market_regulations import MARKET_REGISTRY, MarketRegulations
+
+
+def test_percentages_match_scalar_computation():
+    standards = get_daily_value_standards()
+    amounts = np.random.default_rng(7).uniform(0, 300, size=(50, len(standards.nutrients))).round(1)
+    amounts[0, 0] = 35.0  # exactly half of Spain's total fat standard
+    percentages = standards.percentages(amounts)
+
+    regulations = MarketRegulations()
+    assert percentages.shape == (len(MARKET_REGISTRY.markets), 50, len(standards.nutrients))
+    for m, market in enumerate(standards.markets):
+        for p in range(amounts.shape[0]):
+            for n, nutrient in enumerate(standards.nutrients):
+                assert percentages[m, p, n] == regulations.get_daily_value_percentage(nutrient, amounts[p, n], market)
+    assert np.array_equal(regulations.get_daily_value_percentages(amounts), percentages)
+
+
+def test_market_selection_and_missing_amounts():
+    standards = DailyValueStandards(["total_fat", "sodium"])
+    amounts = standards.amounts_matrix([{"total_fat": "7g", "sodium": None}, {"total_fat": "3,5"}])
+    by_market = standards.percentages_by_market(amounts, ["Brazil", "spain"])
+
+    assert list(by_market) == ["brazil", "spain"]
+    assert by_market["spain"][0, 0] == 10.0 and by_market["spain"][1, 0] == 5.0
+    assert np.isnan(by_market["brazil"][:, 1]).all()
+    with pytest.raises(ValueError):
+        standards.percentages(amounts, ["atlantis"])
+    with pytest.raises(ValueError):
+        standards.percentages(np.ones((2, 3)))
+
+
+def test_amounts_are_converted_to_the_standard_units():
+    standards = DailyValueStandards(["sodium", "calories", "total_fat"])
+    amounts = standards.amounts_matrix([
+        {"sodium": "500 mg", "calories": "837 kJ", "total_fat": "7g"},
+        {"sodium": "0.5 g", "calories": "200 kcal", "total_fat": "7000mg"},
+        {"sodium": "500000 µg", "calories": 200, "total_fat": "7 kcal"},
+    ])
+
+    assert np.allclose(amounts[:, 0], 0.5)
+    assert np.allclose(amounts[:2, 1], [837 / 4.184, 200]) and amounts[2, 1] == 200
+    assert np.allclose(amounts[:2, 2], 7) and np.isnan(amounts[2, 2])
+    spain = standards.percentages_by_market(amounts, ["spain"])["spain"]
+    assert (spain[:, 2][:2] == 10.0).all()
@@ -0,0 +1,156 @@
+"""
+Tests for the asynchronous label job queues and workers
+"""
+
+import sys
+import os
+import threading
+import time
+
+import pytest
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from job_queue import (COMPLETED, FAILED, QUEUED, RUNNING, JobQueue, JobWorkers, MemoryJobQueue, RedisJobQueue,
+                       SQLiteJobQueue, build_job_queue)
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def queue(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobQueue(result_ttl=3600)
+    if request.param == "sqlite":
+        return SQLiteJobQueue(str(tmp_path / "jobs.db"), result_ttl=3600)
+    if not os.environ.get("REDIS_URL"):
+        pytest.skip("REDIS_URL not set")
+    pytest.importorskip("redis")
+    return RedisJobQueue(os.environ["REDIS_URL"], result_ttl=3600, prefix=f"test-jobs-{os.getpid()}")
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def leased_queue(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteJobQueue(str(tmp_path / "jobs.db"), lease=0.1, max_attempts=2)
+    if not os.environ.get("REDIS_URL"):
+        pytest.skip("REDIS_URL not set")
+    pytest.importorskip("redis")
+    return RedisJobQueue(os.environ["REDIS_URL"], prefix=f"test-lease-{os.getpid()}", lease=0.1, max_attempts=2)
+
+
+def test_jobs_are_claimed_in_order_and_keep_results(queue):
+    first, second = queue.submit_many("label", [{"n": 1}, {"n": 2}])
+    assert queue.get(first.job_id).status == QUEUED and queue.queued() == 2
+
+    claimed = queue.claim()
+    assert (claimed.job_id, claimed.payload, claimed.status) == (first.job_id, {"n": 1}, RUNNING)
+    queue.complete(claimed.job_id, {"filename": "a.png"})
+    queue.fail(queue.claim().job_id, "Bedrock unavailable")
+
+    assert queue.claim() is None
+    assert queue.get(first.job_id).to_dict()["result"] == {"filename": "a.png"}
+    assert queue.get(second.job_id).to_dict()["error"] == "Bedrock unavailable"
+    assert queue.get("missing") is None
+    assert queue.stats()["completed"] == 1 and queue.stats()["failed"] == 1
+
+
+def test_wait_returns_on_status_change(queue):
+    job = queue.submit("label", {})
+    assert queue.wait(job.job_id, 0.1).status == QUEUED  # timed out
+    threading.Timer(0.1, lambda: queue.complete(queue.claim().job_id, {"ok": True})).start()
+    assert queue.wait(job.job_id, 10).status == COMPLETED
+
+
+def test_finished_jobs_expire(tmp_path):
+    for queue in (MemoryJobQueue(result_ttl=0), SQLiteJobQueue(str(tmp_path / "jobs.db"), result_ttl=0)):
+        old = queue.submit("label", {})
+        queue.complete(queue.claim().job_id, {})
+        queue.submit("label", {})
+        assert queue.get(old.job_id) is None
+
+
+def test_jobs_of_dead_workers_are_requeued_then_failed(leased_queue):
+    job = leased_queue.submit("label", {})
+    done = leased_queue.submit("label", {})
+    assert leased_queue.claim().job_id == job.job_id  # its worker dies
+    leased_queue.complete(leased_queue.claim().job_id, {})
+    assert leased_queue.claim() is None
+
+    time.sleep(0.15)
+    retried = leased_queue.claim()
+    assert (retried.job_id, retried.status, retried.attempts) == (job.job_id, RUNNING, 2)
+    assert leased_queue.stats()["requeued"] == 1
+
+    time.sleep(0.15)
+    assert leased_queue.claim() is None
+    abandoned = leased_queue.get(job.job_id)
+    assert abandoned.status == FAILED and abandoned.error.startswith("Abandoned after 2 attempts")
+    assert leased_queue.get(done.job_id).status == COMPLETED
+
+
+def test_worker_that_lost_its_lease_cannot_finish_the_job(leased_queue):
+    job = leased_queue.submit("label", {})
+    stale = leased_queue.claim()  # its worker stalls past the lease
+    time.sleep(0.15)
+    current = leased_queue.claim()
+    assert current.job_id == job.job_id and current.lease_owner != stale.lease_owner
+
+    assert not leased_queue.complete(job.job_id, {"filename": "stale.png"}, stale.lease_owner)
+    assert leased_queue.get(job.job_id).status == RUNNING
+    assert leased_queue.complete(job.job_id, {"filename": "current.png"}, current.lease_owner)
+    assert not leased_queue.fail(job.job_id, "too late", stale.lease_owner)
+    assert leased_queue.get(job.job_id).result == {"filename": "current.png"}
+    assert leased_queue.stats()["completed"] == 1 and leased_queue.stats()["failed"] == 0
+
+
+def test_sqlite_queue_in_forked_server_worker(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    job = queue.submit("label", {})
+    parent_conn = queue._conn
+    pid = os.fork()
+    if pid == 0:
+        # A preforked server worker claims through a connection of its own
+        claimed = queue.claim()
+        ok = claimed is not None and claimed.job_id == job.job_id and queue._conn is not parent_conn
+        queue.complete(job.job_id, {"ok": True})
+        os._exit(0 if ok else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+    assert queue.get(job.job_id).result == {"ok": True}
+
+
+def test_sqlite_queue_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    job = SQLiteJobQueue(path).submit("label", {"product": "bar"})
+    other = SQLiteJobQueue(path)
+    assert other.claim().job_id == job.job_id
+    assert SQLiteJobQueue(path).claim() is None
+
+
+def _label(payload):
+    return {"error": "bad"} if payload["fail"] else {"ok": 1}
+
+
+def test_workers_run_jobs_by_kind():
+    queue = MemoryJobQueue()
+    workers = JobWorkers(queue, {"label": _label}, workers=2)
+    ok = queue.submit("label", {"fail": False})
+    bad = queue.submit("label", {"fail": True})
+    unknown = queue.submit("poster", {})
+    workers.ensure_started()
+    try:
+        assert queue.wait(ok.job_id, 10).result == {"ok": 1}
+        assert queue.wait(bad.job_id, 10).error == "bad"
+        assert queue.wait(unknown.job_id, 10).status == FAILED
+    finally:
+        workers.stop()
+
+
+def test_job_queue_interface_is_abstract():
+    with pytest.raises(TypeError):
+        JobQueue()
+
+
+def test_build_job_queue_rejects_unknown_backend():
+    assert isinstance(build_job_queue("memory"), MemoryJobQueue)
+    with pytest.raises(ValueError):
+        build_job_queue("kafka")
@@ -0,0 +1,197 @@
+"""
+Tests for the content-addressed label cache
+"""
+
+import sys
+import os
+import io
+import base64
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+
+from aws_bedrock_client import BedrockClient
+from label_cache import CachedLabel, LabelCache, label_cache_key
+from label_encoder import ENCODERS, EncoderPolicy, stack_png
+from label_generator import NutritionLabelGenerator
+from crisis_response import CrisisResponseGenerator
+from sample_data import SAMPLE_PRODUCT
+from visual_label_creator import NutritionLabelCreator
+
+PRODUCT = SAMPLE_PRODUCT
+
+
+class CountingBedrockClient(BedrockClient):
+    """Mock-mode Bedrock client that counts content generations"""
+
+    def __init__(self):
+        self.model_id = "test-model"
+        self.calls = 0
+
+    def generate_nutrition_content(self, product_data, market):
+        self.calls += 1
+        return self._generate_mock_content(product_data, market)
+
+
+def _label(name: str) -> CachedLabel:
+    return CachedLabel(image_bytes=name.encode(), label_data={"product_name": name}, filename=f"{name}.png")
+
+
+def test_cache_key_is_canonical():
+    key = label_cache_key(PRODUCT, "spain")
+    reordered = dict(reversed(list(PRODUCT.items())))
+    assert label_cache_key(reordered, " Spain ") == key
+    assert label_cache_key(dict(PRODUCT, calories=210, product_name=" Test Protein Bar "), "spain") == key
+
+    assert label_cache_key(PRODUCT, "brazil") != key
+    assert label_cache_key(PRODUCT, "spain", {"type": "recall"}) != key
+    assert label_cache_key(PRODUCT, "spain", renderer_version="3") != key
+    assert label_cache_key(dict(PRODUCT, calories="220"), "spain") != key
+
+
+def test_lru_eviction_and_counters():
+    cache = LabelCache(max_entries=2)
+    cache.put("a", _label("a"))
+    cache.put("b", _label("b"))
+    assert cache.get("a").filename == "a.png"
+    cache.put("c", _label("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (2, 1, 1, 2)
+
+
+def test_disk_tier_survives_memory_eviction(tmp_path):
+    cache = LabelCache(max_entries=1, disk_dir=str(tmp_path))
+    cache.put("a", _label("a"))
+    cache.put("b", _label("b"))
+
+    restored = LabelCache(max_entries=1, disk_dir=str(tmp_path)).get("a")
+    assert restored == _label("a")
+    assert cache.get("a") == _label("a")
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_generate_label_reuses_cached_label():
+    client = CountingBedrockClient()
+    generator = NutritionLabelGenerator(client, NutritionLabelCreator(), LabelCache())
+
+    first = generator.generate_label(PRODUCT)
+    second = generator.generate_label(dict(PRODUCT, market="SPAIN"))
+    assert client.calls == 1
+    assert second == first
+    assert first["filename"].startswith("nutrition_label_spain_Test_Protein_Bar_")
+
+    generator.generate_label(dict(PRODUCT, market="macau"))
+    assert client.calls == 2
+
+
+def test_labels_are_generated_from_the_whitespace_stripped_product():
+    # Padded and plain payloads share a cache key, so whichever comes first must render the plain text
+    generator = NutritionLabelGenerator(CountingBedrockClient(), NutritionLabelCreator(), LabelCache())
+    padded = generator.generate_label(dict(PRODUCT, product_name=" Test Protein Bar ", serving_size="1 bar (60g) "))
+    assert padded["label_data"]["product_name"] == "Test Protein Bar"
+    assert padded["label_data"]["nutrition_facts"]["serving_size"] == "1 bar (60g)"
+    assert generator.generate_label(PRODUCT) == padded
+
+    crisis = CrisisResponseGenerator(CountingBedrockClient(), NutritionLabelCreator(), LabelCache())
+    padded = crisis.generate_crisis_label(dict(PRODUCT, product_name="Test Protein Bar "),
+                                          {"type": "recall ", "details": " Batch 42"})
+    assert padded["crisis_communication_text"].startswith("URGENT: RECALL - Batch 42 ")
+    assert crisis.generate_crisis_label(PRODUCT, {"type": "recall", "details": "Batch 42"}) == padded
+
+
+def test_crisis_label_cached_per_crisis():
+    client = CountingBedrockClient()
+    generator = CrisisResponseGenerator(client, NutritionLabelCreator(), LabelCache())
+    recall = {"type": "recall", "details": "Batch 42"}
+
+    first = generator.generate_crisis_label(PRODUCT, recall)
+    assert generator.generate_crisis_label(PRODUCT, recall) == first
+    assert client.calls == 1
+    assert first["crisis_communication_text"].startswith("URGENT: RECALL")
+
+    generator.generate_crisis_label(PRODUCT, {"type": "allergen", "details": "Batch 42"})
+    assert client.calls == 2
+
+
+def test_crisis_label_reuses_regular_label():
+    client = CountingBedrockClient()
+    generator = CrisisResponseGenerator(client, NutritionLabelCreator(), LabelCache())
+    recall = {"type": "recall", "details": "Batch 42"}
+
+    generator.label_generator.generate_label(PRODUCT)
+    incremental = generator.generate_crisis_label(PRODUCT, recall)
+    assert client.calls == 1
+    assert generator.stats() == {"incremental": 1, "full": 0}
+
+    scratch = CrisisResponseGenerator(CountingBedrockClient(), NutritionLabelCreator(), LabelCache())
+    full = scratch.generate_crisis_label(PRODUCT, recall)
+    assert scratch.stats() == {"incremental": 0, "full": 1}
+
+    def pixels(result):
+        return Image.open(io.BytesIO(base64.b64decode(result["image_base64"]))).convert("RGB").tobytes()
+
+    assert pixels(incremental) == pixels(full)
+    assert incremental["filename"] == full["filename"]
+    assert incremental["label_data"]["market_specific_warnings"].startswith("RETIRADA DEL PRODUCTO")
+    assert incremental["crisis_communication_text"] == full["crisis_communication_text"]
+
+
+def test_market_fan_out_matches_single_market_labels():
+    client = CountingBedrockClient()
+    generator = NutritionLabelGenerator(client, NutritionLabelCreator(), LabelCache())
+
+    results = generator.generate_labels_for_markets(PRODUCT, ["macau", "Spain", "atlantis", "spain"])
+    assert list(results) == ["macau", "spain", "atlantis"]
+    assert results["atlantis"] == {"error": "Unsupported market: atlantis"}
+    assert client.calls == 2
+
+    # Fan-out shares the per-market cache entries with single-market requests
+    assert generator.generate_label(dict(PRODUCT, market="macau")) == results["macau"]
+    assert client.calls == 2
+
+    # An unknown encoder fails each market instead of the whole fan-out
+    results = generator.generate_labels_for_markets(PRODUCT, ["macau", "atlantis"], encoder="gif")
+    assert results["macau"]["error"].startswith("Unknown encoder: gif")
+    assert results["atlantis"] == {"error": "Unsupported market: atlantis"}
+    assert client.calls == 2
+
+
+def test_encoder_selects_format_and_cache_entry(tmp_path):
+    client = CountingBedrockClient()
+    cache = LabelCache(disk_dir=str(tmp_path))
+    encoders = EncoderPolicy(per_market={"macau": "png-palette"})
+    generator = NutritionLabelGenerator(client, NutritionLabelCreator(), cache, encoders=encoders)
+
+    png = generator.generate_label_file(PRODUCT)
+    webp = generator.generate_label_file(PRODUCT, "webp-lossless")
+    assert (png.mimetype, webp.mimetype) == ("image/png", "image/webp")
+    assert webp.filename.endswith(".webp") and webp.image_bytes[8:12] == b"WEBP"
+    assert client.calls == 2
+
+    palette = generator.generate_label_file(dict(PRODUCT, market="macau"))
+    assert Image.open(io.BytesIO(palette.image_bytes)).mode == "P"
+    assert generator.generate_label_file(PRODUCT, "bmp") == {
+        "error": f"Unknown encoder: bmp (available: {', '.join(ENCODERS)})"}
+
+    cache.clear()
+    assert generator.generate_label_file(PRODUCT, "webp-lossless") == webp
+    assert client.calls == 3
+
+
+def test_encode_below_reuses_encoded_png():
+    creator = NutritionLabelCreator()
+    label_data = {"product_name": "Bar", "calories": "210", "ingredients": "Oats, honey"}
+    full = creator.create_label(label_data, "macau", "allergen")
+    banner = creator.crisis_banner_image("macau", "allergen")
+
+    for name in ("png", "png-small", "webp-lossless"):
+        encoder = ENCODERS[name]
+        stacked = encoder.encode_below(banner, encoder.encode(creator.create_label(label_data, "macau")))
+        assert Image.open(io.BytesIO(stacked)).convert("RGB").tobytes() == full.tobytes()
+    assert stack_png(banner, ENCODERS["png"].encode(full)) is not None
+    assert stack_png(banner, ENCODERS["png-palette"].encode(full)) is None
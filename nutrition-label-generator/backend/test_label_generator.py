@@ -101,7 +101,8 @@ def test_visual_label_creator():
         
         # Test label size calculation
         sample_data = create_sample_product_data()
-        width, height = creator._calculate_label_size(sample_data, "spain", "normal")
+        layout = creator.record_layout(sample_data, "spain", "normal")
+        width, height = layout.width, layout.height
         print(f"✅ Label size calculated: {width}x{height} pixels")
         
         # Test font loading
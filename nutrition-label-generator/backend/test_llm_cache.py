@@ -0,0 +1,108 @@
+"""
+Tests for the Bedrock response cache
+"""
+
+import sys
+import os
+import io
+import json
+
+import pytest
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aws_bedrock_client import BedrockClient
+from llm_cache import (
+    MemoryResponseCache, ResponseCache, SQLiteResponseCache, build_response_cache, response_cache_key
+)
+
+
+class StubRuntime:
+    """Stands in for the bedrock-runtime client and counts invocations"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke_model(self, modelId, body, contentType):
+        self.calls += 1
+        prompt = json.loads(body)["messages"][0]["content"]
+        payload = {"content": [{"text": f"response {self.calls} to {prompt}"}]}
+        return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+
+def test_response_cache_key_covers_model_prompt_and_params():
+    key = response_cache_key("model-a", "prompt", {"max_tokens": 4000})
+    assert response_cache_key("model-a", "prompt", {"max_tokens": 4000}) == key
+    assert response_cache_key("model-b", "prompt", {"max_tokens": 4000}) != key
+    assert response_cache_key("model-a", "prompt ", {"max_tokens": 4000}) != key
+    assert response_cache_key("model-a", "prompt", {"max_tokens": 2000}) != key
+
+
+def test_memory_cache_ttl_and_lru(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("llm_cache.time.time", lambda: now[0])
+    cache = MemoryResponseCache(max_entries=2, ttl=60)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+    assert cache.get("b") is None
+
+    now[0] += 61
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["evictions"], stats["expirations"]) == (1, 1)
+
+
+def test_response_cache_interface_is_abstract():
+    with pytest.raises(TypeError):
+        ResponseCache()
+
+
+def test_sqlite_cache_persists_and_bounds_size(tmp_path):
+    path = str(tmp_path / "responses.db")
+    cache = SQLiteResponseCache(path, max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")
+    cache.put("c", "C")
+
+    reopened = SQLiteResponseCache(path, max_entries=2)
+    assert reopened.get("a") == "A"
+    assert reopened.get("b") is None
+    assert reopened.get("c") == "C"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_sqlite_cache_in_forked_server_worker(tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "responses.db"))
+    cache.put("a", "A")
+    parent_conn = cache._conn
+    pid = os.fork()
+    if pid == 0:
+        # A preforked server worker: uses a connection of its own, not the parent's
+        ok = cache.get("a") == "A" and cache._conn is not parent_conn and cache._pid == os.getpid()
+        cache.put("b", "B")
+        os._exit(0 if ok else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+    assert cache._conn is parent_conn
+    assert cache.get("b") == "B"
+
+
+def test_bedrock_client_never_sends_a_prompt_twice(tmp_path):
+    client = BedrockClient(response_cache=build_response_cache(sqlite_path=str(tmp_path / "responses.db")))
+    client.client = StubRuntime()
+
+    first = client._call_bedrock("Generate label for SKU 1")
+    assert client._call_bedrock("Generate label for SKU 1") == first
+    assert client.client.calls == 1
+
+    client._call_bedrock("Generate label for SKU 2")
+    assert client.client.calls == 2
+
+    # A fresh process sharing the SQLite file is served from disk
+    restarted = BedrockClient(response_cache=build_response_cache(sqlite_path=str(tmp_path / "responses.db")))
+    restarted.client = StubRuntime()
+    assert restarted._call_bedrock("Generate label for SKU 1") == first
+    assert restarted.client.calls == 0
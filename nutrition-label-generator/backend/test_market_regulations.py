@@ -0,0 +1,81 @@
+"""
+Tests for the shared market regulation registry
+"""
+
+import sys
+import os
+import dataclasses
+
+import pytest
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from market_regulations import (
+    CRISIS_WARNINGS, MARKET_REGISTRY, CrisisRegulations, Market, MarketRegulations, get_market_data
+)
+
+MARKETS = ["spain", "angola", "macau", "brazil", "halal"]
+
+
+def test_registry_covers_all_markets():
+    assert set(MARKET_REGISTRY.markets) == set(MARKETS)
+    for market in Market:
+        assert MARKET_REGISTRY.get(market).market is market
+
+
+def test_lookup_normalizes_market_key():
+    regulation = MARKET_REGISTRY.get("spain")
+    assert MARKET_REGISTRY.get(" Spain ") is regulation
+    assert MARKET_REGISTRY.get(Market.SPAIN) is regulation
+    assert "BRAZIL" in MARKET_REGISTRY
+    assert "atlantis" not in MARKET_REGISTRY
+
+
+def test_unknown_market_raises_value_error():
+    with pytest.raises(ValueError):
+        MARKET_REGISTRY.get("atlantis")
+    with pytest.raises(ValueError):
+        get_market_data("atlantis")
+
+
+def test_regulations_are_shared_and_immutable():
+    regulation = MarketRegulations().get_regulation("macau")
+    assert MarketRegulations().get_regulation("macau") is regulation
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        regulation.title = "changed"
+    with pytest.raises(TypeError):
+        regulation.daily_value_standards["salt"] = 0.0
+    assert isinstance(regulation.mandatory_warnings, tuple)
+
+
+def test_legacy_market_data_view():
+    data = get_market_data("brazil")
+    assert data is get_market_data("Brazil")
+    assert data["name"] == "Brazil"
+    assert data["allergen_prefix"] == "ALÉRGENOS:"
+    assert data["notes"] == "Cumpre com RDC ANVISA 429/2020"
+    with pytest.raises(TypeError):
+        data["name"] = "changed"
+
+
+def test_crisis_regulations_are_read_only():
+    regulations = CrisisRegulations()
+    with pytest.raises(TypeError):
+        regulations.crisis_warnings["recall"]["spain"] = "changed"
+    with pytest.raises(TypeError):
+        regulations.contact_info["spain"] = "changed"
+
+    regulations.reload({"Recall": {"spain": "RETIRADA"}}, {"spain": "900 000 000"})
+    assert regulations.get_crisis_warning("recall", "spain") == "RETIRADA"
+    assert regulations.get_crisis_contact_info("spain") == "900 000 000"
+    with pytest.raises(TypeError):
+        regulations.crisis_warnings["recall"]["spain"] = "changed"
+    assert CRISIS_WARNINGS["recall"]["spain"] != "RETIRADA"
+
+
+def test_daily_value_percentage_unchanged():
+    regulations = MarketRegulations()
+    assert regulations.get_daily_value_percentage("total_fat", 10.0, "spain") == 14.0
+    assert regulations.get_mandatory_warnings("halal")[0].startswith("Halal Certified")
@@ -0,0 +1,78 @@
+"""
+Tests for the Prometheus metrics
+"""
+
+import sys
+import os
+import time
+
+import pytest
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import MetricsRegistry, clear_shared
+
+
+def test_exposition_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("status",))
+    latency = registry.histogram("stage_seconds", "Stage time", ("stage",), buckets=(0.1, 1.0))
+    requests.inc(status="200")
+    requests.inc(2, status="500")
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, stage='dr"aw')
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{status="200"} 1',
+        'requests_total{status="500"} 2',
+        "# HELP stage_seconds Stage time",
+        "# TYPE stage_seconds histogram",
+        'stage_seconds_bucket{stage="dr\\"aw",le="0.1"} 2',
+        'stage_seconds_bucket{stage="dr\\"aw",le="1.0"} 3',
+        'stage_seconds_bucket{stage="dr\\"aw",le="+Inf"} 4',
+        'stage_seconds_count{stage="dr\\"aw"} 4',
+        'stage_seconds_sum{stage="dr\\"aw"} 3.65',
+    ]
+
+
+def test_timer_and_label_checks():
+    registry = MetricsRegistry()
+    latency = registry.histogram("seconds", "", ("stage",))
+    with latency.time(stage="encode"):
+        pass
+    assert latency.count(stage="encode") == 1
+    with pytest.raises(ValueError):
+        latency.observe(1.0, market="spain")
+    with pytest.raises(ValueError):
+        registry.counter("seconds", "")
+
+
+def test_shared_metrics_add_up_across_processes(tmp_path):
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("status",))
+    latency = registry.histogram("stage_seconds", "Stage time", ("stage",), buckets=(0.1, 1.0))
+    registry.share(str(tmp_path), interval=0.05)
+    requests.inc(status="200")
+    latency.observe(0.05, stage="draw")
+
+    pid = os.fork()
+    if pid == 0:
+        # A forked server worker: counts on its own and writes them for the others' scrapes
+        registry.ensure_writer()
+        requests.inc(2, status="200")
+        latency.observe(0.5, stage="draw")
+        time.sleep(0.3)
+        os._exit(0)
+    assert os.waitpid(pid, 0)[1] == 0
+
+    lines = registry.render().splitlines()
+    assert 'requests_total{status="200"} 3' in lines
+    assert 'stage_seconds_bucket{stage="draw",le="0.1"} 1' in lines
+    assert 'stage_seconds_count{stage="draw"} 2' in lines and 'stage_seconds_sum{stage="draw"} 0.55' in lines
+    assert requests.value(status="200") == 1  # this process's own count
+
+    clear_shared(str(tmp_path))
+    assert 'requests_total{status="200"} 1' in registry.render().splitlines()
@@ -0,0 +1,104 @@
+"""
+Tests for the label rendering backends
+"""
+
+import sys
+import os
+import io
+import multiprocessing
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+
+from metrics import STAGE_SECONDS
+from render_pool import LocalRenderer, ProcessRenderPool, build_renderer
+from sample_data import SAMPLE_LABEL
+from tracing import TRACER, SpanCollector
+
+
+def test_process_pool_renders_same_png_as_local():
+    local = LocalRenderer()
+    pool = ProcessRenderPool(processes=2)
+    try:
+        assert pool.warm_up() == 2
+        for market, crisis_type, encoder, image_format in [("spain", None, "png", "PNG"),
+                                                            ("macau", "recall", "webp-lossless", "WEBP")]:
+            image_bytes = pool.render(SAMPLE_LABEL, market, crisis_type, encoder)
+            assert image_bytes == local.render(SAMPLE_LABEL, market, crisis_type, encoder)
+            assert Image.open(io.BytesIO(image_bytes)).format == image_format
+        assert pool.stats() == {"type": "ProcessRenderPool", "processes": 2, "renders": 2}
+    finally:
+        pool.close()
+
+
+def test_process_pool_starts_workers_on_first_use():
+    # A preloading server master builds the pool but never renders: no workers for its forks to inherit
+    before = len(multiprocessing.active_children())
+    pool = ProcessRenderPool(processes=1)
+    try:
+        assert len(multiprocessing.active_children()) == before
+        assert pool.warm_up() == 1
+        assert len(multiprocessing.active_children()) == before + 1
+    finally:
+        pool.close()
+
+
+def test_process_pool_in_forked_server_worker():
+    pool = ProcessRenderPool(processes=1)
+    try:
+        pool.warm_up()
+        pid = os.fork()
+        if pid == 0:
+            # A preforked server worker: renders with a pool of its own, leaves the parent's running
+            ok = pool.render(SAMPLE_LABEL, "spain") == LocalRenderer().render(SAMPLE_LABEL, "spain")
+            pool.close()
+            os._exit(0 if ok else 1)
+        assert os.waitpid(pid, 0)[1] == 0
+        assert pool.warm_up() == 1
+    finally:
+        pool.close()
+
+
+def test_process_pool_spans_and_stage_timings_reach_the_parent(monkeypatch):
+    collector = SpanCollector()
+    monkeypatch.setattr(TRACER, "exporter", collector)
+    monkeypatch.setattr(TRACER, "sample_rate", 1.0)
+    pool = ProcessRenderPool(processes=1)
+    try:
+        with TRACER.start_trace("request") as root:
+            with TRACER.span("render") as render:
+                pool.render(SAMPLE_LABEL, "spain")
+        draws = STAGE_SECONDS.count(stage="draw", market="spain")
+        pool.render(SAMPLE_LABEL, "spain")  # outside a trace: no spans
+    finally:
+        pool.close()
+    # Stage timings come back from the pool process too
+    assert STAGE_SECONDS.count(stage="draw", market="spain") == draws + 1
+
+    spans = {span.name: span for span in collector.drain()}
+    assert set(spans) == {"request", "render", "create_label", "layout", "draw", "encode"}
+    assert all(span.trace_id == root.trace_id for span in spans.values())
+    assert spans["create_label"].parent_id == render.span_id
+    assert spans["layout"].parent_id == spans["draw"].parent_id == spans["create_label"].span_id
+    assert spans["encode"].parent_id == render.span_id and spans["encode"].attributes["bytes"] > 0
+
+
+def test_process_pool_reloads_crisis_regulations():
+    warnings = {"recall": {"spain": "RETIRADA URGENTE - No consumir bajo ningún concepto"}}
+    local = LocalRenderer()
+    local.visual_creator.reload_crisis_regulations(warnings)
+    pool = ProcessRenderPool(processes=1)
+    try:
+        before = pool.render(SAMPLE_LABEL, "spain", "recall")
+        pool.reload_crisis_regulations(warnings)
+        after = pool.render(SAMPLE_LABEL, "spain", "recall")
+    finally:
+        pool.close()
+    assert before != after
+    assert after == local.render(SAMPLE_LABEL, "spain", "recall")
+
+
+def test_build_renderer_defaults_to_local():
+    assert isinstance(build_renderer(0), LocalRenderer)
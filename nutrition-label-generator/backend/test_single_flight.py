@@ -0,0 +1,80 @@
+"""
+Tests for request coalescing
+"""
+
+import sys
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from label_generator import NutritionLabelGenerator
+from single_flight import SingleFlight
+from test_label_cache import PRODUCT, CountingBedrockClient
+from visual_label_creator import NutritionLabelCreator
+
+
+def _run_concurrently(fn, count: int = 8):
+    barrier = threading.Barrier(count)
+
+    def call():
+        barrier.wait()
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        futures = [executor.submit(call) for _ in range(count)]
+        return [future.result() for future in futures]
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    runs = []
+
+    def slow():
+        runs.append(1)
+        time.sleep(0.2)
+        return object()
+
+    results = _run_concurrently(lambda: flight.do("key", slow))
+    assert len(runs) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"executions": 1, "deduplicated": 7, "in_flight": 0}
+
+    # Completed calls are not memoized
+    flight.do("key", slow)
+    assert len(runs) == 2
+
+
+def test_followers_receive_leader_exception():
+    flight = SingleFlight()
+
+    def failing():
+        time.sleep(0.2)
+        raise RuntimeError("bedrock unavailable")
+
+    def call():
+        with pytest.raises(RuntimeError, match="bedrock unavailable"):
+            flight.do("key", failing)
+
+    _run_concurrently(call, count=4)
+    assert flight.stats()["executions"] == 1
+
+
+def test_generate_label_coalesces_identical_requests():
+    class SlowBedrockClient(CountingBedrockClient):
+        def generate_nutrition_content(self, product_data, market):
+            time.sleep(0.2)
+            return super().generate_nutrition_content(product_data, market)
+
+    client = SlowBedrockClient()
+    generator = NutritionLabelGenerator(client, NutritionLabelCreator())
+
+    results = _run_concurrently(lambda: generator.generate_label(dict(PRODUCT)))
+    assert client.calls == 1
+    assert all(result == results[0] for result in results)
+    assert generator.single_flight.stats()["deduplicated"] == 7
@@ -0,0 +1,35 @@
+"""
+Startup budget for the API server: import time measured with python -X importtime
+"""
+
+import sys
+import os
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Importing api_server takes ~250 ms on a developer laptop; the budget leaves room for slower CI machines
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", 1000))
+
+# Loaded only on the code paths that need them (Bedrock calls, vector output, batched daily values)
+LAZY_MODULES = ("boto3", "botocore", "matplotlib", "numpy", "fontTools", "asyncio")
+
+
+def import_times(module: str) -> dict:
+    """Cumulative import time in milliseconds of every module loaded by importing ``module``"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if line.startswith("import time:") and len(fields) == 3 and fields[1].strip().isdigit():
+            times[fields[2].strip()] = int(fields[1]) / 1000
+    return times
+
+
+def test_api_server_import_budget():
+    times = import_times("api_server")
+
+    assert times["api_server"] < IMPORT_BUDGET_MS, f"importing api_server took {times['api_server']:.0f} ms"
+    loaded = sorted(name for name in times if name.split(".")[0] in LAZY_MODULES)
+    assert not loaded, f"imported at startup: {', '.join(loaded)}"
@@ -0,0 +1,103 @@
+"""
+Tests for per-request tracing
+"""
+
+import sys
+import os
+import json
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tracing import TRACER, JsonFileExporter, OTLPExporter, Tracer, parse_traceparent
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+    def close(self):
+        pass
+
+
+def test_spans_nest_across_threads():
+    exporter = ListExporter()
+    tracer = Tracer(exporter, sample_rate=1.0)
+
+    def encode():
+        with tracer.span("encode"):
+            pass
+
+    with tracer.start_trace("request") as root:
+        with tracer.span("render", market="spain") as render:
+            with ThreadPoolExecutor(1) as executor:
+                executor.submit(contextvars.copy_context().run, encode).result()
+        with pytest.raises(ValueError), tracer.span("bedrock.invoke"):
+            raise ValueError("throttled")
+
+    spans = {span.name: span for span in exporter.spans}
+    assert set(spans) == {"request", "render", "encode", "bedrock.invoke"}
+    assert spans["render"].parent_id == root.span_id and spans["render"].trace_id == root.trace_id
+    assert spans["encode"].parent_id == render.span_id
+    assert spans["bedrock.invoke"].to_dict()["error"] == "ValueError: throttled"
+    assert tracer.span("outside a trace").__enter__().traceparent is None
+
+
+def test_sampling_and_traceparent():
+    exporter = ListExporter()
+    tracer = Tracer(exporter, sample_rate=1e-12)
+    with tracer.start_trace("request"):
+        with tracer.span("render"):
+            pass
+    assert exporter.spans == []
+
+    incoming = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    with tracer.start_trace("request", incoming) as root:
+        assert root.traceparent.startswith("00-0af7651916cd43dd8448eb211c80319c-")
+    assert exporter.spans[0].parent_id == "b7ad6b7169203331"
+    assert parse_traceparent("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-00")[2] is False
+    assert parse_traceparent("garbage") is None
+
+
+def test_exporters(tmp_path):
+    tracer = Tracer(JsonFileExporter(str(tmp_path / "traces.jsonl")), sample_rate=1.0)
+    with tracer.start_trace("request", **{"http.route": "/health"}):
+        with tracer.span("layout"):
+            pass
+    tracer.exporter.close()
+    lines = [json.loads(line) for line in (tmp_path / "traces.jsonl").read_text().splitlines()]
+    assert [line["name"] for line in lines] == ["layout", "request"]
+    assert lines[0]["parent_id"] == lines[1]["span_id"] and lines[1]["attributes"] == {"http.route": "/health"}
+
+    otlp = OTLPExporter()
+    tracer = Tracer(ListExporter(), sample_rate=1.0)
+    with tracer.start_trace("request", cached=True, bytes=10):
+        pass
+    span = otlp.payload(tracer.exporter.spans)["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert span["traceId"] == tracer.exporter.spans[0].trace_id and span["status"] == {"code": 1}
+    assert span["attributes"] == [{"key": "cached", "value": {"boolValue": True}},
+                                  {"key": "bytes", "value": {"intValue": "10"}}]
+
+
+def test_label_request_trace(monkeypatch):
+    from api_server import app
+    from test_api_server import PRODUCT
+    exporter = ListExporter()
+    monkeypatch.setattr(TRACER, "exporter", exporter)
+    monkeypatch.setattr(TRACER, "sample_rate", 1.0)
+
+    response = app.test_client().post("/api/nutrition/generate-label",
+                                      json=dict(PRODUCT, product_name="Traced Bar", market="angola"))
+    trace_id = response.headers["traceparent"].split("-")[1]
+    spans = {span.name: span for span in exporter.spans}
+    assert {"POST /api/nutrition/generate-label", "generate_bedrock_content", "render", "create_label",
+            "layout", "draw", "encode"} <= set(spans)
+    assert all(span.trace_id == trace_id for span in exporter.spans)
+    assert spans["encode"].parent_id == spans["render"].span_id
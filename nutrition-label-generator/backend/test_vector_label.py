@@ -0,0 +1,62 @@
+"""
+Tests for the SVG/PDF label output
+"""
+
+import sys
+import os
+import re
+import zlib
+import xml.etree.ElementTree as ET
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from render_pool import LocalRenderer
+from vector_label import VectorLabelRenderer, render_pdf, render_svg
+from visual_label_creator import NutritionLabelCreator
+from sample_data import SAMPLE_LABEL
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+
+def _layout():
+    return NutritionLabelCreator().record_layout(SAMPLE_LABEL, "spain", "recall")
+
+
+def test_svg_has_one_element_per_draw_call():
+    layout = _layout()
+    root = ET.fromstring(render_svg(layout))
+
+    assert (root.get("width"), root.get("height")) == (str(layout.width), str(layout.height))
+    texts = [op[1][1] for op in layout.primitives() if op[0] == "text"]
+    assert [element.text for element in root.iter(f"{SVG}text")] == texts
+    assert len(list(root.iter(f"{SVG}line"))) == sum(op[0] == "line" for op in layout.primitives())
+
+
+def test_pdf_structure_and_page_size():
+    layout = _layout()
+    pdf = render_pdf(layout)
+
+    assert pdf.startswith(b"%PDF-1.4") and pdf.endswith(b"%%EOF\n")
+    assert f"/MediaBox [0 0 {layout.width} {layout.height}]".encode() in pdf
+    # Every cross-reference entry points at its object
+    xref = int(pdf.rsplit(b"startxref\n", 1)[1].split(b"\n")[0])
+    entries = pdf[xref:].split(b"\n")[3:]
+    count = int(pdf[xref:].split(b"\n")[1].split()[1])
+    for number in range(1, count):
+        assert pdf[int(entries[number - 1][:10]):].startswith(b"%d 0 obj" % number)
+    # The page content draws one glyph form per visible character
+    start = re.search(rb"4 0 obj\n<< /Length (\d+) /Filter /FlateDecode >>\nstream\n", pdf)
+    content = zlib.decompress(pdf[start.end():start.end() + int(start.group(1))]).decode()
+    visible = sum(not char.isspace() for op in layout.primitives() if op[0] == "text" for char in op[1][1])
+    assert content.count(" Do Q") == visible
+
+
+def test_vector_encoders_and_save_label(tmp_path):
+    renderer = LocalRenderer()
+    assert renderer.render(SAMPLE_LABEL, "brazil", encoder="svg").startswith(b"<svg")
+    assert renderer.render(SAMPLE_LABEL, "brazil", encoder="pdf").startswith(b"%PDF")
+
+    path = VectorLabelRenderer().save_label(SAMPLE_LABEL, "halal", str(tmp_path / "label.pdf"))
+    with open(path, "rb") as f:
+        assert f.read(5) == b"%PDF-"
@@ -0,0 +1,190 @@
+"""
+Tests for the visual label creator
+"""
+
+import sys
+import os
+import io
+import base64
+
+import pytest
+from PIL import Image, ImageChops, ImageDraw
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from visual_label_creator import (
+    LABEL_SIZES, NO_BREAK_AFTER, NO_BREAK_BEFORE, FontCache, LabelPreview, NutritionLabelCreator, wrap_text
+)
+from sample_data import SAMPLE_LABEL
+
+MARKETS = ["spain", "angola", "macau", "brazil", "halal"]
+
+
+def test_font_cache_loads_each_font_once():
+    cache = FontCache()
+    creator = NutritionLabelCreator(font_cache=cache)
+    for market in MARKETS:
+        creator.create_label(SAMPLE_LABEL, market)
+
+    stats = cache.stats()
+    assert stats["misses"] == stats["cached_fonts"] == 4
+    assert stats["hits"] == 4 * len(MARKETS) - 4
+    assert cache.get(12) is cache.get(12)
+    assert cache.get(12, "bold") is not cache.get(12)
+
+
+def test_font_cache_falls_back_to_default_font(tmp_path, monkeypatch):
+    monkeypatch.setattr("visual_label_creator.FONT_CANDIDATES", {"regular": ["missing.ttf"], "bold": ["missing.ttf"]})
+    cache = FontCache(search_paths=[str(tmp_path)])
+    font = cache.get(12)
+    assert font is cache.get(12)
+    assert font.getlength("Ingredients") > 0
+
+
+def test_font_cache_uses_configured_search_paths(tmp_path):
+    default_path = FontCache().get(12).path
+    custom = tmp_path / "arial.ttf"
+    custom.write_bytes(open(default_path, "rb").read())
+
+    cache = FontCache(search_paths=[str(tmp_path)])
+    assert cache.get(12).path == str(custom)
+
+
+def _font():
+    return FontCache().get(12)
+
+
+def test_wrap_text_fits_width_and_keeps_words():
+    font = _font()
+    text = " ".join(["Whey protein isolate (milk), cocoa powder, emulsifier (soy lecithin)"] * 20)
+    lines = wrap_text(text, font, 380)
+
+    assert len(lines) > 1
+    assert all(font.getlength(line) <= 380 for line in lines)
+    assert " ".join(lines).split() == text.split()
+
+
+def test_wrap_text_breaks_cjk_between_characters():
+    font = _font()
+    text = "配料：小麥粉、白砂糖、植物油（棕櫚油）、雞蛋、奶粉。" * 10
+    lines = wrap_text(text, font, 120)
+
+    assert len(lines) > 1
+    assert "".join(lines) == text
+    for line in lines:
+        assert line[0] not in NO_BREAK_BEFORE
+        assert line[-1] not in NO_BREAK_AFTER
+
+
+def test_wrap_text_keeps_arabic_words_whole():
+    font = _font()
+    text = "مُصادق عليه حلال - مُعتمد من السلطة الإسلامية " * 4
+    lines = wrap_text(text, font, 150)
+
+    assert " ".join(lines).split() == text.split()
+
+
+def test_wrap_text_hard_breaks_overlong_words():
+    font = _font()
+    lines = wrap_text("x" * 200, font, 100)
+
+    assert "".join(lines) == "x" * 200
+    assert all(font.getlength(line) <= 100 for line in lines)
+
+
+LONG_INGREDIENTS = ("Harina de trigo, azúcar, aceite de palma, cacao desgrasado en polvo (4%), "
+                    "suero de leche en polvo, emulgente (lecitina de soja), sal, aroma. ") * 25
+
+
+def _last_ink_row(image) -> int:
+    """Index of the lowest row containing a non-white pixel"""
+    bbox = ImageChops.invert(image.convert("L")).getbbox()
+    return bbox[3] - 1 if bbox else -1
+
+
+@pytest.mark.parametrize("market", MARKETS)
+@pytest.mark.parametrize("crisis_type", [None, "recall"])
+@pytest.mark.parametrize("ingredients", ["Water, salt", LONG_INGREDIENTS])
+def test_label_height_is_exact(market, crisis_type, ingredients):
+    creator = NutritionLabelCreator()
+    label = dict(SAMPLE_LABEL, ingredients=ingredients)
+    image = creator.create_label(label, market, crisis_type)
+
+    layout = creator.record_layout(label, market, crisis_type)
+    assert image.size == (layout.width, layout.height)
+    # Nothing is clipped and at most the trailing section padding is left blank
+    last_ink_row = _last_ink_row(image)
+    assert 0 < last_ink_row < image.height - 1
+    assert image.height - last_ink_row <= 30
+
+
+def test_label_height_grows_with_wrapped_text():
+    creator = NutritionLabelCreator()
+    short = creator.create_label(dict(SAMPLE_LABEL, ingredients="Water, salt"), "spain")
+    long = creator.create_label(dict(SAMPLE_LABEL, ingredients=LONG_INGREDIENTS), "spain")
+    lines = len(wrap_text(LONG_INGREDIENTS, FontCache().get(12), 380)) - 1
+
+    assert long.height - short.height == 20 * lines
+
+
+def test_label_sizes_are_drawn_natively():
+    creator = NutritionLabelCreator()
+    base = creator.create_label(SAMPLE_LABEL, "macau", "recall")
+    sizes = creator.create_label_sizes(SAMPLE_LABEL, "macau", "recall")
+
+    assert creator.create_label(SAMPLE_LABEL, "macau", "recall", scale=1.0).tobytes() == base.tobytes()
+    for name, scale in LABEL_SIZES.items():
+        assert sizes[name].size == (round(base.width * scale), round(base.height * scale))
+    # Scaled drawing keeps the layout: the content ends at the same relative height
+    assert abs(_last_ink_row(sizes["print"]) / LABEL_SIZES["print"] - _last_ink_row(base)) <= 2
+    # The crisis banner is still solid red at the top of every size
+    assert all(image.getpixel((1, 1)) == (255, 0, 0) for image in sizes.values())
+
+
+def test_preview_fits_requested_box():
+    previews = LabelPreview().create_previews(SAMPLE_LABEL, "spain")
+    preview = Image.open(io.BytesIO(base64.b64decode(previews["preview"].split(",", 1)[1])))
+    thumbnail = Image.open(io.BytesIO(base64.b64decode(previews["thumbnail"].split(",", 1)[1])))
+
+    assert preview.width <= 300 and preview.height <= 400 and (preview.width == 300 or preview.height == 400)
+    assert thumbnail.width <= 150 and thumbnail.height <= 200
+    assert preview.width / preview.height == pytest.approx(thumbnail.width / thumbnail.height, rel=0.02)
+
+
+@pytest.mark.parametrize("market,crisis_type", [("spain", None), ("brazil", "recall"), ("macau", "contamination")])
+def test_template_strips_match_direct_drawing(market, crisis_type):
+    creator = NutritionLabelCreator()
+    layout = creator.record_layout(SAMPLE_LABEL, market, crisis_type)
+    direct = Image.new("RGB", (layout.width, layout.height), layout.background)
+    layout.replay(ImageDraw.Draw(direct))
+
+    assert any(method == "strip" for method, _, _ in layout.operations)
+    assert creator.render_layout(layout).tobytes() == direct.tobytes()
+
+
+def test_market_template_is_compiled_once():
+    creator = NutritionLabelCreator()
+    template = creator.compile_template("spain")
+
+    creator.create_label(SAMPLE_LABEL, "spain")
+    creator.create_label(dict(SAMPLE_LABEL, calories="999"), "spain")
+
+    assert creator.compile_template("spain") is template
+    assert creator.compile_template("angola") is not template
+
+
+def test_crisis_banners_are_precomputed_and_reloaded():
+    creator = NutritionLabelCreator()
+    assert creator.precompute_crisis_banners() == 4 * 5
+    banners = len(creator._banners)
+    label = creator.create_label(SAMPLE_LABEL, "spain", "recall")
+    assert len(creator._banners) == banners
+
+    creator.reload_crisis_regulations({"recall": {"spain": "RETIRADA URGENTE - No consumir bajo ningún concepto"}})
+    reloaded = creator.create_label(SAMPLE_LABEL, "spain", "recall")
+
+    assert reloaded.tobytes() != label.tobytes()
+    assert creator.crisis_regulations.get_crisis_warning("allergen", "spain").startswith("CRISIS WARNING")
+    # The module-wide warnings are not touched by an instance reload
+    assert NutritionLabelCreator().crisis_regulations.get_crisis_warning("allergen", "spain").startswith("ADVERTENCIA")
@@ -0,0 +1,425 @@
+"""
+Tracing for SmartLabel AI Nutrition Label Generator
+Per-request spans through the label pipeline, sampled, exported to JSON lines or an OTLP collector
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OTLP_ENDPOINT = "http://localhost:4318/v1/traces"
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        """W3C trace context header value continuing this trace"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_unix_nano": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": "error" if self.error is not None else "ok",
+            **({"error": self.error} if self.error is not None else {}),
+        }
+
+
+class _NoopSpan:
+    """Stands in for spans of unsampled traces"""
+
+    __slots__ = ()
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return _NOOP_SPAN
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SCOPE = _NoopScope()
+
+# The active span of the current request or thread; _NOOP_SPAN inside an unsampled trace
+_current: contextvars.ContextVar = contextvars.ContextVar("label_span", default=None)
+
+
+class _RemoteSpan:
+    """A span of another process, standing in as the parent of spans recorded here"""
+
+    __slots__ = ("trace_id", "span_id")
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+class _ParentScope:
+    """Makes a remote span current for a block; it is recorded by its own process, not here"""
+
+    __slots__ = ("parent", "token")
+
+    def __init__(self, parent: _RemoteSpan):
+        self.parent = parent
+        self.token = None
+
+    def __enter__(self):
+        self.token = _current.set(self.parent)
+        return self.parent
+
+    def __exit__(self, *exc_info):
+        _current.reset(self.token)
+        return False
+
+
+class _SpanScope:
+    """Makes a span current for a block and ends it afterwards"""
+
+    __slots__ = ("tracer", "span", "token")
+
+    def __init__(self, tracer: "Tracer", span):
+        self.tracer = tracer
+        self.span = span
+        self.token = None
+
+    def __enter__(self):
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            _current.reset(self.token)
+        except ValueError:
+            # Ended in another context (e.g. after a streamed response); nothing to restore
+            pass
+        if isinstance(self.span, Span):
+            if exc is not None:
+                self.span.error = f"{exc_type.__name__}: {exc}"
+            self.tracer.finish(self.span)
+        return False
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace id, parent span id, sampled) from a W3C traceparent header, or None"""
+    parts = (header or "").strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class JsonFileExporter:
+    """Appends every finished span to a file as one JSON line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid: Optional[int] = None
+
+    def export(self, spans: List[Span]):
+        lines = "".join(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n" for span in spans)
+        with self._lock:
+            if self._pid != os.getpid():
+                # Opened per process: forked server workers append through their own handle
+                self._file = open(self.path, "a", encoding="utf-8")
+                self._pid = os.getpid()
+            self._file.write(lines)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            self._file = self._pid = None
+
+
+class SpanCollector:
+    """Keeps finished spans in memory until drained, e.g. to send them to another process"""
+
+    def __init__(self):
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        with self._lock:
+            self._spans.extend(spans)
+
+    def drain(self) -> List[Span]:
+        with self._lock:
+            spans, self._spans = self._spans, []
+        return spans
+
+    def close(self):
+        pass
+
+
+class OTLPExporter:
+    """Sends spans to an OpenTelemetry collector over OTLP/HTTP with JSON encoding
+
+    Spans are batched by a background thread (started per process, so
+    forked server workers get their own) and posted every ``interval``
+    seconds or ``batch_size`` spans. When the collector is unreachable the
+    batch is dropped and logged rather than slowing requests down.
+    """
+
+    def __init__(self, endpoint: str = DEFAULT_OTLP_ENDPOINT, service_name: str = "nutrition-label-generator",
+                 batch_size: int = 512, interval: float = 2.0, max_queue: int = 10000, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.interval = interval
+        self.timeout = timeout
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, spans: List[Span]):
+        self._ensure_started()
+        for span in spans:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                self.dropped += 1
+
+    def close(self):
+        """Send the queued spans and stop the background thread"""
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(self.timeout + self.interval)
+            self._pid = None
+
+    def payload(self, spans: List[Span]) -> Dict[str, Any]:
+        """OTLP/JSON ExportTraceServiceRequest for the spans"""
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "smartlabel.label_pipeline"}, "spans": [
+                {
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                    "name": span.name,
+                    "kind": 2 if span.parent_id is None else 1,  # SERVER for request roots, else INTERNAL
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": [_otlp_attribute(key, value) for key, value in span.attributes.items()],
+                    "status": {"code": 2, "message": span.error} if span.error is not None else {"code": 1},
+                }
+                for span in spans
+            ]}],
+        }]}
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+                atexit.register(self.close)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+            if batch:
+                self._send(batch)
+
+    def _send(self, batch: List[Span]):
+        import urllib.request
+        body = json.dumps(self.payload(batch), default=str).encode("utf-8")
+        request = urllib.request.Request(self.endpoint, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except OSError as e:
+            self.dropped += len(batch)
+            logger.warning(f"Dropped {len(batch)} spans: OTLP export to {self.endpoint} failed: {e}")
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+class Tracer:
+    """Creates spans for sampled traces and hands finished spans to the exporter
+
+    Traces start at start_trace() (an API request, a job, a campaign
+    item) and are sampled there with probability ``sample_rate``, or as
+    decided by the caller's traceparent header. span() adds a child to the
+    current trace; outside a sampled trace it is a shared no-op, so
+    tracing costs well under a microsecond per span when off. Spans follow
+    the current context: work handed to other threads keeps its parent
+    when submitted through ``contextvars.copy_context().run``.
+    """
+
+    def __init__(self, exporter=None, sample_rate: float = 0.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.exported = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None and self.sample_rate > 0
+
+    def configure(self, exporter=None, sample_rate: float = 0.0):
+        if self.exporter is not None and self.exporter is not exporter:
+            self.exporter.close()
+        self.exporter = exporter
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+
+    def span(self, name: str, **attributes):
+        """Context manager for a child span of the current trace (a no-op outside sampled traces)"""
+        if not self.enabled:
+            return _NOOP_SCOPE
+        parent = _current.get()
+        if parent is None or parent is _NOOP_SPAN:
+            return _NOOP_SCOPE
+        return _SpanScope(self, Span(name, parent.trace_id, parent.span_id, attributes))
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, **attributes):
+        """Context manager for the root span of a trace, continuing the caller's trace if given one
+
+        Unsampled traces still enter a (no-op) scope, so their inner spans
+        don't start traces of their own.
+        """
+        if not self.enabled:
+            return _NOOP_SCOPE
+        incoming = parse_traceparent(traceparent)
+        if incoming is not None:
+            trace_id, parent_id, sampled = incoming
+        else:
+            trace_id, parent_id, sampled = os.urandom(16).hex(), None, random.random() < self.sample_rate
+        if not sampled:
+            return _SpanScope(self, _NOOP_SPAN)
+        return _SpanScope(self, Span(name, trace_id, parent_id, attributes))
+
+    def continue_trace(self, traceparent: Optional[str]):
+        """Context manager making spans started in the block children of a span in another process
+
+        For work done on a caller's behalf, such as a render pool worker:
+        unlike start_trace(), no span is created for the block itself. A
+        no-op unless ``traceparent`` is sampled.
+        """
+        incoming = parse_traceparent(traceparent) if self.enabled else None
+        if incoming is None or not incoming[2]:
+            return _NOOP_SCOPE
+        return _ParentScope(_RemoteSpan(incoming[0], incoming[1]))
+
+    def current_span(self):
+        """The active span, a no-op span inside unsampled traces, or None"""
+        return _current.get()
+
+    def finish(self, span: Span):
+        span.end_ns = time.time_ns()
+        self.export([span])
+
+    def export(self, spans: List[Span]):
+        """Hand finished spans to the exporter, including spans recorded in other processes"""
+        if not spans or self.exporter is None:
+            return
+        try:
+            self.exporter.export(spans)
+            self.exported += len(spans)
+        except Exception as e:
+            logger.warning(f"Span export failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "exporter": type(self.exporter).__name__ if self.exporter is not None else None,
+            "exported_spans": self.exported,
+            "dropped_spans": getattr(self.exporter, "dropped", 0),
+        }
+
+
+def build_exporter(kind: str = "file", path: Optional[str] = None, endpoint: Optional[str] = None,
+                   service_name: str = "nutrition-label-generator"):
+    """Span exporter: "file" (JSON lines at ``path``) or "otlp" (collector at ``endpoint``)"""
+    kind = kind.strip().lower()
+    if kind == "file":
+        return JsonFileExporter(path or "traces.jsonl")
+    if kind == "otlp":
+        return OTLPExporter(endpoint or DEFAULT_OTLP_ENDPOINT, service_name)
+    raise ValueError(f"Unknown trace exporter: {kind!r} (expected file or otlp)")
+
+
+# Process-wide tracer used by the label pipeline; off until configured (see api_server)
+TRACER = Tracer()
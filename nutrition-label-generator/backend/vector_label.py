@@ -0,0 +1,235 @@
+"""
+Vector label output for SmartLabel AI Nutrition Label Generator
+Converts the LabelLayout drawn by create_label into SVG or PDF, for print output at any DPI
+"""
+
+import os
+import threading
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from fontTools.pens.basePen import BasePen
+from fontTools.ttLib import TTFont
+
+from visual_label_creator import LabelLayout, NutritionLabelCreator
+
+VECTOR_FORMATS = ("svg", "pdf")
+
+
+def _hex(color: Tuple[int, int, int]) -> str:
+    return "#{:02x}{:02x}{:02x}".format(*color[:3])
+
+
+def _ascent(font) -> int:
+    # ImageDraw.text places the top of the ascender at y; SVG and PDF place the baseline
+    return font.getmetrics()[0]
+
+
+def _font_css(font) -> str:
+    family, style = font.getname() if hasattr(font, "getname") else ("sans-serif", "")
+    weight = "bold " if "bold" in (style or "").lower() else ""
+    return f"{weight}{getattr(font, 'size', 10)}px {quoteattr(family)}, sans-serif"
+
+
+def render_svg(layout: LabelLayout) -> str:
+    """SVG document for a label layout, one element per draw call"""
+    width, height = layout.width, layout.height
+    classes: Dict[str, str] = {}
+    body = [f'<rect width="{width}" height="{height}" fill="{_hex(layout.background)}"/>']
+
+    for method, args, kwargs in layout.primitives():
+        if method == "text":
+            (x, y), text = args[0], args[1]
+            font = kwargs["font"]
+            css = _font_css(font)
+            font_class = classes.setdefault(css, f"f{len(classes)}")
+            body.append(f'<text class="{font_class}" x="{x}" y="{y + _ascent(font)}" '
+                        f'fill="{_hex(kwargs.get("fill", (0, 0, 0)))}">{escape(text)}</text>')
+        elif method == "line":
+            x1, y1, x2, y2 = args[0]
+            body.append(f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" '
+                        f'stroke="{_hex(kwargs.get("fill", (0, 0, 0)))}" stroke-width="{kwargs.get("width", 1)}"/>')
+        elif method == "rectangle":
+            # ImageDraw rectangles include their right and bottom edge
+            x0, y0, x1, y1 = args[0]
+            if kwargs.get("fill") is not None:
+                body.append(f'<rect x="{x0}" y="{y0}" width="{x1 - x0 + 1}" height="{y1 - y0 + 1}" '
+                            f'fill="{_hex(kwargs["fill"])}"/>')
+            if kwargs.get("outline") is not None:
+                body.append(f'<rect x="{x0 + 0.5}" y="{y0 + 0.5}" width="{x1 - x0}" height="{y1 - y0}" '
+                            f'fill="none" stroke="{_hex(kwargs["outline"])}" stroke-width="1"/>')
+
+    style = "".join(f".{name}{{font:{css};white-space:pre}}" for css, name in classes.items())
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}">\n<style>{style}</style>\n' + "\n".join(body) + "\n</svg>\n")
+
+
+class _GlyphOutlines:
+    """Glyph outlines of one TrueType font as PDF path operators, cached by character"""
+
+    def __init__(self, path: str, index: int = 0):
+        # index selects the face inside a font collection (.ttc)
+        self.font = TTFont(path, lazy=True, fontNumber=index if path.lower().endswith((".ttc", ".otc")) else -1)
+        self.glyph_set = self.font.getGlyphSet()
+        self.cmap = self.font.getBestCmap()
+        self.units_per_em = self.font["head"].unitsPerEm
+        head = self.font["head"]
+        self.bbox = (head.xMin, head.yMin, head.xMax, head.yMax)
+        self._glyphs: Dict[str, Tuple[str, int, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def glyph(self, char: str) -> Tuple[str, int, bytes]:
+        """(glyph name, advance width in font units, PDF path operators) for a character"""
+        glyph = self._glyphs.get(char)
+        if glyph is None:
+            with self._lock:
+                name = self.cmap.get(ord(char), ".notdef")
+                pen = _PDFPathPen(self.glyph_set)
+                self.glyph_set[name].draw(pen)
+                glyph = self._glyphs[char] = (name, self.font["hmtx"][name][0], pen.operators())
+        return glyph
+
+
+class _PDFPathPen(BasePen):
+    """fontTools pen that writes a glyph outline as PDF path operators (filled with f)"""
+
+    def __init__(self, glyph_set):
+        super().__init__(glyph_set)
+        self._ops = []
+
+    def _moveTo(self, pt):
+        self._ops.append("%g %g m" % pt)
+
+    def _lineTo(self, pt):
+        self._ops.append("%g %g l" % pt)
+
+    def _curveToOne(self, pt1, pt2, pt3):
+        self._ops.append("%g %g %g %g %g %g c" % (*pt1, *pt2, *pt3))
+
+    def _closePath(self):
+        self._ops.append("h")
+
+    def operators(self) -> bytes:
+        return (" ".join(self._ops) + " f").encode("ascii") if self._ops else b""
+
+
+@lru_cache(maxsize=32)
+def _outlines(path: str, index: int = 0) -> _GlyphOutlines:
+    return _GlyphOutlines(path, index)
+
+
+def _rgb(color: Tuple[int, int, int]) -> str:
+    return " ".join("%.4g" % (channel / 255) for channel in color[:3])
+
+
+def _stream(data: bytes, dictionary: str = "") -> bytes:
+    data = zlib.compress(data)
+    header = f"<< {dictionary + ' ' if dictionary else ''}/Length {len(data)} /Filter /FlateDecode >>"
+    return header.encode("ascii") + b"\nstream\n" + data + b"\nendstream"
+
+
+def render_pdf(layout: LabelLayout) -> bytes:
+    """Single-page PDF for a label layout, one label pixel per point
+
+    Text is drawn as the outlines of the same TrueType glyphs the raster
+    label uses, so the PDF needs no embedded fonts and looks the same in any
+    viewer or print workflow. Each glyph is stored once and reused.
+    """
+    height = layout.height
+    content = [f"{_rgb(layout.background)} rg 0 0 {layout.width} {height} re f"]
+    glyph_objects: Dict[Tuple[str, str], str] = {}
+    glyph_streams: List[bytes] = []
+    needs_base_font = False
+
+    for method, args, kwargs in layout.primitives():
+        if method == "text":
+            (x, y), text = args[0], args[1]
+            font = kwargs["font"]
+            size = getattr(font, "size", 10)
+            baseline = height - y - _ascent(font)
+            content.append(f"{_rgb(kwargs.get('fill', (0, 0, 0)))} rg")
+            path = getattr(font, "path", None)
+            if not isinstance(path, str) or not os.path.exists(path):
+                # No font file (Pillow's built-in font): fall back to standard Helvetica
+                needs_base_font = True
+                literal = text.encode("latin-1", "replace").replace(b"\\", b"\\\\") \
+                    .replace(b"(", b"\\(").replace(b")", b"\\)").decode("latin-1")
+                content.append(f"BT /F1 {size} Tf {x} {baseline} Td ({literal}) Tj ET")
+                continue
+            outlines = _outlines(path, getattr(font, "index", 0))
+            scale = size / outlines.units_per_em
+            for char in text:
+                name, advance, operators = outlines.glyph(char)
+                if operators:
+                    key = (path, name)
+                    resource = glyph_objects.get(key)
+                    if resource is None:
+                        resource = glyph_objects[key] = f"G{len(glyph_objects)}"
+                        glyph_streams.append(_stream(operators, "/Type /XObject /Subtype /Form /BBox [%d %d %d %d]"
+                                                     % outlines.bbox))
+                    content.append("q %.6g 0 0 %.6g %.2f %.2f cm /%s Do Q" % (scale, scale, x, baseline, resource))
+                x += advance * scale
+        elif method == "line":
+            x1, y1, x2, y2 = args[0]
+            content.append(f"{_rgb(kwargs.get('fill', (0, 0, 0)))} RG {kwargs.get('width', 1)} w "
+                           f"{x1} {height - y1} m {x2} {height - y2} l S")
+        elif method == "rectangle":
+            # ImageDraw rectangles include their right and bottom edge
+            x0, y0, x1, y1 = args[0]
+            if kwargs.get("fill") is not None:
+                content.append(f"{_rgb(kwargs['fill'])} rg {x0} {height - y1 - 1} {x1 - x0 + 1} {y1 - y0 + 1} re f")
+            if kwargs.get("outline") is not None:
+                content.append(f"{_rgb(kwargs['outline'])} RG 1 w "
+                               f"{x0 + 0.5} {height - y1 - 0.5} {x1 - x0} {y1 - y0} re S")
+
+    # Objects: 1 catalog, 2 pages, 3 page, 4 content, 5 Helvetica, 6.. glyphs
+    xobjects = " ".join(f"/G{index} {index + 6} 0 R" for index in range(len(glyph_streams)))
+    fonts = "/Font << /F1 5 0 R >>" if needs_base_font else ""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {layout.width} {height}] /Contents 4 0 R "
+         f"/Resources << /XObject << {xobjects} >> {fonts} >> >>").encode("ascii"),
+        _stream("\n".join(content).encode("latin-1")),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        *glyph_streams,
+    ]
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class VectorLabelRenderer:
+    """Renders labels as SVG or PDF from the same layout as NutritionLabelCreator.create_label"""
+
+    def __init__(self, creator: Optional[NutritionLabelCreator] = None):
+        self.creator = creator or NutritionLabelCreator()
+
+    def render(self, nutrition_data: Dict, market: str, crisis_type: Optional[str] = None,
+               format: str = "svg") -> bytes:
+        """SVG or PDF bytes for a label"""
+        layout = self.creator.record_layout(nutrition_data, market, crisis_type)
+        if format == "svg":
+            return render_svg(layout).encode("utf-8")
+        if format == "pdf":
+            return render_pdf(layout)
+        raise ValueError(f"Unsupported vector format: {format} (available: {', '.join(VECTOR_FORMATS)})")
+
+    def save_label(self, nutrition_data: Dict, market: str, filename: str,
+                   crisis_type: Optional[str] = None) -> str:
+        """Save a print-ready label; the format follows the .svg or .pdf extension"""
+        vector_format = os.path.splitext(filename)[1].lstrip(".").lower()
+        data = self.render(nutrition_data, market, crisis_type, vector_format)
+        with open(filename, "wb") as f:
+            f.write(data)
+        return filename
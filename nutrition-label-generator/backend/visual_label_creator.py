@@ -1,22 +1,416 @@
 """
 Visual Label Creator for SmartLabel AI Nutrition Label Generator
-Creates high-resolution nutrition labels using PIL and Matplotlib
+Creates high-resolution nutrition labels using PIL
 """
 
 import math
-from PIL import Image, ImageDraw, ImageFont
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
+import os
+import re
+import logging
+import threading
+from functools import lru_cache
+from PIL import Image, ImageChops, ImageDraw, ImageFont
 from typing import Dict, List, Optional, Tuple
-import numpy as np
-from market_regulations import MarketRegulations, CrisisRegulations
+from market_regulations import MARKET_REGISTRY, MarketRegulations, CrisisRegulations
+
+logger = logging.getLogger(__name__)
+
+# Font files tried for each variant, in order of preference
+FONT_CANDIDATES = {
+    "regular": ["arial.ttf", "Arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf"],
+    "bold": ["arialbd.ttf", "Arial Bold.ttf", "DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf"],
+}
+
+DEFAULT_FONT_PATHS = [
+    os.path.dirname(os.path.abspath(__file__)),
+    "/usr/share/fonts/truetype/dejavu",
+    "/usr/share/fonts/truetype/liberation",
+    "/Library/Fonts",
+    "/System/Library/Fonts/Supplemental",
+]
+
+
+_UNRESOLVED = object()
+
+
+class FontCache:
+    """Process-wide cache of loaded fonts keyed by (path, size, variant)
+
+    Font files are resolved once per variant by searching the configured
+    font paths (``LABEL_FONT_PATHS``, separated by ``os.pathsep``) before the
+    defaults, and each size is parsed by FreeType only once per process.
+    """
+
+    def __init__(self, search_paths: Optional[List[str]] = None):
+        self._lock = threading.Lock()
+        self._fonts: Dict[Tuple[Optional[str], int, str], ImageFont.ImageFont] = {}
+        self._resolved: Dict[str, Optional[str]] = {}
+        # id of every cached font -> its variant, to look up other sizes of the same face
+        self._variants: Dict[int, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.set_search_paths(search_paths)
+
+    def set_search_paths(self, search_paths: Optional[List[str]] = None):
+        """Replace the font search paths and drop every cached font"""
+        if search_paths is None:
+            configured = os.environ.get("LABEL_FONT_PATHS", "")
+            search_paths = [path for path in configured.split(os.pathsep) if path] + DEFAULT_FONT_PATHS
+        with self._lock:
+            self.search_paths = list(search_paths)
+            self._fonts.clear()
+            self._resolved.clear()
+            self._variants.clear()
+
+    def get(self, size: int, variant: str = "regular") -> ImageFont.ImageFont:
+        """Get a font of the given size and variant, loading it on first use"""
+        font = self._fonts.get((self._resolved.get(variant, _UNRESOLVED), size, variant))
+        if font is not None:
+            self.hits += 1
+            return font
+
+        with self._lock:
+            if variant not in self._resolved:
+                self._resolved[variant] = self._resolve(variant)
+            path = self._resolved[variant]
+            key = (path, size, variant)
+            font = self._fonts.get(key)
+            if font is not None:
+                self.hits += 1
+                return font
+            self.misses += 1
+            font = self._load(path, size)
+            self._fonts[key] = font
+            self._variants[id(font)] = variant
+            return font
+
+    def scaled(self, font: ImageFont.ImageFont, scale: float) -> ImageFont.ImageFont:
+        """The same face as a cached font, at ``scale`` times its size"""
+        size = max(1, round(getattr(font, "size", 10) * scale))
+        variant = self._variants.get(id(font))
+        if variant is not None:
+            return self.get(size, variant)
+        return font.font_variant(size=size) if hasattr(font, "font_variant") else font
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters for instrumentation"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "cached_fonts": len(self._fonts),
+        }
+
+    def _resolve(self, variant: str) -> Optional[str]:
+        """Find the font file for a variant, or None to use Pillow's default"""
+        candidates = FONT_CANDIDATES.get(variant, FONT_CANDIDATES["regular"])
+        for directory in self.search_paths:
+            for name in candidates:
+                path = os.path.join(directory, name)
+                if os.path.isfile(path):
+                    return path
+        # Let Pillow search the platform font directories for the bare names
+        for name in candidates:
+            try:
+                return ImageFont.truetype(name, 10).path
+            except OSError:
+                continue
+        logger.warning(f"No TrueType font found for '{variant}' in {self.search_paths}; using Pillow default font")
+        return None
+
+    @staticmethod
+    def _load(path: Optional[str], size: int) -> ImageFont.ImageFont:
+        if path is None:
+            try:
+                return ImageFont.load_default(size)
+            except TypeError:
+                # Pillow < 10.1 only ships the fixed-size bitmap font
+                return ImageFont.load_default()
+        return ImageFont.truetype(path, size)
+
+
+FONT_CACHE = FontCache()
+
+
+@lru_cache(maxsize=16384)
+def text_width(font: ImageFont.ImageFont, text: str) -> float:
+    """Rendered width of text in a font (glyph metrics cached per font)"""
+    return font.getlength(text)
+
+
+def font_cache_stats() -> Dict[str, Dict[str, float]]:
+    """Cache statistics for fonts and glyph metrics"""
+    metrics = text_width.cache_info()
+    lookups = metrics.hits + metrics.misses
+    return {
+        "fonts": FONT_CACHE.stats(),
+        "text_metrics": {
+            "hits": metrics.hits,
+            "misses": metrics.misses,
+            "hit_rate": round(metrics.hits / lookups, 4) if lookups else 0.0,
+            "cached_entries": metrics.currsize,
+        },
+    }
+
+# Line-breaking rules: CJK text may break between any two characters, except
+# that closing punctuation never starts a line and opening punctuation never
+# ends one. Latin and Arabic text only breaks at whitespace.
+NO_BREAK_BEFORE = frozenset("，。、；：？！）」』】〉》・…．,.;:?!)]%،؛؟")
+NO_BREAK_AFTER = frozenset("（「『【〈《([")
+_CJK_CHARS = re.compile(
+    "[\u2e80-\u2fdf"  # CJK radicals
+    "\u3000-\u30ff"   # CJK punctuation, Hiragana, Katakana
+    "\u3400-\u4dbf"   # CJK extension A
+    "\u4e00-\u9fff"   # CJK unified ideographs
+    "\uac00-\ud7af"   # Hangul syllables
+    "\uf900-\ufaff"   # CJK compatibility ideographs
+    "\uff00-\uffef]"  # Full-width forms
+)
+
+
+def _break_units(text: str) -> List[Tuple[str, str]]:
+    """Split text into unbreakable units, each paired with the separator
+    that precedes it on the same line (" " between words, "" inside CJK runs)"""
+    units: List[Tuple[str, str]] = []
+    for word in text.split():
+        separator = " " if units else ""
+        if not _CJK_CHARS.search(word):
+            units.append((word, separator))
+            continue
+
+        # Break CJK words per character, keeping non-CJK runs together
+        pieces: List[str] = []
+        for char in word:
+            if pieces and (char in NO_BREAK_BEFORE or pieces[-1][-1] in NO_BREAK_AFTER
+                           or not (_CJK_CHARS.match(char) or _CJK_CHARS.match(pieces[-1][-1]))):
+                pieces[-1] += char
+            else:
+                pieces.append(char)
+        units.append((pieces[0], separator))
+        units.extend((piece, "") for piece in pieces[1:])
+    return units
+
+
+def wrap_text(text: str, font: ImageFont.ImageFont, max_width: float) -> List[str]:
+    """Wrap text to lines no wider than max_width pixels
+
+    Every unit is measured once (through the per-font ``text_width`` cache) and
+    line widths are summed incrementally, so wrapping is linear in the text
+    length. Units wider than a whole line are broken between characters.
+    """
+    lines: List[str] = []
+    current: List[str] = []
+    current_width = 0.0
+    space_width = text_width(font, " ")
+
+    for unit, separator in _break_units(text):
+        unit_width = text_width(font, unit)
+        gap = space_width if separator and current else 0.0
+
+        if current and current_width + gap + unit_width > max_width:
+            lines.append("".join(current))
+            current, current_width, gap = [], 0.0, 0.0
+
+        if unit_width > max_width and not current:
+            # A single unit that cannot fit on any line: hard-break it
+            for char in unit:
+                char_width = text_width(font, char)
+                if current and current_width + char_width > max_width:
+                    lines.append("".join(current))
+                    current, current_width = [], 0.0
+                current.append(char)
+                current_width += char_width
+            continue
+
+        if gap:
+            current.append(separator)
+        current.append(unit)
+        current_width += gap + unit_width
+
+    if current:
+        lines.append("".join(current))
+    return lines
+
+
+LABEL_WIDTH = 400
+
+# Bump whenever rendering output changes, to invalidate cached labels
+RENDERER_VERSION = "3"
+
+# Layout units are pixels at 72 DPI
+LAYOUT_DPI = 72
+
+# Named output sizes, as scale factors of the layout
+LABEL_SIZES = {
+    "thumbnail": 150 / LABEL_WIDTH,
+    "preview": 300 / LABEL_WIDTH,
+    "print": 300 / LAYOUT_DPI,
+}
+
+
+def _shift(method: str, args: tuple, dy: int) -> tuple:
+    """Move a recorded draw call down by ``dy``"""
+    if method == "text":
+        (x, y), rest = args[0], args[1:]
+        return ((x, y + dy), *rest)
+    x0, y0, x1, y1 = args[0]
+    return ([x0, y0 + dy, x1, y1 + dy], *args[1:])
+
+
+class StaticStrip:
+    """A full-width label region that is the same for every label of a market
+
+    Holds the region's draw calls (relative to its top) and the rows of the
+    region that contain ink, rasterized once, so labels paste them instead of
+    drawing the text again.
+    """
+
+    __slots__ = ("height", "operations", "image", "image_offset")
+
+    # Room above and below the region for glyphs that reach past its bounds
+    MARGIN = 8
+
+    def __init__(self, height: int, operations: List[Tuple[str, tuple, Dict]], width: int,
+                 background: Tuple[int, int, int]):
+        self.height = height
+        self.operations = operations
+        canvas = Image.new("RGB", (width, height + 2 * self.MARGIN), background)
+        self.draw_at(ImageDraw.Draw(canvas), self.MARGIN)
+        ink = ImageChops.difference(canvas, Image.new("RGB", canvas.size, background)).getbbox()
+        if ink is None:
+            self.image, self.image_offset = None, 0
+        else:
+            self.image = canvas.crop((0, ink[1], width, ink[3]))
+            self.image_offset = ink[1] - self.MARGIN
+
+    def draw_at(self, draw, y: int):
+        """Issue the region's draw calls at ``y`` on an ImageDraw-like object"""
+        for method, args, kwargs in self.operations:
+            getattr(draw, method)(*_shift(method, args, y), **kwargs)
+
+
+class MarketTemplate:
+    """The static strips of one market's label, compiled once by NutritionLabelCreator.compile_template"""
+
+    __slots__ = ("market", "title", "table_header", "daily_value_note",
+                 "ingredients_header", "certifications_header", "regulatory_notes")
+
+    def __init__(self, market: str, **strips: StaticStrip):
+        self.market = market
+        for name in self.__slots__[1:]:
+            setattr(self, name, strips[name])
+
+
+class LabelLayout:
+    """A laid-out label: its size plus the draw calls that paint it, in order
+
+    Rasterized by create_label and converted to SVG/PDF by vector_label, so
+    every backend draws exactly the same layout. The static regions of the
+    market template appear as ("strip", (StaticStrip, y), {}) calls, which
+    primitives() expands.
+    """
+
+    __slots__ = ("width", "height", "background", "operations")
+
+    def __init__(self, width: int, height: int, background: Tuple[int, int, int],
+                 operations: List[Tuple[str, tuple, Dict]]):
+        self.width = width
+        self.height = height
+        self.background = background
+        self.operations = operations
+
+    def replay(self, draw):
+        """Issue the recorded calls on an ImageDraw-like object"""
+        for method, args, kwargs in self.operations:
+            if method == "strip" and not hasattr(draw, "strip"):
+                args[0].draw_at(draw, args[1])
+            else:
+                getattr(draw, method)(*args, **kwargs)
+
+    def primitives(self):
+        """The text, line and rectangle calls, with static strips expanded"""
+        for method, args, kwargs in self.operations:
+            if method != "strip":
+                yield method, args, kwargs
+                continue
+            strip, y = args
+            for strip_method, strip_args, strip_kwargs in strip.operations:
+                yield strip_method, _shift(strip_method, strip_args, y), strip_kwargs
+
+
+class _RecordingDraw:
+    """Stand-in for ImageDraw that records the text, line and rectangle calls"""
+
+    def __init__(self):
+        self.operations = []
+
+    def text(self, *args, **kwargs):
+        self.operations.append(("text", args, kwargs))
+
+    def line(self, *args, **kwargs):
+        self.operations.append(("line", args, kwargs))
+
+    def rectangle(self, *args, **kwargs):
+        self.operations.append(("rectangle", args, kwargs))
+
+    def strip(self, strip: StaticStrip, y: int):
+        self.operations.append(("strip", (strip, y), {}))
+
+
+class _RasterDraw:
+    """ImageDraw for a label canvas that pastes the pre-rasterized static strips"""
+
+    def __init__(self, img: Image.Image):
+        self.img = img
+        draw = ImageDraw.Draw(img)
+        self.text, self.line, self.rectangle = draw.text, draw.line, draw.rectangle
+
+    def strip(self, strip: StaticStrip, y: int):
+        if strip.image is not None:
+            self.img.paste(strip.image, (0, y + strip.image_offset))
+
+
+class _ScaledDraw:
+    """Wraps an ImageDraw so a recorded layout is drawn natively at ``scale``:
+    coordinates, line widths and font sizes are all multiplied"""
+
+    def __init__(self, draw: ImageDraw.ImageDraw, scale: float, font_cache: FontCache):
+        self.draw = draw
+        self.scale = scale
+        self.font_cache = font_cache
+
+    def text(self, xy, text, font=None, **kwargs):
+        x, y = xy
+        self.draw.text((x * self.scale, y * self.scale), text,
+                       font=self.font_cache.scaled(font, self.scale), **kwargs)
+
+    def line(self, xy, fill=None, width=1, **kwargs):
+        self.draw.line([value * self.scale for value in xy], fill=fill,
+                       width=max(1, round(width * self.scale)), **kwargs)
+
+    def rectangle(self, xy, fill=None, outline=None, width=1, **kwargs):
+        # Rectangles include their right and bottom edge, so scale the covered area
+        x0, y0, x1, y1 = xy
+        box = [round(x0 * self.scale), round(y0 * self.scale),
+               round((x1 + 1) * self.scale) - 1, round((y1 + 1) * self.scale) - 1]
+        self.draw.rectangle(box, fill=fill, outline=outline, width=max(1, round(width * self.scale)), **kwargs)
+
+    def strip(self, strip: StaticStrip, y: int):
+        # Strips are rasterized at the layout size, so draw their calls at this scale instead
+        strip.draw_at(self, y)
+
 
 class NutritionLabelCreator:
     """Creates visual nutrition labels for different markets"""
     
-    def __init__(self):
+    def __init__(self, font_cache: Optional[FontCache] = None):
         self.regulations = MarketRegulations()
         self.crisis_regulations = CrisisRegulations()
+        self.font_cache = font_cache or FONT_CACHE
+        self._templates: Dict[tuple, MarketTemplate] = {}
+        self._banners: Dict[tuple, StaticStrip] = {}
+        self._compile_lock = threading.Lock()
         
         # Color scheme for nutrition labels
         self.colors = {
@@ -30,7 +424,8 @@ class NutritionLabelCreator:
             "dark_gray": (64, 64, 64)
         }
     
-    def create_label(self, nutrition_data: Dict, market: str, crisis_type: Optional[str] = None) -> Image.Image:
+    def create_label(self, nutrition_data: Dict, market: str, crisis_type: Optional[str] = None,
+                     scale: float = 1.0) -> Image.Image:
         """
         Create a complete nutrition label image
         
@@ -38,73 +433,141 @@ class NutritionLabelCreator:
             nutrition_data: Structured nutrition data
             market: Target market
             crisis_type: Optional crisis type for warnings
+            scale: Output size relative to the 400px layout, drawn natively
             
         Returns:
             PIL Image: High-resolution nutrition label
         """
+        # Lay the label out once, then paint it on a canvas of exactly its size
+        return self.render_layout(self.record_layout(nutrition_data, market, crisis_type), scale)
+    
+    def create_label_sizes(self, nutrition_data: Dict, market: str, crisis_type: Optional[str] = None,
+                           sizes: Optional[Dict[str, float]] = None) -> Dict[str, Image.Image]:
+        """Render several sizes of a label (LABEL_SIZES by default) from a single layout pass"""
+        layout = self.record_layout(nutrition_data, market, crisis_type)
+        return {name: self.render_layout(layout, scale) for name, scale in (sizes or LABEL_SIZES).items()}
+    
+    def crisis_banner_image(self, market: str, crisis_type: str, width: int = LABEL_WIDTH) -> Image.Image:
+        """The top of a crisis label: its banner plus spacing, from the precomputed banners
+
+        Stacked above the regular (1x) label of the same data it gives exactly
+        create_label(..., crisis_type), without drawing the label again.
+        """
         regulation = self.regulations.get_regulation(market)
-        font_reqs = regulation.font_requirements
-        
-        # Calculate label dimensions
-        width, height = self._calculate_label_size(nutrition_data, market, crisis_type)
-        
-        # Create image
-        img = Image.new('RGB', (width, height), self.colors["white"])
-        draw = ImageDraw.Draw(img)
-        
-        # Load fonts
-        fonts = self._load_fonts(font_reqs)
-        
-        # Draw label components
+        banner = self._crisis_banner(crisis_type, market, self._load_fonts(regulation.font_requirements), width)
+        img = Image.new('RGB', (width, banner.height), self.colors["white"])
+        _RasterDraw(img).strip(banner, 0)
+        return img
+    
+    def render_layout(self, layout: LabelLayout, scale: float = 1.0) -> Image.Image:
+        """Draw a recorded layout at ``scale`` times its size"""
+        if scale == 1.0:
+            img = Image.new('RGB', (layout.width, layout.height), layout.background)
+            layout.replay(_RasterDraw(img))
+            return img
+        size = (max(1, round(layout.width * scale)), max(1, round(layout.height * scale)))
+        img = Image.new('RGB', size, layout.background)
+        layout.replay(_ScaledDraw(ImageDraw.Draw(img), scale, self.font_cache))
+        return img
+    
+    def record_layout(self, nutrition_data: Dict, market: str, crisis_type: Optional[str] = None) -> LabelLayout:
+        """Lay out a label without drawing it (see LabelLayout)"""
+        regulation = self.regulations.get_regulation(market)
+        fonts = self._load_fonts(regulation.font_requirements)
+        draw = _RecordingDraw()
+        height = self._layout(draw, nutrition_data, regulation, market, crisis_type, fonts, LABEL_WIDTH)
+        return LabelLayout(LABEL_WIDTH, height, self.colors["white"], draw.operations)
+    
+    def _layout(self, draw, nutrition_data: Dict, regulation, market: str,
+                crisis_type: Optional[str], fonts: Dict, width: int) -> int:
+        """Run every label section in order and return the total height
+
+        The sections that are the same for every label of the market come
+        from the compiled market template; only the product's values are drawn.
+        """
+        template = self._template(market, regulation, fonts, width)
         y_position = 0
         y_position = self._draw_crisis_warning(draw, crisis_type, market, fonts, y_position, width)
-        y_position = self._draw_title(draw, regulation.title, fonts["title"], y_position, width)
+        y_position = self._draw_strip(draw, template.title, y_position)
         y_position = self._draw_serving_info(draw, nutrition_data, fonts["body"], y_position, width)
-        y_position = self._draw_nutrition_table(draw, nutrition_data, regulation, fonts, y_position, width)
-        y_position = self._draw_ingredients(draw, nutrition_data, fonts["body"], y_position, width)
+        y_position = self._draw_nutrition_table(draw, nutrition_data, template, fonts, y_position, width)
+        y_position = self._draw_ingredients(draw, nutrition_data, template, fonts["body"], y_position, width)
         y_position = self._draw_allergens(draw, nutrition_data, regulation, fonts, y_position, width)
-        y_position = self._draw_certifications(draw, nutrition_data, regulation, fonts, y_position, width)
-        y_position = self._draw_regulatory_notes(draw, regulation, fonts["small"], y_position, width)
-        
-        return img
+        y_position = self._draw_certifications(draw, nutrition_data, template, fonts, y_position, width)
+        y_position = self._draw_strip(draw, template.regulatory_notes, y_position)
+        return y_position
     
-    def _calculate_label_size(self, nutrition_data: Dict, market: str, crisis_type: Optional[str]) -> Tuple[int, int]:
-        """Calculate optimal label dimensions"""
-        base_width = 400
-        base_height = 600
-        
-        # Add height for crisis warning if needed
-        if crisis_type:
-            base_height += 80
-        
-        # Add height for certifications
-        cert_count = len(nutrition_data.get("certifications", []))
-        base_height += cert_count * 25
-        
-        # Add height for ingredients (estimate based on length)
-        ingredients_length = len(nutrition_data.get("ingredients", ""))
-        base_height += max(50, ingredients_length // 40 * 20)
-        
-        return base_width, base_height
+    def compile_template(self, market: str) -> MarketTemplate:
+        """The market's static label regions, laid out and rasterized once"""
+        regulation = self.regulations.get_regulation(market)
+        return self._template(market, regulation, self._load_fonts(regulation.font_requirements), LABEL_WIDTH)
+    
+    def _template(self, market: str, regulation, fonts: Dict, width: int) -> MarketTemplate:
+        # Keyed by everything a strip depends on, so reloaded regulations or fonts compile a new template
+        key = (market, width, regulation.title, tuple(regulation.mandatory_warnings),
+               tuple(id(font) for font in fonts.values()))
+        template = self._templates.get(key)
+        if template is None:
+            with self._compile_lock:
+                template = self._templates.get(key)
+                if template is None:
+                    template = self._templates[key] = self._compile_template(market, regulation, fonts, width)
+        return template
+    
+    def _compile_template(self, market: str, regulation, fonts: Dict, width: int) -> MarketTemplate:
+        def strip(draw_section) -> StaticStrip:
+            draw = _RecordingDraw()
+            height = draw_section(draw, 0)
+            return StaticStrip(height, draw.operations, width, self.colors["white"])
+        
+        return MarketTemplate(
+            market,
+            title=strip(lambda draw, y: self._draw_title(draw, regulation.title, fonts["title"], y, width)),
+            table_header=strip(lambda draw, y: self._draw_table_header(draw, fonts, y, width)),
+            daily_value_note=strip(lambda draw, y: self._draw_daily_value_note(draw, fonts, y)),
+            ingredients_header=strip(lambda draw, y: self._draw_section_header(draw, "Ingredients:", fonts["body"], y)),
+            certifications_header=strip(
+                lambda draw, y: self._draw_section_header(draw, "Certifications:", fonts["body"], y)),
+            regulatory_notes=strip(lambda draw, y: self._draw_regulatory_notes(draw, regulation, fonts["small"], y, width)),
+        )
+    
+    @staticmethod
+    def _draw_strip(draw, strip: StaticStrip, y_pos: int) -> int:
+        draw.strip(strip, y_pos)
+        return y_pos + strip.height
+    
+    def preload_fonts(self):
+        """Load the fonts, templates and crisis banners of every market up front, so the first labels render warm"""
+        for market in MARKET_REGISTRY.markets:
+            self.compile_template(market)
+        self.precompute_crisis_banners()
+    
+    def precompute_crisis_banners(self) -> int:
+        """Render the crisis banner of every crisis type × market; returns how many were rendered"""
+        count = 0
+        for market in MARKET_REGISTRY.markets:
+            fonts = self._load_fonts(self.regulations.get_regulation(market).font_requirements)
+            for crisis_type in self.crisis_regulations.crisis_warnings:
+                self._crisis_banner(crisis_type, market, fonts, LABEL_WIDTH)
+                count += 1
+        return count
+    
+    def reload_crisis_regulations(self, crisis_warnings: Optional[Dict[str, Dict[str, str]]] = None,
+                                  contact_info: Optional[Dict[str, str]] = None) -> int:
+        """Replace the crisis warning texts and re-render every crisis banner"""
+        self.crisis_regulations.reload(crisis_warnings, contact_info)
+        with self._compile_lock:
+            self._banners = {}
+        return self.precompute_crisis_banners()
     
     def _load_fonts(self, font_reqs: Dict) -> Dict[str, ImageFont.ImageFont]:
-        """Load fonts for label creation"""
-        fonts = {}
-        
-        try:
-            # Try to load system fonts
-            fonts["title"] = ImageFont.truetype("arial.ttf", font_reqs["title_font_size"])
-            fonts["body"] = ImageFont.truetype("arial.ttf", font_reqs["body_font_size"])
-            fonts["small"] = ImageFont.truetype("arial.ttf", font_reqs["allergen_font_size"])
-            fonts["bold"] = ImageFont.truetype("arialbd.ttf", font_reqs["body_font_size"])
-        except:
-            # Fallback to default fonts
-            fonts["title"] = ImageFont.load_default()
-            fonts["body"] = ImageFont.load_default()
-            fonts["small"] = ImageFont.load_default()
-            fonts["bold"] = ImageFont.load_default()
-        
-        return fonts
+        """Load fonts for label creation from the shared font cache"""
+        return {
+            "title": self.font_cache.get(font_reqs["title_font_size"]),
+            "body": self.font_cache.get(font_reqs["body_font_size"]),
+            "small": self.font_cache.get(font_reqs["allergen_font_size"]),
+            "bold": self.font_cache.get(font_reqs["body_font_size"], "bold"),
+        }
     
     def _draw_crisis_warning(self, draw: ImageDraw.ImageDraw, crisis_type: Optional[str], 
                            market: str, fonts: Dict, y_pos: int, width: int) -> int:
@@ -112,21 +575,45 @@ class NutritionLabelCreator:
         if not crisis_type:
             return y_pos
         
-        warning_text = self.crisis_regulations.get_crisis_warning(crisis_type, market)
+        return self._draw_strip(draw, self._crisis_banner(crisis_type, market, fonts, width), y_pos)
+    
+    def _crisis_banner(self, crisis_type: str, market: str, fonts: Dict, width: int) -> StaticStrip:
+        """The rendered crisis banner for a crisis type and market (see precompute_crisis_banners)"""
+        warning = self.crisis_regulations.get_crisis_warning(crisis_type, market)
+        contact = self.crisis_regulations.get_crisis_contact_info(market)
+        key = (warning, contact, width, tuple(id(font) for font in fonts.values()))
+        banner = self._banners.get(key)
+        if banner is None:
+            draw = _RecordingDraw()
+            height = self._draw_crisis_banner(draw, warning, contact, fonts, 0, width)
+            banner = StaticStrip(height, draw.operations, width, self.colors["white"])
+            # Only the known crisis types are kept; free-form ones get the generic warning
+            if crisis_type.lower() in self.crisis_regulations.crisis_warnings:
+                with self._compile_lock:
+                    self._banners[key] = banner
+        return banner
+    
+    def _draw_crisis_banner(self, draw: ImageDraw.ImageDraw, warning: str, contact: str,
+                            fonts: Dict, y_pos: int, width: int) -> int:
+        """Draw the red crisis banner: warning text plus the market's crisis contact"""
+        warning_lines = wrap_text(warning, fonts["bold"], width - 20)
+        contact_lines = wrap_text(contact, fonts["small"], width - 20)
         
         # Draw red background for warning
-        warning_height = 60
+        warning_height = max(60, 10 + 25 * len(warning_lines) + 15 * len(contact_lines) + 10)
         draw.rectangle([0, y_pos, width, y_pos + warning_height], 
                       fill=self.colors["red"])
         
         # Draw warning text
-        draw.text((10, y_pos + 10), warning_text, 
-                 fill=self.colors["white"], font=fonts["bold"])
+        text_y = y_pos + 10
+        for line in warning_lines:
+            draw.text((10, text_y), line, fill=self.colors["white"], font=fonts["bold"])
+            text_y += 25
         
         # Draw contact info
-        contact_info = self.crisis_regulations.get_crisis_contact_info(market)
-        draw.text((10, y_pos + 35), contact_info, 
-                 fill=self.colors["white"], font=fonts["small"])
+        for line in contact_lines:
+            draw.text((10, text_y), line, fill=self.colors["white"], font=fonts["small"])
+            text_y += 15
         
         return y_pos + warning_height + 10
     
@@ -134,15 +621,14 @@ class NutritionLabelCreator:
                    y_pos: int, width: int) -> int:
         """Draw nutrition facts title"""
         # Center the title
-        bbox = draw.textbbox((0, 0), title, font=font)
-        text_width = bbox[2] - bbox[0]
-        x_pos = (width - text_width) // 2
+        title_width = int(text_width(font, title))
+        x_pos = (width - title_width) // 2
         
         draw.text((x_pos, y_pos), title, fill=self.colors["black"], font=font)
         
         # Draw underline
         line_y = y_pos + 25
-        draw.line([x_pos, line_y, x_pos + text_width, line_y], 
+        draw.line([x_pos, line_y, x_pos + title_width, line_y], 
                  fill=self.colors["black"], width=2)
         
         return y_pos + 40
@@ -162,7 +648,7 @@ class NutritionLabelCreator:
         return y_pos + 50
     
     def _draw_nutrition_table(self, draw: ImageDraw.ImageDraw, nutrition_data: Dict, 
-                            regulation, fonts: Dict, y_pos: int, width: int) -> int:
+                            template: MarketTemplate, fonts: Dict, y_pos: int, width: int) -> int:
         """Draw nutrition facts table"""
         calories = nutrition_data.get("calories", "0")
         nutrients = nutrition_data.get("nutrients", [])
@@ -171,21 +657,8 @@ class NutritionLabelCreator:
         calories_text = f"Calories {calories}"
         draw.text((10, y_pos), calories_text, fill=self.colors["black"], font=fonts["bold"])
         
-        # Draw separator line
-        line_y = y_pos + 25
-        draw.line([10, line_y, width - 10, line_y], fill=self.colors["black"], width=2)
-        
-        y_pos += 35
-        
-        # Draw nutrients table header
-        header_text = "Amount per serving | % Daily Value*"
-        draw.text((10, y_pos), header_text, fill=self.colors["black"], font=fonts["body"])
-        
-        # Draw separator line
-        line_y = y_pos + 20
-        draw.line([10, line_y, width - 10, line_y], fill=self.colors["black"], width=1)
-        
-        y_pos += 30
+        # Separator and table header below the calories
+        y_pos = self._draw_strip(draw, template.table_header, y_pos)
         
         # Draw nutrients
         for nutrient in nutrients:
@@ -212,51 +685,58 @@ class NutritionLabelCreator:
             draw.text((x_offset, y_pos), nutrient_text, fill=self.colors["black"], font=font_to_use)
             
             # Draw daily value on the right
-            dv_bbox = draw.textbbox((0, 0), daily_value_text, font=font_to_use)
-            dv_width = dv_bbox[2] - dv_bbox[0]
+            dv_width = int(text_width(font_to_use, daily_value_text))
             draw.text((width - dv_width - 10, y_pos), daily_value_text, 
                      fill=self.colors["black"], font=font_to_use)
             
             y_pos += 20
         
-        # Draw daily value note
+        return self._draw_strip(draw, template.daily_value_note, y_pos)
+    
+    def _draw_table_header(self, draw: ImageDraw.ImageDraw, fonts: Dict, y_pos: int, width: int) -> int:
+        """Draw the separators and column header between calories and nutrients (template strip)"""
+        # Draw separator line below the calories
+        line_y = y_pos + 25
+        draw.line([10, line_y, width - 10, line_y], fill=self.colors["black"], width=2)
+        
+        y_pos += 35
+        
+        # Draw nutrients table header
+        header_text = "Amount per serving | % Daily Value*"
+        draw.text((10, y_pos), header_text, fill=self.colors["black"], font=fonts["body"])
+        
+        # Draw separator line
+        line_y = y_pos + 20
+        draw.line([10, line_y, width - 10, line_y], fill=self.colors["black"], width=1)
+        
+        return y_pos + 30
+    
+    def _draw_daily_value_note(self, draw: ImageDraw.ImageDraw, fonts: Dict, y_pos: int) -> int:
+        """Draw the daily value footnote below the nutrients (template strip)"""
         y_pos += 10
         note_text = "* Percent Daily Values are based on a 2000 calorie diet."
         draw.text((10, y_pos), note_text, fill=self.colors["dark_gray"], font=fonts["small"])
         
         return y_pos + 30
     
+    def _draw_section_header(self, draw: ImageDraw.ImageDraw, text: str, font: ImageFont.ImageFont,
+                             y_pos: int) -> int:
+        """Draw a section header such as "Ingredients:" (template strip)"""
+        draw.text((10, y_pos), text, fill=self.colors["black"], font=font)
+        return y_pos + 25
+    
     def _draw_ingredients(self, draw: ImageDraw.ImageDraw, nutrition_data: Dict, 
-                        font: ImageFont.ImageFont, y_pos: int, width: int) -> int:
+                        template: MarketTemplate, font: ImageFont.ImageFont, y_pos: int, width: int) -> int:
         """Draw ingredients list"""
         ingredients = nutrition_data.get("ingredients", "")
         
         if not ingredients:
             return y_pos
         
-        # Draw ingredients header
-        draw.text((10, y_pos), "Ingredients:", fill=self.colors["black"], font=font)
-        y_pos += 25
+        y_pos = self._draw_strip(draw, template.ingredients_header, y_pos)
         
         # Wrap ingredients text
-        words = ingredients.split()
-        lines = []
-        current_line = ""
-        
-        for word in words:
-            test_line = current_line + " " + word if current_line else word
-            bbox = draw.textbbox((0, 0), test_line, font=font)
-            text_width = bbox[2] - bbox[0]
-            
-            if text_width <= width - 20:
-                current_line = test_line
-            else:
-                if current_line:
-                    lines.append(current_line)
-                current_line = word
-        
-        if current_line:
-            lines.append(current_line)
+        lines = wrap_text(ingredients, font, width - 20)
         
         # Draw ingredients lines
         for line in lines:
@@ -278,22 +758,22 @@ class NutritionLabelCreator:
         allergen_statement = f"{allergen_prefix} {allergens}" if allergens else ""
         
         if allergen_statement:
-            draw.text((10, y_pos), allergen_statement, fill=self.colors["red"], font=fonts["bold"])
-            y_pos += 25
+            for line in wrap_text(allergen_statement, fonts["bold"], width - 20):
+                draw.text((10, y_pos), line, fill=self.colors["red"], font=fonts["bold"])
+                y_pos += 20
+            y_pos += 5
         
         return y_pos
     
     def _draw_certifications(self, draw: ImageDraw.ImageDraw, nutrition_data: Dict, 
-                           regulation, fonts: Dict, y_pos: int, width: int) -> int:
+                           template: MarketTemplate, fonts: Dict, y_pos: int, width: int) -> int:
         """Draw certification badges"""
         certifications = nutrition_data.get("certifications", [])
         
         if not certifications:
             return y_pos
         
-        # Draw certifications header
-        draw.text((10, y_pos), "Certifications:", fill=self.colors["black"], font=fonts["body"])
-        y_pos += 25
+        y_pos = self._draw_strip(draw, template.certifications_header, y_pos)
         
         # Draw certification badges
         for cert in certifications:
@@ -315,15 +795,20 @@ class NutritionLabelCreator:
         warnings = regulation.mandatory_warnings
         
         for warning in warnings:
-            draw.text((10, y_pos), warning, fill=self.colors["dark_gray"], font=font)
-            y_pos += 20
+            for line in wrap_text(warning, font, width - 20):
+                draw.text((10, y_pos), line, fill=self.colors["dark_gray"], font=font)
+                y_pos += 20
         
         return y_pos + 10
     
     def save_label(self, img: Image.Image, filename: str, dpi: int = 300) -> str:
-        """Save label image with high resolution"""
+        """Save label image with high resolution
+        
+        Prefer save_print_label, which draws the label at the target DPI
+        instead of upscaling an already rendered image.
+        """
         # Calculate new size for high DPI
-        scale_factor = dpi / 72  # 72 is default DPI
+        scale_factor = dpi / LAYOUT_DPI
         new_size = (int(img.width * scale_factor), int(img.height * scale_factor))
         
         # Resize image
@@ -333,6 +818,13 @@ class NutritionLabelCreator:
         high_res_img.save(filename, dpi=(dpi, dpi))
         
         return filename
+    
+    def save_print_label(self, nutrition_data: Dict, market: str, filename: str,
+                         crisis_type: Optional[str] = None, dpi: int = 300) -> str:
+        """Render a label natively at the given DPI and save it"""
+        img = self.create_label(nutrition_data, market, crisis_type, scale=dpi / LAYOUT_DPI)
+        img.save(filename, dpi=(dpi, dpi))
+        return filename
 
 class LabelPreview:
     """Create preview versions of labels for React frontend"""
@@ -342,24 +834,37 @@ class LabelPreview:
     
     def create_preview(self, nutrition_data: Dict, market: str, 
                       crisis_type: Optional[str] = None, size: Tuple[int, int] = (300, 400)) -> str:
-        """Create base64 encoded preview of label"""
+        """Create base64 encoded preview of label, drawn to fit within ``size``"""
+        layout = self.creator.record_layout(nutrition_data, market, crisis_type)
+        return self._data_url(self.creator.render_layout(layout, self._fit(layout, size)))
+    
+    def create_thumbnail(self, nutrition_data: Dict, market: str, 
+                        crisis_type: Optional[str] = None, size: Tuple[int, int] = (150, 200)) -> str:
+        """Create thumbnail version of label"""
+        return self.create_preview(nutrition_data, market, crisis_type, size)
+    
+    def create_previews(self, nutrition_data: Dict, market: str, crisis_type: Optional[str] = None,
+                        preview_size: Tuple[int, int] = (300, 400),
+                        thumbnail_size: Tuple[int, int] = (150, 200)) -> Dict[str, str]:
+        """Preview and thumbnail data URLs from a single layout pass"""
+        layout = self.creator.record_layout(nutrition_data, market, crisis_type)
+        return {
+            "preview": self._data_url(self.creator.render_layout(layout, self._fit(layout, preview_size))),
+            "thumbnail": self._data_url(self.creator.render_layout(layout, self._fit(layout, thumbnail_size))),
+        }
+    
+    @staticmethod
+    def _fit(layout: LabelLayout, size: Tuple[int, int]) -> float:
+        """Largest scale at which the label fits in ``size`` without distortion"""
+        return min(size[0] / layout.width, size[1] / layout.height)
+    
+    @staticmethod
+    def _data_url(img: Image.Image) -> str:
         import base64
         import io
         
-        # Create full resolution label
-        full_label = self.creator.create_label(nutrition_data, market, crisis_type)
-        
-        # Resize for preview
-        preview_label = full_label.resize(size, Image.Resampling.LANCZOS)
-        
-        # Convert to base64
         buffer = io.BytesIO()
-        preview_label.save(buffer, format='PNG')
+        img.save(buffer, format='PNG')
         img_str = base64.b64encode(buffer.getvalue()).decode()
         
         return f"data:image/png;base64,{img_str}"
-    
-    def create_thumbnail(self, nutrition_data: Dict, market: str, 
-                        crisis_type: Optional[str] = None, size: Tuple[int, int] = (150, 200)) -> str:
-        """Create thumbnail version of label"""
-        return self.create_preview(nutrition_data, market, crisis_type, size)
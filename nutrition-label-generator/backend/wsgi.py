@@ -0,0 +1,11 @@
+"""
+WSGI entry point for SmartLabel AI Nutrition Label Generator
+
+    gunicorn --config gunicorn.conf.py
+
+(or `python run_backend.py --production` from the project directory).
+"""
+
+from api_server import app
+
+__all__ = ["app"]
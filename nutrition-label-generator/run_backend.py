@@ -3,11 +3,15 @@
 SmartLabel AI Nutrition Label Generator - Backend Startup Script
 """
 
+import argparse
 import os
+import signal
 import sys
 import subprocess
 from pathlib import Path
 
+BACKEND_DIR = Path(__file__).parent / 'backend'
+
 def check_python_version():
     """Check if Python version is 3.9+"""
     if sys.version_info < (3, 9):
@@ -16,9 +20,9 @@ def check_python_version():
     print(f"✅ Python version: {sys.version.split()[0]}")
     return True
 
-def check_dependencies():
+def check_dependencies(extra_packages=()):
     """Check if required dependencies are installed"""
-    required_packages = ['flask', 'boto3', 'pillow']
+    required_packages = ['flask', 'boto3', 'pillow', *extra_packages]
     missing_packages = []
     
     for package in required_packages:
@@ -101,8 +105,56 @@ def start_server():
     except Exception as e:
         print(f"❌ Failed to start server: {str(e)}")
 
+def start_production_server(workers=None, threads=None, port=None):
+    """Start the API under gunicorn: preforked, warmed-up workers sharing the preloaded app"""
+    print("\n🚀 Starting SmartLabel AI Nutrition Label Generator API (production)...")
+    
+    # backend/gunicorn.conf.py reads these
+    env = os.environ.copy()
+    if workers:
+        env['WEB_CONCURRENCY'] = str(workers)
+    if threads:
+        env['THREADS'] = str(threads)
+    if port:
+        env['PORT'] = str(port)
+    
+    try:
+        subprocess.run([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py'],
+                       env=env, cwd=BACKEND_DIR)
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped by user")
+    except Exception as e:
+        print(f"❌ Failed to start server: {str(e)}")
+
+def reload_production_server():
+    """Gracefully replace the gunicorn workers (finishing in-flight requests) after a config change"""
+    pidfile = Path(os.environ.get('PIDFILE', BACKEND_DIR / 'gunicorn.pid'))
+    try:
+        pid = int(pidfile.read_text().strip())
+        os.kill(pid, signal.SIGHUP)
+        print(f"🔄 Reloading gunicorn master {pid}")
+        return True
+    except (OSError, ValueError) as e:
+        print(f"❌ No running production server to reload ({pidfile}): {e}")
+        return False
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="SmartLabel AI Nutrition Label Generator backend")
+    parser.add_argument('--production', action='store_true',
+                        help="serve with gunicorn (preforked workers) instead of the Flask development server")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU core)")
+    parser.add_argument('--threads', type=int, help="threads per worker (default: 4)")
+    parser.add_argument('--port', type=int, help="port (default: 5001)")
+    parser.add_argument('--reload', action='store_true',
+                        help="gracefully reload a running production server and exit")
+    return parser.parse_args()
+
 def main():
     """Main startup function"""
+    args = parse_args()
+    if args.reload:
+        sys.exit(0 if reload_production_server() else 1)
+    
     print("🏷️  SmartLabel AI - Nutrition Label Generator")
     print("=" * 50)
     
@@ -110,7 +162,7 @@ def main():
     if not check_python_version():
         return
     
-    if not check_dependencies():
+    if not check_dependencies(['gunicorn'] if args.production else []):
         return
     
     aws_configured = check_aws_credentials()
@@ -122,11 +174,14 @@ def main():
     print(f"\n📊 Configuration Summary:")
     print(f"   - Python: {sys.version.split()[0]}")
     print(f"   - AWS Bedrock: {'✅ Enabled' if aws_configured else '⚠️  Mock Mode'}")
-    print(f"   - API Port: 5001")
-    print(f"   - Health Check: http://localhost:5001/api/nutrition/health")
+    print(f"   - API Port: {args.port or 5001}")
+    print(f"   - Health Check: http://localhost:{args.port or 5001}/health")
     
     # Start the server
-    start_server()
+    if args.production:
+        start_production_server(args.workers, args.threads, args.port)
+    else:
+        start_server()
 
 if __name__ == "__main__":
     main()
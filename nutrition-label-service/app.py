@@ -1,21 +1,34 @@
-from flask import Flask, request, jsonify, send_file
-import boto3
+from flask import Flask, Response, request, jsonify, send_file
 import json
 import base64
+import threading
 from io import BytesIO
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 from PIL import Image, ImageDraw, ImageFont
 import os
+import uuid
 from datetime import datetime
 
 app = Flask(__name__)
 
-# Configure AWS Bedrock
-bedrock_client = boto3.client(
-    'bedrock-runtime',
-    region_name='us-east-1'
-)
+# Response formats for /generate-label, selected by Accept header or ?format=
+RESPONSE_FORMATS = {'json': 'application/json', 'png': 'image/png', 'multipart': 'multipart/mixed'}
+
+# AWS Bedrock client, created on first use so cold starts don't pay for importing boto3
+_bedrock_client = None
+_bedrock_client_lock = threading.Lock()
+
+def get_bedrock_client():
+    """The shared bedrock-runtime client"""
+    global _bedrock_client
+    if _bedrock_client is None:
+        with _bedrock_client_lock:
+            if _bedrock_client is None:
+                import boto3
+                _bedrock_client = boto3.client(
+                    'bedrock-runtime',
+                    region_name='us-east-1'
+                )
+    return _bedrock_client
 
 def generate_nutrition_content_with_bedrock(product_data):
     """Generate nutrition content using AWS Bedrock Claude"""
@@ -54,7 +67,7 @@ def generate_nutrition_content_with_bedrock(product_data):
     
     try:
         # Call AWS Bedrock Claude
-        response = bedrock_client.invoke_model(
+        response = get_bedrock_client().invoke_model(
             modelId='anthropic.claude-3-sonnet-20240229-v1:0',
             body=json.dumps({
                 "anthropic_version": "bedrock-2023-05-31",
@@ -263,6 +276,24 @@ def create_nutrition_label_image(nutrition_data, product_name):
     
     return img
 
+def negotiate_format():
+    """Response format for /generate-label; JSON unless PNG or multipart is preferred"""
+    requested = request.args.get('format')
+    if requested in RESPONSE_FORMATS:
+        return RESPONSE_FORMATS[requested]
+    return request.accept_mimetypes.best_match(list(RESPONSE_FORMATS.values()), default='application/json')
+
+def multipart_label(metadata, img_buffer, filename, boundary, chunk_size=65536):
+    """Stream JSON metadata followed by the PNG as a multipart/mixed body"""
+    yield (f'--{boundary}\r\nContent-Type: application/json\r\n\r\n'
+           f'{json.dumps(metadata)}\r\n').encode('utf-8')
+    yield (f'--{boundary}\r\nContent-Type: image/png\r\n'
+           f'Content-Disposition: inline; filename="{filename}"\r\n'
+           f'Content-Length: {img_buffer.getbuffer().nbytes}\r\n\r\n').encode('utf-8')
+    for chunk in iter(lambda: img_buffer.read(chunk_size), b''):
+        yield chunk
+    yield f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
 @app.route('/generate-label', methods=['POST'])
 def generate_label():
     try:
@@ -281,20 +312,33 @@ def generate_label():
         product_name = product_data.get('product_name', 'Product')
         label_image = create_nutrition_label_image(nutrition_data, product_name)
         
-        # Convert image to base64
         img_buffer = BytesIO()
         label_image.save(img_buffer, format='PNG')
         img_buffer.seek(0)
-        img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
+        filename = f'nutrition_label_{product_name}_{datetime.now().strftime("%Y%m%d")}.png'
         
-        return jsonify({
-            'success': True,
-            'data': {
-                'image_base64': img_base64,
-                'nutrition_data': nutrition_data,
-                'filename': f'nutrition_label_{product_name}_{datetime.now().strftime("%Y%m%d")}.png'
-            }
-        })
+        response_format = negotiate_format()
+        if response_format == 'image/png':
+            # Streamed straight from the encoder buffer
+            response = send_file(img_buffer, mimetype='image/png', download_name=filename)
+        elif response_format == 'multipart/mixed':
+            boundary = uuid.uuid4().hex
+            metadata = {'success': True, 'data': {'nutrition_data': nutrition_data, 'filename': filename}}
+            response = Response(multipart_label(metadata, img_buffer, filename, boundary),
+                                content_type=f'multipart/mixed; boundary={boundary}')
+        else:
+            # Convert image to base64
+            img_base64 = base64.b64encode(img_buffer.getbuffer()).decode()
+            response = jsonify({
+                'success': True,
+                'data': {
+                    'image_base64': img_base64,
+                    'nutrition_data': nutrition_data,
+                    'filename': filename
+                }
+            })
+        response.headers['Vary'] = 'Accept'
+        return response
         
     except Exception as e:
         print(f"Error generating label: {e}")
@@ -310,4 +354,4 @@ def root():
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=os.environ.get('DEBUG', 'false').lower() == 'true')
@@ -16,5 +16,10 @@ export AWS_ACCESS_KEY_ID=${AWS_ACCESS_KEY_ID}
 export AWS_SECRET_ACCESS_KEY=${AWS_SECRET_ACCESS_KEY}
 export AWS_DEFAULT_REGION=${AWS_DEFAULT_REGION:-us-east-1}
 
-# Start the Flask app
-python app.py
+# Start the app: gunicorn with preforked workers, or the Flask development server with DEBUG=true
+if [ "${DEBUG:-false}" = "true" ]; then
+    python app.py
+else
+    exec gunicorn --preload --workers ${WEB_CONCURRENCY:-$(nproc)} --threads ${THREADS:-4} \
+        --worker-class gthread --bind 0.0.0.0:${PORT:-5001} --graceful-timeout 30 app:app
+fi